@@ -0,0 +1,361 @@
+"""
+Mock Hootsuite Server
+=====================
+
+A local stand-in for the Hootsuite REST API used by the benchmarks. It serves
+the endpoints HootSweet calls with canned data over HTTP/1.1 keep-alive, and can
+add latency, expire tokens and throttle requests to exercise the client's
+refresh and retry paths.
+
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+class MockConfig:
+    """Behaviour of the mock server.
+
+    Args:
+        latency (float): Seconds added to every response.
+        throttle_rate (float): Fraction of API requests answered with a 429.
+        retry_after (float): Retry-After sent with 429 responses.
+        total_messages (int): Number of outbound messages served by
+            ``GET /v1/messages`` across all pages.
+        message_interval (float): Seconds between the scheduled send times of
+            the messages, the first is sent at 2020-01-01 00:00 UTC. Queries
+            only return the messages sent in their time range.
+        expire_initial_token (bool): Answer requests made with tokens that were
+            not issued by ``/oauth2/token`` with a 401.
+
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.0,
+        total_messages: int = 1000,
+        message_interval: float = 60.0,
+        expire_initial_token: bool = False,
+    ):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.total_messages = total_messages
+        self.message_interval = message_interval
+        self.expire_initial_token = expire_initial_token
+
+
+class MockState:
+    """Counters and issued tokens shared by the request handlers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.refreshes = 0
+        self.throttled = 0
+        self.unauthorized = 0
+        self.issued_tokens = set()
+        self.message_ids = 0
+
+    def next_token(self) -> str:
+        with self.lock:
+            self.refreshes += 1
+            token = "token-%d" % self.refreshes
+            self.issued_tokens.add(token)
+            return token
+
+    def next_message_id(self) -> str:
+        with self.lock:
+            self.message_ids += 1
+            return str(self.message_ids)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "refreshes": self.refreshes,
+                "throttled": self.throttled,
+                "unauthorized": self.unauthorized,
+            }
+
+
+FIRST_SEND_TIME = datetime(2020, 1, 1)
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _send_time(index: int, interval: float) -> datetime:
+    return FIRST_SEND_TIME + timedelta(seconds=index * interval)
+
+
+def _message(index: int, interval: float = 60.0, state: str = "SCHEDULED"):
+    return {
+        "id": str(index),
+        "state": state,
+        "text": "Benchmark message %d" % index,
+        "socialProfile": {"id": str(index % 10), "type": "TWITTER"},
+        "mediaUrls": [],
+        "media": [],
+        "sequenceNumber": 1,
+        "scheduledSendTime": _send_time(index, interval).strftime(TIME_FORMAT),
+        "tags": [],
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    routes = [
+        ("POST", re.compile(r"^/oauth2/token$"), "token"),
+        ("GET", re.compile(r"^/v1/me$"), "me"),
+        ("GET", re.compile(r"^/v1/me/organizations$"), "organizations"),
+        ("GET", re.compile(r"^/v1/(me/)?socialProfiles$"), "social_profiles"),
+        ("GET", re.compile(r"^/v1/socialProfiles/(\w+)$"), "social_profile"),
+        ("GET", re.compile(r"^/v1/socialProfiles/(\w+)/teams$"), "teams"),
+        ("GET", re.compile(r"^/v1/members/(\w+)$"), "member"),
+        ("GET", re.compile(r"^/v1/members/(\w+)/organizations$"), "organizations"),
+        ("GET", re.compile(r"^/v1/messages$"), "messages"),
+        ("POST", re.compile(r"^/v1/messages$"), "schedule"),
+        ("GET", re.compile(r"^/v1/messages/(\w+)$"), "message"),
+        ("DELETE", re.compile(r"^/v1/messages/(\w+)$"), "empty"),
+        ("POST", re.compile(r"^/v1/messages/(\w+)/(approve|reject)$"), "empty"),
+        ("GET", re.compile(r"^/v1/messages/(\w+)/history$"), "history"),
+        ("POST", re.compile(r"^/v1/media$"), "media"),
+        ("GET", re.compile(r"^/v1/media/(\w+)$"), "media_status"),
+        ("PUT", re.compile(r"^/upload/(\w+)$"), "upload"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        config, state = self.server.config, self.server.state
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        url = urlparse(self.path)
+
+        with state.lock:
+            state.requests += 1
+
+        if config.latency:
+            time.sleep(config.latency)
+
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if match and route_method == method:
+                break
+        else:
+            return self._send(404, {"errors": [{"code": 404, "message": "Not found"}]})
+
+        if name not in ("token", "upload"):
+            if not self._authorized():
+                with state.lock:
+                    state.unauthorized += 1
+                return self._send(
+                    401, {"errors": [{"code": 401, "message": "Expired"}]}
+                )
+            if config.throttle_rate and random.random() < config.throttle_rate:
+                with state.lock:
+                    state.throttled += 1
+                headers = {"Retry-After": str(config.retry_after)}
+                error = {"errors": [{"code": 429, "message": "Too many requests"}]}
+                return self._send(429, error, headers)
+
+        handler = getattr(self, "_%s" % name)
+        status, payload = handler(match, parse_qs(url.query), body)
+        self._send(status, payload)
+
+    def _authorized(self) -> bool:
+        authorization = self.headers.get("Authorization", "")
+        token = authorization.split(" ", 1)[-1]
+        if not self.server.config.expire_initial_token:
+            return bool(token)
+        return token in self.server.state.issued_tokens
+
+    def _send(self, status, payload, headers=None):
+        content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _token(self, match, query, body):
+        token = self.server.state.next_token()
+        return 200, {
+            "access_token": token,
+            "refresh_token": "refresh-%s" % token,
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "scope": "offline",
+        }
+
+    def _me(self, match, query, body):
+        return 200, {"data": {"id": "1", "fullName": "Bench Mark", "email": "b@m"}}
+
+    def _organizations(self, match, query, body):
+        return 200, {"data": [{"id": "100"}, {"id": "200"}]}
+
+    def _social_profiles(self, match, query, body):
+        profiles = [
+            {"id": str(i), "type": "TWITTER", "socialNetworkUsername": "user%d" % i}
+            for i in range(50)
+        ]
+        return 200, {"data": profiles}
+
+    def _social_profile(self, match, query, body):
+        profile_id = match.group(1)
+        return 200, {
+            "data": {
+                "id": profile_id,
+                "type": "TWITTER",
+                "socialNetworkId": profile_id,
+                "socialNetworkUsername": "user%s" % profile_id,
+                "avatarUrl": "https://example.com/%s.png" % profile_id,
+                "owner": "ORGANIZATION",
+                "ownerId": "100",
+            }
+        }
+
+    def _teams(self, match, query, body):
+        return 200, {"data": [{"teamId": "1"}, {"teamId": "2"}]}
+
+    def _member(self, match, query, body):
+        return 200, {"data": {"id": match.group(1), "fullName": "Member"}}
+
+    def _messages(self, match, query, body):
+        config = self.server.config
+        limit = int(query.get("limit", ["50"])[0])
+        # The indexes of the messages sent between startTime and endTime
+        first, last = self._index_range(query, config)
+        start = max(first, int(query.get("cursor", [first])[0]))
+        end = min(start + limit, last)
+        payload = {
+            "data": [_message(i, config.message_interval) for i in range(start, end)]
+        }
+        if end < last:
+            payload["cursor"] = {"next": str(end)}
+        return 200, payload
+
+    @staticmethod
+    def _index_range(query, config: MockConfig):
+        first, last = 0, config.total_messages
+        for name in ("startTime", "endTime"):
+            if name not in query:
+                continue
+            when = datetime.strptime(query[name][0], TIME_FORMAT)
+            offset = (when - FIRST_SEND_TIME).total_seconds() / config.message_interval
+            if name == "startTime":
+                first = max(first, math.ceil(offset))
+            else:
+                last = min(last, math.floor(offset) + 1)
+        return first, max(first, last)
+
+    def _schedule(self, match, query, body):
+        json.loads(body.decode("utf-8"))
+        message_id = self.server.state.next_message_id()
+        return 200, {"data": [{"id": message_id, "state": "SCHEDULED"}]}
+
+    def _message(self, match, query, body):
+        message_id = int(match.group(1))
+        interval = self.server.config.message_interval
+        return 200, {"data": [_message(message_id, interval)]}
+
+    def _history(self, match, query, body):
+        return 200, {"data": [{"action": "SUBMITTED", "sequenceNumber": 1}]}
+
+    def _empty(self, match, query, body):
+        return 200, {"data": {}}
+
+    def _media(self, match, query, body):
+        media_id = "m%s" % self.server.state.next_message_id()
+        host, port = self.server.server_address[:2]
+        upload_url = "http://%s:%s/upload/%s" % (host, port, media_id)
+        return 200, {
+            "data": {
+                "id": media_id,
+                "uploadUrl": upload_url,
+                "uploadUrlDurationSeconds": 900,
+            }
+        }
+
+    def _media_status(self, match, query, body):
+        return 200, {"data": {"id": match.group(1), "state": "READY"}}
+
+    def _upload(self, match, query, body):
+        return 200, None
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockServer:
+    """A mock Hootsuite server running on a background thread.
+
+    Use it as a context manager, ``base_url`` is the url to pass to HootSweet.
+
+    Args:
+        config (MockConfig): How the server behaves.
+        host (str): The interface to listen on.
+        port (int): The port to listen on, 0 picks a free port.
+
+    """
+
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.config = config or MockConfig()
+        self.httpd.state = MockState()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return "http://%s:%s" % (host, port)
+
+    @property
+    def config(self) -> MockConfig:
+        return self.httpd.config
+
+    @property
+    def state(self) -> MockState:
+        return self.httpd.state
+
+    def reset(self, config: MockConfig = None):
+        """Reset the counters and optionally change the behaviour."""
+        self.httpd.state = MockState()
+        if config is not None:
+            self.httpd.config = config
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,241 @@
+"""
+HootSweet Benchmarks
+====================
+
+Measures the overhead of the synchronous HootSweet client against a local mock
+Hootsuite server and prints the results as JSON so they can be compared between
+releases::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --scenario fan_out --latency 0.005
+
+Each scenario reports calls per second, p50/p99 latency per call, CPU time per
+call and the peak memory allocated by Python while it ran.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import hootsweet
+from benchmarks.mock_server import MockConfig, MockServer
+from hootsweet import HootSweet
+from hootsweet.codec import MsgspecCodec, OrjsonCodec, StdlibCodec
+
+CODECS = {"json": StdlibCodec, "orjson": OrjsonCodec, "msgspec": MsgspecCodec}
+
+TOKEN = {
+    "access_token": "initial-token",
+    "refresh_token": "initial-refresh",
+    "token_type": "Bearer",
+    "expires_in": 3600,
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_calls(func, calls, threads):
+    if threads == 1:
+        for i in range(calls):
+            func(i)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(func, range(calls)))
+
+
+def measure(func, calls, threads=1, memory_calls=100):
+    """Call ``func(i)`` for i in range(calls) on a pool of threads and return
+    throughput, latency and CPU figures.
+
+    Peak memory is measured in a second, shorter pass as tracing allocations
+    slows everything down.
+
+    """
+    latencies = []
+
+    def timed(i):
+        started = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - started)
+
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    run_calls(timed, calls, threads)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+
+    tracemalloc.start()
+    run_calls(func, min(calls, memory_calls), threads)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "threads": threads,
+        "seconds": wall,
+        "calls_per_second": calls / wall,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "cpu_ms_per_call": cpu / calls * 1000,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def make_client(server, args, threads=1, **kwargs):
+    return HootSweet(
+        "client_id",
+        "client_secret",
+        token=dict(TOKEN),
+        base_url=server.base_url,
+        pool_maxsize=max(threads, 10),
+        json_codec=CODECS[args.codec]() if args.codec else None,
+        **kwargs,
+    )
+
+
+def bench_single(server, args):
+    """Sequential GETs, the per-call overhead of the client."""
+    client = make_client(server, args)
+    return measure(lambda i: client.get_social_profile(i), args.calls)
+
+
+def bench_fan_out(server, args):
+    """Many threads sharing one client."""
+    client = make_client(server, args, args.threads)
+    return measure(
+        lambda i: client.get_social_profile(i % 500), args.calls, args.threads
+    )
+
+
+def bench_refresh_storm(server, args):
+    """Every thread finds the token expired at once, the server rejects the
+    initial token so requests only succeed once it has been refreshed.
+
+    """
+    server.reset(MockConfig(latency=args.latency, expire_initial_token=True))
+    client = make_client(server, args, args.threads)
+    client.token = dict(TOKEN, expires_at=time.time() - 1)
+    result = measure(lambda i: client.get_me(), args.threads * 10, args.threads)
+    result["token_refreshes"] = server.state.refreshes
+    return result
+
+
+def bench_throttled(server, args):
+    """A share of requests are throttled and retried by the rate limiter."""
+    from hootsweet.ratelimit import RateLimiter
+
+    server.reset(MockConfig(latency=args.latency, throttle_rate=0.1))
+    limiter = RateLimiter(max_retries=10, backoff_base=0.001, backoff_max=0.01)
+    client = make_client(server, args, args.threads, rate_limiter=limiter)
+    result = measure(lambda i: client.get_member(i), args.calls, args.threads)
+    result["retried"] = limiter.stats.retried
+    return result
+
+
+def bench_pagination(server, args):
+    """Streaming a large outbound message export page by page."""
+    server.reset(MockConfig(latency=args.latency, total_messages=args.messages))
+    client = make_client(server, args)
+    start, end = datetime(2020, 1, 1), datetime(2020, 2, 1)
+    counts = []
+
+    def export(i):
+        messages = client.iter_outbound_messages(start, end, limit=100)
+        counts.append(sum(1 for _ in messages))
+
+    result = measure(export, 3)
+    result["messages"] = counts[0]
+    result["messages_per_second"] = counts[0] * 3 / result["seconds"]
+    return result
+
+
+def bench_bulk_schedule(server, args):
+    """Scheduling a batch of messages with bounded concurrency."""
+    client = make_client(server, args, args.threads)
+    send_time = datetime(2020, 1, 1, 12)
+    batch = [
+        {"text": "Message %d" % i, "social_profile_ids": ["1"], "send_time": send_time}
+        for i in range(args.calls)
+    ]
+    results = []
+
+    def schedule(i):
+        results.extend(client.schedule_messages(batch, max_workers=args.threads))
+
+    result = measure(schedule, 1)
+    result["messages_per_second"] = len(batch) / result["seconds"]
+    result["failed"] = sum(isinstance(r, Exception) for r in results[: len(batch)])
+    return result
+
+
+SCENARIOS = {
+    "single": bench_single,
+    "fan_out": bench_fan_out,
+    "refresh_storm": bench_refresh_storm,
+    "throttled": bench_throttled,
+    "pagination": bench_pagination,
+    "bulk_schedule": bench_bulk_schedule,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HootSweet client.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument(
+        "--codec",
+        choices=sorted(CODECS),
+        help="The JSON codec to use, defaults to the fastest installed.",
+    )
+    parser.add_argument("--output", help="Write the JSON results to a file.")
+    args = parser.parse_args(argv)
+    # The mock server speaks plain HTTP
+    os.environ.setdefault("OAUTHLIB_INSECURE_TRANSPORT", "1")
+
+    results = {
+        "hootsweet": hootsweet.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "calls": args.calls,
+            "threads": args.threads,
+            "messages": args.messages,
+            "latency": args.latency,
+            "codec": args.codec,
+        },
+        "scenarios": {},
+    }
+    with MockServer(MockConfig(latency=args.latency)) as server:
+        for name in args.scenario or list(SCENARIOS):
+            server.reset(MockConfig(latency=args.latency))
+            result = SCENARIOS[name](server, args)
+            result["server"] = server.state.as_dict()
+            results["scenarios"][name] = result
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
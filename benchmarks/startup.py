@@ -0,0 +1,168 @@
+"""
+HootSweet Startup Benchmarks
+============================
+
+Measures the cold import time of hootsweet modules, each in a fresh interpreter,
+and the cost of locale validation, printing the results as JSON::
+
+    python -m benchmarks.startup --output startup.json
+    python -m benchmarks.startup --runs 50 --module hootsweet.api
+
+Import times are the medians over ``--runs`` interpreters of the cumulative
+time reported by ``python -X importtime``, with bytecode already cached.
+Validation reports the cost of the first call, which loads the timezone names,
+and of later calls, next to a linear scan of ``pytz.all_timezones``.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+
+import hootsweet
+from hootsweet import locale
+
+MODULES = [
+    "hootsweet",
+    "hootsweet.locale",
+    "hootsweet.models",
+    "hootsweet.api",
+    "requests_oauthlib",
+    "pytz",
+]
+
+# Loads the timezone names of a backend in a fresh interpreter
+FIRST_CALL = """
+import time
+start = time.perf_counter()
+from hootsweet.locale import is_valid_timezone, use_timezone_backend
+use_timezone_backend(%r)
+is_valid_timezone("Europe/London")
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(args):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return subprocess.run(
+        [sys.executable] + args,
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def import_time(module):
+    # The cumulative microseconds of the module's own line in -X importtime
+    stderr = run_python(["-X", "importtime", "-c", "import %s" % module]).stderr
+    for line in reversed(stderr.splitlines()):
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise ValueError("%s not in the import time output." % module)
+
+
+def loaded_modules(module):
+    code = "import sys, %s; print(len(sys.modules)); print(' '.join(sys.modules))"
+    lines = run_python(["-c", code % module]).stdout.splitlines()
+    names = set(lines[1].split())
+    return {
+        "count": int(lines[0]),
+        "requests_oauthlib": "requests_oauthlib" in names,
+        "pytz": "pytz" in names,
+    }
+
+
+def bench_imports(modules, runs):
+    results = {}
+    for module in modules:
+        import_time(module)  # writes the bytecode cache
+        times = [import_time(module) for _ in range(runs)]
+        results[module] = {
+            "median_ms": statistics.median(times) * 1000,
+            "min_ms": min(times) * 1000,
+            "modules": loaded_modules(module),
+        }
+    return results
+
+
+def per_call_ns(func, arg, number):
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number * 1e9
+
+
+def bench_validation(runs, number):
+    results = {}
+    for backend in locale.TIMEZONE_BACKENDS:
+        try:
+            first = [
+                float(run_python(["-c", FIRST_CALL % backend]).stdout)
+                for _ in range(runs)
+            ]
+        except subprocess.CalledProcessError:
+            results[backend] = None  # not installed
+            continue
+        locale.use_timezone_backend(backend)
+        results[backend] = {
+            "first_call_ms": statistics.median(first) * 1000,
+            "timezone_ns": per_call_ns(
+                locale.is_valid_timezone, "Pacific/Tahiti", number
+            ),
+            "missing_timezone_ns": per_call_ns(
+                locale.is_valid_timezone, "Europa/Mars", number
+            ),
+            "timezones": len(locale.timezones()),
+        }
+    locale.use_timezone_backend(None)
+
+    results["language_ns"] = per_call_ns(locale.is_valid_language, "tr", number)
+    try:
+        import pytz
+    except ImportError:
+        return results
+    all_timezones = list(pytz.all_timezones)
+    results["linear_scan"] = {
+        "timezone_ns": per_call_ns(
+            all_timezones.__contains__, "Pacific/Tahiti", number
+        ),
+        "language_ns": per_call_ns(
+            locale.ACCEPTED_LANGUAGES.__contains__, "tr", number
+        ),
+    }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hootsweet startup.")
+    parser.add_argument("--module", action="append", help="A module to import.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--number", type=int, default=10000)
+    parser.add_argument("--output", help="Write the JSON results to a file.")
+    args = parser.parse_args(argv)
+
+    results = {
+        "hootsweet": hootsweet.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"runs": args.runs, "number": args.number},
+        "imports": bench_imports(args.module or MODULES, args.runs),
+        "validation": bench_validation(args.runs, args.number),
+    }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,22 @@
-from hootsweet.api import HootSweet
+import sys
 
 __version__ = "0.7.1"
 
 __all__ = ["HootSweet"]
+
+if sys.version_info >= (3, 7):
+    # HootSweet is imported on first use so importing a submodule, e.g.
+    # hootsweet.locale or hootsweet.models, does not load requests and oauthlib.
+    def __getattr__(name):
+        if name == "HootSweet":
+            from hootsweet.api import HootSweet
+
+            return HootSweet
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    def __dir__():
+        return sorted(list(globals()) + __all__)
+
+
+else:  # pragma: no cover
+    from hootsweet.api import HootSweet  # noqa: F401
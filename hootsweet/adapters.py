@@ -0,0 +1,72 @@
+"""
+Transport Adapters
+==================
+
+This module provides the requests transport adapter HootSweet mounts on its
+session, so the connection pool size and keep-alive behaviour can be tuned for
+clients shared between many threads.
+
+"""
+
+import socket
+from typing import List, Tuple
+
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+# Seconds of idle time before probes are sent and the interval between them
+TCP_KEEPALIVE_IDLE = 60
+TCP_KEEPALIVE_INTERVAL = 15
+
+
+def keepalive_socket_options() -> List[Tuple[int, int, int]]:
+    """ Socket options enabling TCP keep-alive probes on pooled connections."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # Not every platform exposes the tuning options
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, TCP_KEEPALIVE_IDLE))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append(
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, TCP_KEEPALIVE_INTERVAL)
+        )
+    return options
+
+
+class PoolAdapter(HTTPAdapter):
+    """An HTTPAdapter with a configurable connection pool.
+
+    Args:
+        pool_connections (int): Number of host pools to cache.
+        pool_maxsize (int): Maximum number of connections kept per host. Set it
+            to at least the number of threads sharing the client so threads
+            do not wait on connection checkout or open throwaway connections.
+        pool_block (bool): Whether threads should wait for a free connection
+            rather than open a connection that is discarded after use.
+        tcp_keepalive (bool): Enable TCP keep-alive probes so idle pooled
+            connections are not silently dropped by proxies or load balancers.
+
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["socket_options"]
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOLSIZE,
+        pool_maxsize: int = DEFAULT_POOLSIZE,
+        pool_block: bool = DEFAULT_POOLBLOCK,
+        tcp_keepalive: bool = False,
+        **kwargs,
+    ):
+        self.socket_options = keepalive_socket_options() if tcp_keepalive else None
+        super().__init__(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            **kwargs,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
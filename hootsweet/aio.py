@@ -0,0 +1,707 @@
+"""
+HootSweet Async Client
+======================
+
+This module provides an asyncio client, AsyncHootSweet, with the same method
+surface as :class:`hootsweet.api.HootSweet`. Every API method returns a coroutine
+and all requests share a single pooled HTTP/1.1 keep-alive connection pool.
+
+Requires the optional ``httpx`` dependency, ``pip install hootsweet[async]``.
+
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+import httpx
+from hootsweet.api import (
+    IDEMPOTENT_METHODS,
+    HootSweet,
+    _drop_conditional_headers,
+    _next_cursor,
+    _outbound_messages_params,
+)
+from hootsweet.batch import DEFAULT_MAX_WORKERS
+from hootsweet.cache import invalidates
+from hootsweet.coalesce import AsyncSingleFlight
+from hootsweet.constants import MessageState, ReviewDecision, Reviewer
+from hootsweet.exceptions import (
+    MediaUploadFailed,
+    MediaUploadTimeout,
+    ServerError,
+    detect_and_raise_error,
+)
+from hootsweet.export import DEFAULT_BATCH_SIZE, export_messages
+from hootsweet.idempotency import matching_messages
+from hootsweet.media import (
+    FAILED,
+    READY,
+    MediaItem,
+    MediaSource,
+    MediaUploadResult,
+    iter_chunks,
+    open_media,
+    poll_delays,
+    resolve_mime_type,
+    split_media_item,
+)
+from hootsweet.models import Message
+from hootsweet.planner import MessageQueryPlanner
+from hootsweet.review import (
+    Review,
+    ReviewOutcome,
+    is_sequence_conflict,
+    latest_sequence_number,
+    parse_review,
+)
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Errors after which a schedule request may or may not have been acted on
+AMBIGUOUS_ERRORS = (ServerError, httpx.TransportError)
+
+log = logging.getLogger(__name__)
+
+
+class AsyncHootSweet(HootSweet):
+    """An asyncio client for interacting with the Hootsuite REST API.
+
+    Accepts the same arguments as :class:`hootsweet.api.HootSweet` plus the
+    connection pool limits below. The client should be closed with
+    :meth:`aclose` or used as an async context manager.
+
+    Args:
+        max_connections (int): Maximum number of concurrent connections.
+        max_keepalive_connections (int): Maximum number of idle keep-alive
+            connections kept in the pool.
+        client (httpx.AsyncClient): An existing client to send requests with,
+            the pool limits are ignored when given.
+
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        token: Dict = None,
+        redirect_uri: str = None,
+        scope: str = "offline",
+        refresh_cb=None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        client: httpx.AsyncClient = None,
+        **kwargs,
+    ):
+        super().__init__(
+            client_id,
+            client_secret,
+            token=token,
+            redirect_uri=redirect_uri,
+            scope=scope,
+            refresh_cb=refresh_cb,
+            **kwargs,
+        )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.client = client or httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        self._async_refresh_lock = None
+        self._refresh_task = None
+        if self.singleflight is not None:
+            self.singleflight = AsyncSingleFlight()
+        if self._schedule_flight is not None:
+            self._schedule_flight = AsyncSingleFlight()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self.client.aclose()
+
+    def _get_refresh_lock(self) -> asyncio.Lock:
+        # Created lazily so the lock binds to the running event loop.
+        if self._async_refresh_lock is None:
+            self._async_refresh_lock = asyncio.Lock()
+        return self._async_refresh_lock
+
+    async def _request_token(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self.client.post(
+            self.token_url,
+            data=data,
+            auth=(self.client_id, self.client_secret),
+        )
+        if not response.status_code == 200:
+            raise detect_and_raise_error(response)
+        token = response.json()
+        if "expires_in" in token:
+            token.setdefault("expires_at", time.time() + token["expires_in"])
+        self.token = token
+        return token
+
+    async def fetch_token(self, code: str) -> Dict[str, Any]:
+        """Fetch a Hootsuite OAuth2 token.
+
+        Args:
+            code (str): The authorization code obtained from Hootsuite.
+
+        """
+        data = {"grant_type": "authorization_code", "code": code, "scope": self.scope}
+        if self.session.redirect_uri:
+            data["redirect_uri"] = self.session.redirect_uri
+        return await self._request_token(data)
+
+    async def refresh_token(self, stale_access_token: str = None) -> Dict[str, Any]:
+        """Refresh the OAuth2 token and call token updater.
+
+        Concurrent callers share a single refresh, callers that were waiting on
+        the lock pick up the token obtained by the first caller.
+
+        """
+        if stale_access_token is None:
+            stale_access_token = self.token.get("access_token")
+        async with self._get_refresh_lock():
+            if self.token.get("access_token") != stale_access_token:
+                return self.token
+
+            if self.token_store is None:
+                return await self._request_refresh()
+            return await self._refresh_shared_token(stale_access_token)
+
+    async def _refresh_shared_token(self, stale_access_token: str) -> Dict[str, Any]:
+        # The store's lock blocks, so it is taken and released off the loop
+        loop = asyncio.get_event_loop()
+        lock = self.token_store.lock()
+        await loop.run_in_executor(None, lock.__enter__)
+        try:
+            stored = await loop.run_in_executor(None, self.token_store.load)
+            if stored and stored.get("access_token") != stale_access_token:
+                log.debug("Using the token refreshed by another client.")
+                self.token = stored
+                return stored
+
+            token = await self._request_refresh()
+            await loop.run_in_executor(None, self.token_store.save, token)
+            return token
+        finally:
+            await loop.run_in_executor(None, lock.__exit__, None, None, None)
+
+    async def _request_refresh(self) -> Dict[str, Any]:
+        log.debug("Refreshing access token.")
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": self.token.get("refresh_token"),
+        }
+        token = await self._request_token(data)
+        log.debug("Calling refresh callback %s." % self.refresh_cb.__name__)
+        self.refresh_cb(token)
+        return token
+
+    async def schedule_messages(
+        self,
+        batch: Iterable[Dict[str, Any]],
+        max_concurrency: int = DEFAULT_MAX_WORKERS,
+    ) -> List[Any]:
+        """Schedule many messages with bounded concurrency.
+
+        Args:
+            batch (Iterable[Dict]): Message specs, each a dictionary of keyword
+                arguments for :meth:`schedule_message`.
+            max_concurrency (int): Maximum number of messages submitted at once.
+                Defaults to 8.
+
+        Returns:
+            A list in the same order as ``batch`` holding the scheduled message
+            data, or the exception raised, for each spec.
+
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def schedule(spec):
+            async with semaphore:
+                return await self.schedule_message(**spec)
+
+        return await asyncio.gather(
+            *[schedule(spec) for spec in batch], return_exceptions=True
+        )
+
+    async def _schedule_idempotently(
+        self, key: str, data: Dict[str, Any], send_time: datetime
+    ) -> List[Dict[str, Any]]:
+        index = self.idempotency
+        attempt = 0
+        while True:
+            messages = index.get(key)
+            if messages is not None:
+                return messages
+            if attempt or index.is_uncertain(key):
+                messages = await self.find_scheduled_messages(
+                    data["text"], data["socialProfileIds"], send_time, data.get("media")
+                )
+                if messages:
+                    index.add(key, messages, found=True)
+                    return messages
+
+            attempt += 1
+            try:
+                messages = await self._make_request(
+                    "messages", method="POST", json=data
+                )
+            except AMBIGUOUS_ERRORS as exc:
+                index.mark_uncertain(key)
+                delay = index.retry_delay(attempt)
+                if delay is None:
+                    raise
+                log.debug("Retrying schedule after %r in %.2fs." % (exc, delay))
+                await asyncio.sleep(delay)
+                continue
+            index.add(key, messages)
+            return messages
+
+    async def find_scheduled_messages(
+        self,
+        text: str,
+        social_profile_ids: List[str],
+        send_time: datetime,
+        media: List[Dict[str, Any]] = None,
+        window: timedelta = None,
+    ) -> List[Dict[str, Any]]:
+        params = self._lookup_params(social_profile_ids, send_time, window)
+        messages = await self._make_request("messages", params=params)
+        return matching_messages(messages, text, social_profile_ids, media)
+
+    async def iter_outbound_messages(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        state: MessageState = None,
+        social_profile_ids: List[int] = None,
+        limit: int = 50,
+        include_unscheduled_review_messages: bool = None,
+        prefetch: bool = True,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Lazily iterate over every outbound message in a time range, with
+        ``async for``.
+
+        Takes the arguments of
+        :meth:`hootsweet.api.HootSweet.iter_outbound_messages`, a prefetched
+        page is fetched in a task while the current one is consumed.
+
+        """
+        params = _outbound_messages_params(
+            start_time,
+            end_time,
+            state,
+            social_profile_ids,
+            limit,
+            include_unscheduled_review_messages,
+        )
+        async for page in self._iter_outbound_pages(params, prefetch):
+            for message in page:
+                yield Message.from_dict(message) if self.models else message
+
+    async def _iter_outbound_pages(
+        self, params: Dict[str, Any], prefetch: bool = True
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        def fetch_page(cursor=None):
+            page_params = dict(params, cursor=cursor) if cursor else params
+            return self._make_request("messages", params=page_params, envelope=True)
+
+        next_page = None
+        try:
+            page = await fetch_page()
+            while True:
+                cursor = _next_cursor(page)
+                if cursor and prefetch:
+                    next_page = asyncio.ensure_future(fetch_page(cursor))
+
+                yield page.get("data") or []
+
+                if not cursor:
+                    return
+                if next_page is not None:
+                    page, next_page = await next_page, None
+                else:
+                    page = await fetch_page(cursor)
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def query_outbound_messages(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        social_profile_ids: List[str] = None,
+        state: MessageState = None,
+        max_concurrency: int = DEFAULT_MAX_WORKERS,
+        limit: int = 100,
+    ) -> List[Any]:
+        """Retrieve every outbound message in a large time range, for many
+        social profiles, with concurrent sharded queries.
+
+        Takes the arguments of
+        :meth:`hootsweet.api.HootSweet.query_outbound_messages`, with
+        ``max_concurrency`` shards queried at once.
+
+        """
+        planner = MessageQueryPlanner(self, max_workers=max_concurrency, limit=limit)
+        return await planner.run_async(start_time, end_time, social_profile_ids, state)
+
+    async def export_outbound_messages(
+        self,
+        path: str,
+        start_time: datetime,
+        end_time: datetime,
+        state: MessageState = None,
+        social_profile_ids: List[int] = None,
+        format: str = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limit: int = 100,
+    ) -> int:
+        """Export every outbound message in a time range to a Parquet, Arrow IPC
+        or CSV file.
+
+        Takes the arguments of
+        :meth:`hootsweet.api.HootSweet.export_outbound_messages`. The file is
+        written in a worker thread, which pulls pages from the event loop one
+        at a time.
+
+        """
+        params = _outbound_messages_params(
+            start_time, end_time, state, social_profile_ids, limit
+        )
+        pages = self._iter_outbound_pages(params)
+        loop = asyncio.get_event_loop()
+
+        def messages():
+            while True:
+                page = asyncio.run_coroutine_threadsafe(pages.__anext__(), loop)
+                try:
+                    yield from page.result()
+                except StopAsyncIteration:
+                    return
+
+        try:
+            return await loop.run_in_executor(
+                None,
+                lambda: export_messages(
+                    messages(), path, format=format, batch_size=batch_size
+                ),
+            )
+        finally:
+            await pages.aclose()
+
+    @invalidates("get_message", "get_message_review_history")
+    async def delete_message(self, message_id: str) -> Dict[str, Any]:
+        result = await self._make_request("messages/%s" % message_id, method="DELETE")
+        if self.idempotency is not None:
+            self.idempotency.forget_message(message_id)
+        return result
+
+    async def review_messages(
+        self,
+        reviews: Iterable[Review],
+        reviewer_type: Reviewer = Reviewer.MEMBER,
+        reason: str = None,
+        max_concurrency: int = DEFAULT_MAX_WORKERS,
+        max_conflict_retries: int = 2,
+    ) -> List[ReviewOutcome]:
+        """Approve and reject many messages with bounded concurrency.
+
+        See :meth:`hootsweet.api.HootSweet.review_messages`.
+
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def review_message(review):
+            async with semaphore:
+                return await self._review_message(
+                    review, reviewer_type, reason, max_conflict_retries
+                )
+
+        return await asyncio.gather(
+            *[review_message(review) for review in reviews], return_exceptions=True
+        )
+
+    async def _review_message(
+        self,
+        review: Review,
+        reviewer_type: Reviewer,
+        reason: str,
+        max_conflict_retries: int,
+    ) -> ReviewOutcome:
+        outcome = parse_review(review, reason)
+        while True:
+            outcome.attempts += 1
+            try:
+                if outcome.decision is ReviewDecision.APPROVE:
+                    outcome.result = await self.approve_message(
+                        outcome.message_id, outcome.sequence_number, reviewer_type
+                    )
+                else:
+                    outcome.result = await self.reject_message(
+                        outcome.message_id,
+                        outcome.reason,
+                        outcome.sequence_number,
+                        reviewer_type,
+                    )
+                outcome.error = None
+                return outcome
+            except Exception as exc:
+                outcome.error = exc
+                if not is_sequence_conflict(exc):
+                    return outcome
+                if outcome.attempts > max_conflict_retries:
+                    return outcome
+
+            try:
+                sequence_number = await self._current_sequence_number(
+                    outcome.message_id
+                )
+            except Exception as exc:
+                outcome.error = exc
+                return outcome
+            if sequence_number in (None, outcome.sequence_number):
+                return outcome
+            outcome.sequence_number = sequence_number
+
+    async def _current_sequence_number(self, message_id: str) -> Optional[int]:
+        if self.cache is not None:
+            self.cache.invalidate("get_message_review_history", (message_id,))
+        history = await self.get_message_review_history(message_id)
+        return latest_sequence_number(history)
+
+    async def upload_media(
+        self,
+        source: MediaSource,
+        mime_type: str = None,
+        timeout: float = 300,
+        poll_interval: float = 1.0,
+    ) -> Dict[str, Any]:
+        """Upload a media file to Hootsuite and wait until it is ready.
+
+        See :meth:`hootsweet.api.HootSweet.upload_media`.
+
+        """
+        media_id, _ = await self._upload_media_file(source, mime_type)
+        return await self.wait_for_media(media_id, timeout, poll_interval)
+
+    async def upload_media_batch(
+        self,
+        sources: Iterable[MediaItem],
+        max_concurrency: int = 4,
+        timeout: float = 300,
+        poll_interval: float = 1.0,
+        progress_cb: Callable[[MediaUploadResult], Any] = None,
+    ) -> List[MediaUploadResult]:
+        """Upload many media files concurrently and wait until they are ready.
+
+        See :meth:`hootsweet.api.HootSweet.upload_media_batch`.
+
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def upload(item):
+            source, mime_type = split_media_item(item)
+            result = MediaUploadResult(source)
+            try:
+                async with semaphore:
+                    started = time.monotonic()
+                    uploaded = await self._upload_media_file(source, mime_type)
+                    result.media_id, result.size = uploaded
+                    result.upload_seconds = time.monotonic() - started
+            except Exception as exc:
+                result.finish(error=exc)
+                if progress_cb is not None:
+                    progress_cb(result)
+            return result
+
+        async def poll(media_id):
+            async with semaphore:
+                return await self.get_media_upload_status(media_id)
+
+        results = await asyncio.gather(*[upload(item) for item in sources])
+        pending = {r.media_id: r for r in results if r.error is None}
+
+        deadline = time.monotonic() + timeout
+        for delay in poll_delays(poll_interval):
+            media_ids = list(pending)
+            statuses = await asyncio.gather(
+                *[poll(media_id) for media_id in media_ids], return_exceptions=True
+            )
+            for media_id, status in zip(media_ids, statuses):
+                if pending[media_id].settle(status):
+                    result = pending.pop(media_id)
+                    if progress_cb is not None:
+                        progress_cb(result)
+
+            if not pending:
+                break
+            if time.monotonic() + delay > deadline:
+                for result in pending.values():
+                    result.time_out(timeout)
+                    if progress_cb is not None:
+                        progress_cb(result)
+                break
+            await asyncio.sleep(delay)
+
+        return results
+
+    async def _upload_media_file(self, source: MediaSource, mime_type: str = None):
+        mime_type = resolve_mime_type(source, mime_type)
+        with open_media(source) as (body, size):
+            upload = await self.create_media_upload_url(size, mime_type)
+            await self._put_media(upload["uploadUrl"], body, size, mime_type)
+        return upload["id"], size
+
+    async def _put_media(self, upload_url: str, body, size: int, mime_type: str):
+        headers = {"Content-Type": mime_type, "Content-Length": str(size)}
+
+        async def chunks():
+            for chunk in iter_chunks(body):
+                yield chunk
+
+        response = await self.client.put(upload_url, content=chunks(), headers=headers)
+        if not response.status_code == 200:
+            raise detect_and_raise_error(response)
+
+    async def wait_for_media(
+        self, media_id: str, timeout: float = 300, poll_interval: float = 1.0
+    ) -> Dict[str, Any]:
+        """Poll the status of a media upload until it is ready.
+
+        See :meth:`hootsweet.api.HootSweet.wait_for_media`.
+
+        """
+        deadline = time.monotonic() + timeout
+        for delay in poll_delays(poll_interval):
+            status = await self.get_media_upload_status(media_id)
+            state = status.get("state")
+            if state == READY:
+                return status
+            if state == FAILED:
+                raise MediaUploadFailed("Media %s failed to upload." % media_id)
+            if time.monotonic() + delay > deadline:
+                raise MediaUploadTimeout(
+                    "Media %s was not ready after %ss." % (media_id, timeout)
+                )
+            await asyncio.sleep(delay)
+
+    async def _ensure_fresh_token(self):
+        expires_at = self.expires_at
+        if expires_at is None:
+            return
+
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            await self.refresh_token()
+        elif remaining <= self._refresh_margin() and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.ensure_future(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh_token()
+        except Exception:
+            log.exception("Background token refresh failed.")
+
+    async def _send(
+        self, method: str, url: str, *args, event=None, **kwargs
+    ) -> httpx.Response:
+        if self.rate_limiter is None:
+            return await self._send_once(method, url, **kwargs)
+
+        attempt = 0
+        while True:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            response = await self._send_once(method, url, **kwargs)
+            self.rate_limiter.update(response.headers)
+            delay = self.rate_limiter.retry_delay(
+                response.status_code,
+                response.headers,
+                attempt,
+                idempotent=method in IDEMPOTENT_METHODS,
+            )
+            if delay is None:
+                return response
+            log.debug(
+                "Retrying %s %s after %s in %.2fs."
+                % (method, url, response.status_code, delay)
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+            if event is not None:
+                event.retries += 1
+
+    async def _send_once(self, method: str, url: str, **kwargs) -> httpx.Response:
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Authorization"] = "Bearer %s" % self.token.get("access_token")
+
+        # requests sends str/bytes ``data`` as the raw body, httpx wants ``content``
+        data = kwargs.get("data")
+        if isinstance(data, (str, bytes)):
+            kwargs["content"] = kwargs.pop("data")
+
+        return await self.client.request(method, url, headers=headers, **kwargs)
+
+    async def _make_request(self, resource, *args, **kwargs) -> Dict[str, Any]:
+        if self.singleflight is not None and not args:
+            key = self._flight_key(resource, kwargs)
+            if key is not None:
+                return await self.singleflight.do(
+                    key, lambda: self._request(resource, **kwargs)
+                )
+        return await self._request(resource, *args, **kwargs)
+
+    async def _request(self, resource, *args, **kwargs) -> Dict[str, Any]:
+        url = "%s/%s" % (self.api_url, resource)
+
+        if self.timeout is not None and "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+
+        await self._ensure_fresh_token()
+
+        method = kwargs.pop("method", "POST" if "data" in kwargs else "GET")
+        envelope = kwargs.pop("envelope", False)
+        revalidation_key = self._add_conditional_headers(method, url, kwargs)
+        self._encode_json(kwargs)
+        event = self._before_request(method, resource, url)
+        response = error = None
+        try:
+            access_token = self.token.get("access_token")
+            response = await self._send(method, url, event=event, **kwargs)
+
+            if response.status_code == 401:
+                if self.token.get("access_token") == access_token:
+                    await self.refresh_token()
+                if event is not None:
+                    event.retries += 1
+                response = await self._send(method, url, event=event, **kwargs)
+
+            body = self._stored_payload(response, revalidation_key)
+            if response.status_code == 304 and body is None:
+                _drop_conditional_headers(kwargs)
+                if event is not None:
+                    event.retries += 1
+                response = await self._send(method, url, event=event, **kwargs)
+
+            return self._parse_response(
+                method, response, envelope, revalidation_key, body
+            )
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            if event is not None:
+                self._after_request(event, response, error)
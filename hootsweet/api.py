@@ -7,28 +7,86 @@ API.
 
 """
 
-import json
 import logging
-from datetime import datetime
-from typing import Any, Dict, List, Tuple
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
-from hootsweet.constants import ALLOWED_MIME_TYPES, MessageState, Reviewer
+from hootsweet.adapters import PoolAdapter
+from hootsweet.batch import DEFAULT_MAX_WORKERS, run_concurrently
+from hootsweet.cache import (
+    CONDITIONAL_HEADERS,
+    ResponseCache,
+    RevalidationStore,
+    cached,
+    invalidates,
+)
+from hootsweet.coalesce import SingleFlight, flight_key
+from hootsweet.codec import JSONCodec, default_codec, is_json
+from hootsweet.constants import (
+    ALLOWED_MIME_TYPES,
+    MessageState,
+    ReviewDecision,
+    Reviewer,
+)
 from hootsweet.exceptions import (
     InvalidLanguage,
     InvalidTimezone,
+    MediaUploadFailed,
+    MediaUploadTimeout,
     MIMETypeNotAllowed,
     detect_and_raise_error,
 )
+from hootsweet.export import DEFAULT_BATCH_SIZE
+from hootsweet.instrumentation import (
+    RequestEvent,
+    RequestHook,
+    endpoint_template,
+    finish_event,
+)
 from hootsweet.locale import is_valid_language, is_valid_timezone
+from hootsweet.models import (
+    MediaUpload,
+    Member,
+    Message,
+    Organization,
+    SocialProfile,
+    returns,
+)
+from requests import Response
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from requests_oauthlib import OAuth2Session
 
+if TYPE_CHECKING:  # pragma: no cover
+    # Feature modules are imported by the methods using them so that importing
+    # the client stays cheap
+    from hootsweet.idempotency import IdempotencyIndex
+    from hootsweet.media import MediaItem, MediaSource, MediaUploadResult
+    from hootsweet.ratelimit import RateLimiter
+    from hootsweet.review import Review, ReviewOutcome
+    from hootsweet.tokens import TokenStore
+
 HOOTSUITE_BASE_URL = "https://platform.hootsuite.com"
 HOOTSUITE_AUTHORIZATION_URL = "%s/oauth2/auth" % HOOTSUITE_BASE_URL
 HOOTSUITE_TOKEN_URL = "%s/oauth2/token" % HOOTSUITE_BASE_URL
 API_VERSION = "v1"
 API_URL = "%s/%s" % (HOOTSUITE_BASE_URL, API_VERSION)
 ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+REFRESH_MARGIN = 300
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE", "OPTIONS"])
 
 log = logging.getLogger(__name__)
 
@@ -37,9 +95,69 @@ def default_refresh_cb(token: Dict):
     return token
 
 
+def _with_expires_at(token: Dict[str, Any]) -> Dict[str, Any]:
+    # Shared tokens need an absolute expiry, ``expires_in`` is relative to
+    # when the token was issued.
+    if "expires_in" in token and "expires_at" not in token:
+        token = dict(token, expires_at=time.time() + token["expires_in"])
+    return token
+
+
+def _outbound_messages_params(
+    start_time: datetime,
+    end_time: datetime,
+    state: MessageState = None,
+    social_profile_ids: List[int] = None,
+    limit: int = 50,
+    include_unscheduled_review_messages: bool = None,
+) -> Dict[str, Any]:
+    params = {}
+
+    assert isinstance(start_time, datetime), "start_time must be a datetime"
+    params["startTime"] = start_time.strftime(ISO_FORMAT)
+
+    assert isinstance(end_time, datetime), "end_time must be a datetime"
+    params["endTime"] = end_time.strftime(ISO_FORMAT)
+
+    params["limit"] = limit
+
+    if state is not None:
+        params["state"] = state.name
+
+    if social_profile_ids is not None:
+        params["socialProfileIds"] = social_profile_ids
+
+    if include_unscheduled_review_messages is not None:
+        params["includeUnscheduledReviewMsgs"] = include_unscheduled_review_messages
+
+    return params
+
+
+def _drop_conditional_headers(kwargs):
+    headers = kwargs.get("headers")
+    if headers:
+        kwargs["headers"] = {
+            name: value
+            for name, value in headers.items()
+            if name not in CONDITIONAL_HEADERS
+        }
+        if not kwargs["headers"]:
+            del kwargs["headers"]
+
+
+def _next_cursor(page: Dict[str, Any]) -> Optional[str]:
+    # Paginated responses carry the next page cursor as {"cursor": {"next": ...}}
+    cursor = page.get("cursor") or {}
+    return cursor.get("next")
+
+
 class HootSweet:
     """A client for interacting with the Hootsuite REST API.
 
+    A single client can be shared between many threads. Token state is lock
+    protected and concurrent token refreshes share one request, set
+    ``pool_maxsize`` to at least the number of threads sharing the client.
+
     Args:
         client_id (str): A Hootsuite client id.
         client_secret (str): A Hootsuite client secret.
@@ -48,6 +166,42 @@ class HootSweet:
         redirect_uri (str): The callback uri registered with Hootsuite.
         scope (str): The OAuth2 scope.
         refresh_cb (callable): A function to be called when a token is refreshed.
+        rate_limiter (RateLimiter): Schedules requests against a token bucket and
+            retries 429 and 5xx responses with backoff. Share one instance
+            between clients to share a quota.
+        refresh_margin (float): Seconds before the token expires to refresh it
+            in the background. Defaults to a tenth of the token lifetime, at
+            most five minutes.
+        pool_connections (int): Number of host connection pools to cache.
+        pool_maxsize (int): Maximum number of pooled connections per host.
+        pool_block (bool): Wait for a free pooled connection instead of opening
+            one that is discarded after use.
+        tcp_keepalive (bool): Enable TCP keep-alive probes on pooled
+            connections.
+        cache (ResponseCache): Caches the responses of read-mostly endpoints.
+        revalidation_store (RevalidationStore): Stores ETag and Last-Modified
+            validators of GET responses and sends conditional requests, a
+            ``304 Not Modified`` returns the stored payload.
+        instrumentation (List[RequestHook]): Hooks called before and after
+            every API request.
+        base_url (str): The Hootsuite platform url. Override it to point the
+            client at a proxy or a local stand-in server.
+        json_codec (JSONCodec): Decodes response bodies and encodes request
+            bodies. Defaults to orjson or msgspec when installed, otherwise the
+            standard library.
+        models (bool): Return typed, slotted models from
+            :mod:`hootsweet.models` instead of dictionaries. Defaults to False.
+        coalesce (bool): Share one HTTP call between identical GET requests
+            in flight at the same time. Defaults to False.
+        token_store (TokenStore): Shares the token with other clients and
+            processes. A stored token is used instead of ``token`` and only one
+            client sharing the store refreshes at a time.
+        adapter (HTTPAdapter): A transport adapter to mount instead of a new
+            PoolAdapter, to share one connection pool between clients. The
+            pool and keep-alive arguments are then ignored.
+        idempotency (IdempotencyIndex): Deduplicates scheduled messages by
+            content and retries schedule requests failing with a 5xx or a
+            connection error without posting a message twice.
 
     """
 
@@ -59,10 +213,52 @@ class HootSweet:
         redirect_uri: str = None,
         scope: str = "offline",
         refresh_cb=None,
+        rate_limiter: "RateLimiter" = None,
+        refresh_margin: float = None,
+        pool_connections: int = DEFAULT_POOLSIZE,
+        pool_maxsize: int = DEFAULT_POOLSIZE,
+        pool_block: bool = DEFAULT_POOLBLOCK,
+        tcp_keepalive: bool = False,
+        cache: ResponseCache = None,
+        revalidation_store: RevalidationStore = None,
+        instrumentation: List[RequestHook] = None,
+        base_url: str = HOOTSUITE_BASE_URL,
+        json_codec: JSONCodec = None,
+        models: bool = False,
+        coalesce: bool = False,
+        token_store: "TokenStore" = None,
+        adapter: HTTPAdapter = None,
+        idempotency: "IdempotencyIndex" = None,
         **kwargs,
     ):
         self.client_id, self.client_secret = client_id, client_secret
+        self.base_url = base_url.rstrip("/")
+        self.api_url = "%s/%s" % (self.base_url, API_VERSION)
+        self.token_url = "%s/oauth2/token" % self.base_url
+        self.auth_url = "%s/oauth2/auth" % self.base_url
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.revalidation_store = revalidation_store
+        self.instrumentation = list(instrumentation or [])
+        self.json_codec = json_codec if json_codec is not None else default_codec()
+        self.models = models
+        self.singleflight = SingleFlight() if coalesce else None
+        self.token_store = token_store
+        self.idempotency = idempotency
+        self._schedule_flight = SingleFlight() if idempotency is not None else None
+        self.refresh_margin = refresh_margin
+        self._token_lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_flight = None
+        self._expiry_token = None
+        self._expires_at = self._expires_in = None
         token = token or {}
+        if token_store is not None:
+            stored = token_store.load()
+            if stored:
+                token = stored
+            elif token:
+                token_store.save(_with_expires_at(token))
 
         self.refresh_cb = refresh_cb
         if self.refresh_cb is None:
@@ -73,16 +269,36 @@ class HootSweet:
             client_id,
             token=token,
             redirect_uri=redirect_uri,
-            auto_refresh_url=HOOTSUITE_TOKEN_URL,
+            auto_refresh_url=self.token_url,
             scope=self.scope,
             token_updater=self.refresh_cb,
         )
+        if adapter is None:
+            adapter = PoolAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block,
+                tcp_keepalive=tcp_keepalive,
+            )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.timeout = kwargs.get("timeout", None)
 
     def __getattr__(self, name):
         # Proxies any attributes from HootSweet to OAuth2Session
         return getattr(self.session, name)
 
+    @property
+    def token(self) -> Dict[str, Any]:
+        """ The current OAuth2 token."""
+        with self._token_lock:
+            return self.session.token
+
+    @token.setter
+    def token(self, value: Dict[str, Any]):
+        with self._token_lock:
+            self.session.token = value
+
     def authorization_url(self, state: str = None, **kwargs) -> Tuple[str, str]:
         """Get a Hootsuite authorization url.
 
@@ -91,7 +307,7 @@ class HootSweet:
                 state between the request and callback.
 
         """
-        return self.session.authorization_url(HOOTSUITE_AUTHORIZATION_URL, state=state)
+        return self.session.authorization_url(self.auth_url, state=state)
 
     def fetch_token(self, code: str) -> Dict[str, Any]:
         """Fetch a Hootsuite OAuth2 token.
@@ -101,60 +317,326 @@ class HootSweet:
 
         """
         return self.session.fetch_token(
-            HOOTSUITE_TOKEN_URL,
+            self.token_url,
             client_secret=self.client_secret,
             code=code,
             scope=self.scope,
         )
 
-    def refresh_token(self) -> Dict[str, Any]:
-        """ Refresh the OAuth2 token and call token updater."""
+    def refresh_token(self, stale_access_token: str = None) -> Dict[str, Any]:
+        """Refresh the OAuth2 token and call token updater.
+
+        Concurrent callers share a single in-flight refresh and all receive the
+        token it returns.
+
+        Args:
+            stale_access_token (str): The access token the caller found
+                expired. When the token changed since, it is returned without
+                refreshing. Defaults to the current access token.
+
+        """
+        if stale_access_token is None:
+            stale_access_token = self.token.get("access_token")
+        with self._refresh_lock:
+            if self.token.get("access_token") != stale_access_token:
+                return self.token
+            flight = self._refresh_flight
+            leader = flight is None
+            if leader:
+                flight = self._refresh_flight = Future()
+
+        if not leader:
+            return flight.result()
+        return self._lead_refresh(flight, stale_access_token)
+
+    def _lead_refresh(self, flight: Future, stale_access_token: str) -> Dict[str, Any]:
+        try:
+            token = self._refresh_token(stale_access_token)
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        else:
+            flight.set_result(token)
+        finally:
+            with self._refresh_lock:
+                self._refresh_flight = None
+        return token
+
+    def _refresh_token(self, stale_access_token: str) -> Dict[str, Any]:
+        if self.token_store is None:
+            return self._request_refresh()
+
+        with self.token_store.lock():
+            stored = self.token_store.load()
+            if stored and stored.get("access_token") != stale_access_token:
+                log.debug("Using the token refreshed by another client.")
+                self.token = stored
+                return stored
+
+            token = self._request_refresh()
+            self.token_store.save(_with_expires_at(token))
+        return token
+
+    def _request_refresh(self) -> Dict[str, Any]:
         log.debug("Refreshing access token.")
         token = {}
         if self.refresh_cb:
             token = self.session.refresh_token(
-                HOOTSUITE_TOKEN_URL,
+                self.token_url,
                 auth=HTTPBasicAuth(self.client_id, self.client_secret),
             )
+            # refresh_token stores the new token on the session as it returns,
+            # store it again under the lock so readers see a consistent token
+            self.token = token
             log.debug("Calling refresh callback %s." % self.refresh_cb.__name__)
             self.refresh_cb(token)
         return token
 
+    @property
+    def expires_at(self) -> Optional[float]:
+        """The time the access token expires as a unix timestamp, or None when
+        the token does not say when it expires.
+
+        """
+        with self._token_lock:
+            token = self.token or {}
+            if token is not self._expiry_token:
+                # Tokens returned by oauthlib carry ``expires_at``. Otherwise
+                # ``expires_in`` is relative to when the token was first seen.
+                self._expiry_token = token
+                self._expires_at = token.get("expires_at")
+                self._expires_in = token.get("expires_in")
+                if self._expires_at is None and self._expires_in is not None:
+                    self._expires_at = time.time() + self._expires_in
+            return self._expires_at
+
+    def _refresh_margin(self) -> float:
+        if self.refresh_margin is not None:
+            return self.refresh_margin
+        if self._expires_in:
+            return min(REFRESH_MARGIN, self._expires_in * 0.1)
+        return REFRESH_MARGIN
+
+    def _ensure_fresh_token(self):
+        # Refreshes an expired token before the request is sent and starts a
+        # background refresh when the token is about to expire, so requests
+        # never wait on a refresh or a wasted 401 round trip.
+        access_token = self.token.get("access_token")
+        expires_at = self.expires_at
+        if expires_at is None:
+            return
+
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            self.refresh_token(access_token)
+        elif remaining <= self._refresh_margin() and self._refresh_flight is None:
+            self._start_background_refresh(access_token)
+
+    def _start_background_refresh(self, stale_access_token: str):
+        # The flight is claimed before the thread starts, so requests arriving
+        # meanwhile do not start threads of their own.
+        with self._refresh_lock:
+            if (
+                self._refresh_flight is not None
+                or self.token.get("access_token") != stale_access_token
+            ):
+                return
+            flight = self._refresh_flight = Future()
+        thread = threading.Thread(
+            target=self._background_refresh,
+            args=(flight, stale_access_token),
+            daemon=True,
+        )
+        thread.start()
+
+    def _background_refresh(self, flight: Future, stale_access_token: str):
+        try:
+            self._lead_refresh(flight, stale_access_token)
+        except Exception:
+            log.exception("Background token refresh failed.")
+
+    def _send(self, method: str, url: str, *args, event=None, **kwargs) -> Response:
+        # Sends a request through the rate limiter, if there is one, retrying
+        # throttled and failed responses with backoff.
+        if self.rate_limiter is None:
+            return self.request(method, url, *args, **kwargs)
+
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            response = self.request(method, url, *args, **kwargs)
+            self.rate_limiter.update(response.headers)
+            delay = self.rate_limiter.retry_delay(
+                response.status_code,
+                response.headers,
+                attempt,
+                idempotent=method in IDEMPOTENT_METHODS,
+            )
+            if delay is None:
+                return response
+            log.debug(
+                "Retrying %s %s after %s in %.2fs."
+                % (method, url, response.status_code, delay)
+            )
+            time.sleep(delay)
+            attempt += 1
+            if event is not None:
+                event.retries += 1
+
     def _make_request(self, resource, *args, **kwargs) -> Dict[str, Any]:
-        url = "%s/%s" % (API_URL, resource)
+        if self.singleflight is not None and not args:
+            key = self._flight_key(resource, kwargs)
+            if key is not None:
+                return self.singleflight.do(
+                    key, lambda: self._request(resource, **kwargs)
+                )
+        return self._request(resource, *args, **kwargs)
+
+    def _flight_key(self, resource: str, kwargs) -> Optional[str]:
+        # Only plain GET requests are coalesced, None for any other request
+        method = kwargs.get("method", "POST" if "data" in kwargs else "GET")
+        if method != "GET" or set(kwargs) - {"method", "params", "envelope"}:
+            return None
+        url = "%s/%s" % (self.api_url, resource)
+        return flight_key(url, kwargs.get("params"), kwargs.get("envelope", False))
+
+    def _request(self, resource, *args, **kwargs) -> Dict[str, Any]:
+        url = "%s/%s" % (self.api_url, resource)
 
         if self.timeout is not None and "timeout" not in kwargs:
             kwargs["timeout"] = self.timeout
 
-        expires_in = self.token.get("expires_in", 0)
-        if expires_in <= 0:
-            self.refresh_token()
+        self._ensure_fresh_token()
 
         method = kwargs.pop("method", "POST" if "data" in kwargs else "GET")
-        response = self.request(method, url, *args, **kwargs)
-
-        if response.status_code == 401:
-            self.refresh_token()
-            response = self.request(method, url, *args, **kwargs)
-
-        if not response.status_code == 200:
-            raise detect_and_raise_error(response)
-        else:
+        envelope = kwargs.pop("envelope", False)
+        revalidation_key = self._add_conditional_headers(method, url, kwargs)
+        self._encode_json(kwargs)
+        event = self._before_request(method, resource, url)
+        response = error = None
+        try:
+            access_token = self.token.get("access_token")
+            response = self._send(method, url, *args, event=event, **kwargs)
+
+            if response.status_code == 401:
+                # Skipped if another caller refreshed while we waited
+                self.refresh_token(access_token)
+                if event is not None:
+                    event.retries += 1
+                response = self._send(method, url, *args, event=event, **kwargs)
+
+            body = self._stored_payload(response, revalidation_key)
+            if response.status_code == 304 and body is None:
+                # The stored payload expired after its validators were sent
+                _drop_conditional_headers(kwargs)
+                if event is not None:
+                    event.retries += 1
+                response = self._send(method, url, *args, event=event, **kwargs)
+
+            return self._parse_response(
+                method, response, envelope, revalidation_key, body
+            )
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            if event is not None:
+                self._after_request(event, response, error)
+
+    def _before_request(self, method: str, resource: str, url: str):
+        # Returns the event passed to the instrumentation hooks, None when
+        # there are no hooks so uninstrumented clients pay nothing.
+        if not self.instrumentation:
+            return None
+
+        event = RequestEvent(method, endpoint_template(resource), url)
+        for hook in self.instrumentation:
+            try:
+                hook.before_request(event)
+            except Exception:
+                log.exception("Instrumentation hook %r failed." % hook)
+        return event
+
+    def _after_request(self, event: RequestEvent, response, error: Exception):
+        finish_event(event, response, error)
+        for hook in self.instrumentation:
+            try:
+                hook.after_request(event)
+            except Exception:
+                log.exception("Instrumentation hook %r failed." % hook)
+
+    def _add_conditional_headers(self, method: str, url: str, kwargs) -> Optional[str]:
+        # Adds the validators stored for a GET request to its headers and
+        # returns the key its response should be stored under.
+        if self.revalidation_store is None or method != "GET":
+            return None
+
+        key = self.revalidation_store.key(url, kwargs.get("params"))
+        conditional_headers = self.revalidation_store.conditional_headers(key)
+        if conditional_headers:
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **conditional_headers)
+        return key
+
+    def _encode_json(self, kwargs):
+        # Encodes a ``json`` body once with the client's codec, so it is not
+        # encoded again when the request is retried.
+        if kwargs.get("json") is None:
+            return
+
+        kwargs["data"] = self.json_codec.dumps(kwargs.pop("json"))
+        headers = dict(kwargs.get("headers") or {})
+        headers.setdefault("Content-Type", "application/json")
+        kwargs["headers"] = headers
+
+    def _decode_json(self, response) -> Any:
+        # JSON bodies are decoded straight from bytes, skipping the charset
+        # detection of ``response.json()``.
+        if is_json(response):
+            return self.json_codec.loads(response.content)
+        return response.json()
+
+    def _stored_payload(self, response, revalidation_key: str = None) -> Any:
+        # The stored payload of a 304 response, None for any other response or
+        # when the payload is gone.
+        if response.status_code != 304 or revalidation_key is None:
+            return None
+        return self.revalidation_store.payload(revalidation_key)
+
+    def _parse_response(
+        self,
+        method: str,
+        response,
+        envelope: bool,
+        revalidation_key: str = None,
+        body: Any = None,
+    ) -> Dict[str, Any]:
+        if body is None:
+            if not response.status_code == 200:
+                raise detect_and_raise_error(response)
             if method == "DELETE":
                 return {}
-            else:
-                return response.json()["data"]
+            body = self._decode_json(response)
+            if revalidation_key is not None:
+                self.revalidation_store.store(revalidation_key, response.headers, body)
+
+        return body if envelope else body["data"]
 
+    @returns(Member)
+    @cached
     def get_me(self) -> Dict:
         """ Retrieve the currently authenticated member."""
         resource = "me"
         return self._make_request(resource)
 
+    @returns(Organization)
+    @cached
     def get_me_organizations(self) -> Dict:
         """ Retrieve the organizations that the authenticated member is in."""
         resource = "me/organizations"
         return self._make_request(resource)
 
+    @returns(SocialProfile)
+    @cached
     def get_me_social_profiles(self) -> Dict:
         """Retrieve the social media profiles that the authenticated user has
         basic usage permissions on.
@@ -163,6 +645,8 @@ class HootSweet:
         resource = "me/socialProfiles"
         return self._make_request(resource)
 
+    @returns(SocialProfile)
+    @cached
     def get_social_profiles(self) -> Dict:
         """Retrieve the social profiles that the authenticated user has access to.
 
@@ -170,6 +654,8 @@ class HootSweet:
         resource = "socialProfiles"
         return self._make_request(resource)
 
+    @returns(SocialProfile)
+    @cached
     def get_social_profile(self, profile_id: int) -> Dict:
         """Retrieve a social profile.
 
@@ -180,6 +666,7 @@ class HootSweet:
         resource = "socialProfiles/%s" % profile_id
         return self._make_request(resource)
 
+    @cached
     def get_social_profile_teams(self, profile_id: int) -> List:
         """ Retrieve a list of team IDs with access to a social profile.
 
@@ -190,6 +677,8 @@ class HootSweet:
         resource = "socialProfiles/%s/teams" % profile_id
         return self._make_request(resource)
 
+    @returns(Member)
+    @cached
     def get_member(self, member_id: str) -> Dict[str, Any]:
         """Retrieve a member.
 
@@ -200,6 +689,7 @@ class HootSweet:
         resource = "members/%s" % member_id
         return self._make_request(resource)
 
+    @returns(Member)
     def create_member(
         self,
         full_name: str,
@@ -246,6 +736,8 @@ class HootSweet:
 
         return self._make_request(resource, data=data)
 
+    @returns(Organization)
+    @cached
     def get_member_organizations(self, member_id: str) -> List[Dict[str, Any]]:
         """Retrieve the organizations that the member is in.
 
@@ -256,6 +748,7 @@ class HootSweet:
         resource = "members/%s/organizations" % member_id
         return self._make_request(resource)
 
+    @returns(Message)
     def schedule_message(
         self, text: str, social_profile_ids: List[str], send_time: datetime, **kwargs,
     ):
@@ -267,6 +760,10 @@ class HootSweet:
                 will publish the message.
             send_time (datetime): Time to send the message in UTC time.
 
+        With an ``idempotency`` index a message with the same text, social
+        profiles, send time and media as one scheduled recently is not sent
+        again, the messages already scheduled are returned.
+
         """
         resource = "messages"
         assert isinstance(send_time, datetime), "send_time must be a datetime"
@@ -280,8 +777,121 @@ class HootSweet:
             "emailNotification": False,
         }
         data.update(kwargs)
-        return self._make_request(resource, method="POST", json=data)
+        if self.idempotency is None:
+            return self._make_request(resource, method="POST", json=data)
+
+        from hootsweet.idempotency import fingerprint
+
+        # Identical messages scheduled at the same time share one request
+        key = fingerprint(text, social_profile_ids, send_time, kwargs.get("media"))
+        return self._schedule_flight.do(
+            key, lambda: self._schedule_idempotently(key, data, send_time)
+        )
+
+    def _schedule_idempotently(
+        self, key: str, data: Dict[str, Any], send_time: datetime
+    ) -> List[Dict[str, Any]]:
+        from hootsweet.idempotency import AMBIGUOUS_ERRORS
+
+        index = self.idempotency
+        attempt = 0
+        while True:
+            messages = index.get(key)
+            if messages is not None:
+                return messages
+            if attempt or index.is_uncertain(key):
+                # A failed request, maybe from an earlier call, may have
+                # scheduled the message
+                messages = self.find_scheduled_messages(
+                    data["text"], data["socialProfileIds"], send_time, data.get("media")
+                )
+                if messages:
+                    index.add(key, messages, found=True)
+                    return messages
+
+            attempt += 1
+            try:
+                messages = self._make_request("messages", method="POST", json=data)
+            except AMBIGUOUS_ERRORS as exc:
+                index.mark_uncertain(key)
+                delay = index.retry_delay(attempt)
+                if delay is None:
+                    raise
+                log.debug("Retrying schedule after %r in %.2fs." % (exc, delay))
+                time.sleep(delay)
+                continue
+            index.add(key, messages)
+            return messages
+
+    def find_scheduled_messages(
+        self,
+        text: str,
+        social_profile_ids: List[str],
+        send_time: datetime,
+        media: List[Dict[str, Any]] = None,
+        window: timedelta = None,
+    ) -> List[Dict[str, Any]]:
+        """Find the outbound messages scheduled with a text and media on some
+        social profiles around a send time, e.g. to check whether a schedule
+        request that failed without a response was acted on.
+
+        Args:
+            text (str): The text of the message.
+            social_profile_ids (List[str]): The ids of the social profiles.
+            send_time (datetime): Time the message was scheduled for in UTC.
+            media (List[Dict]): The media of the message, ``{"id": ...}``
+                dictionaries or ids.
+            window (timedelta): How far around ``send_time`` messages are
+                searched for. Defaults to the ``lookup_window`` of the client's
+                IdempotencyIndex, or 1 minute.
+
+        """
+        from hootsweet.idempotency import matching_messages
+
+        params = self._lookup_params(social_profile_ids, send_time, window)
+        messages = self._make_request("messages", params=params)
+        return matching_messages(messages, text, social_profile_ids, media)
+
+    def _lookup_params(
+        self, social_profile_ids: List[str], send_time: datetime, window: timedelta
+    ) -> Dict[str, Any]:
+        from hootsweet.idempotency import DEFAULT_LOOKUP_WINDOW
+
+        if window is None:
+            index = self.idempotency
+            window = index.lookup_window if index is not None else DEFAULT_LOOKUP_WINDOW
+        return _outbound_messages_params(
+            send_time - window,
+            send_time + window,
+            social_profile_ids=social_profile_ids,
+            limit=100,
+        )
 
+    def schedule_messages(
+        self, batch: Iterable[Dict[str, Any]], max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> List[Any]:
+        """Schedule many messages with bounded concurrency.
+
+        Requests go through the client's rate limiter when it has one. A failed
+        message does not stop the rest of the batch.
+
+        Args:
+            batch (Iterable[Dict]): Message specs, each a dictionary of keyword
+                arguments for :meth:`schedule_message`, e.g. ``text``,
+                ``social_profile_ids``, ``send_time`` and ``media``.
+            max_workers (int): Maximum number of messages submitted at once.
+                Defaults to 8.
+
+        Returns:
+            A list in the same order as ``batch`` holding the scheduled message
+            data, or the exception raised, for each spec.
+
+        """
+        return run_concurrently(
+            lambda spec: self.schedule_message(**spec), batch, max_workers
+        )
+
+    @returns(Message)
     def get_outbound_messages(
         self,
         start_time: datetime,
@@ -308,27 +918,161 @@ class HootSweet:
         """
 
         resource = "messages"
-        params = {}
+        params = _outbound_messages_params(
+            start_time,
+            end_time,
+            state,
+            social_profile_ids,
+            limit,
+            include_unscheduled_review_messages,
+        )
+        return self._make_request(resource, params=params)
+
+    def iter_outbound_messages(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        state: MessageState = None,
+        social_profile_ids: List[int] = None,
+        limit: int = 50,
+        include_unscheduled_review_messages: bool = None,
+        prefetch: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """Lazily iterate over every outbound message in a time range.
+
+        Follows the cursor returned with each page until the last page. Only the
+        current page, and the next one when prefetching, is held in memory.
+
+        Args:
+            start_time (datetime): The start date range of the messages returned.
+            end_time (datetime): The end date range of the messages returned.
+            state (MessageState): The state of the messages returned.
+            social_profile_ids (List[int]): The ids of social profiles of the
+                messages returned.
+            limit (int): Number of messages requested per page. Defaults to 50.
+            include_unscheduled_review_messages(bool): Flag to retrieve unscheduled
+                (Send Now) review messages on top of scheduled ones retrieved from
+                time range query.
+            prefetch (bool): Fetch the next page in a background thread while the
+                current page is being consumed. Defaults to True.
+
+        """
+        resource = "messages"
+        params = _outbound_messages_params(
+            start_time,
+            end_time,
+            state,
+            social_profile_ids,
+            limit,
+            include_unscheduled_review_messages,
+        )
 
-        assert isinstance(start_time, datetime), "start_time must be a datetime"
-        params["startTime"] = start_time.strftime(ISO_FORMAT)
+        def fetch_page(cursor=None):
+            page_params = dict(params, cursor=cursor) if cursor else params
+            return self._make_request(resource, params=page_params, envelope=True)
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = fetch_page()
+            while True:
+                cursor = _next_cursor(page)
+                next_page = None
+                if cursor and executor is not None:
+                    next_page = executor.submit(fetch_page, cursor)
+
+                for message in page.get("data") or []:
+                    yield Message.from_dict(message) if self.models else message
+
+                if not cursor:
+                    return
+                page = next_page.result() if next_page else fetch_page(cursor)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def query_outbound_messages(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        social_profile_ids: List[str] = None,
+        state: MessageState = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        limit: int = 100,
+    ) -> List[Any]:
+        """Retrieve every outbound message in a large time range, for many
+        social profiles, with concurrent sharded queries.
 
-        assert isinstance(end_time, datetime), "end_time must be a datetime"
-        params["endTime"] = end_time.strftime(ISO_FORMAT)
+        The range and profiles are split into shards whose windows adapt to the
+        message density seen, shards that fill a page are split and queried
+        again. See :class:`hootsweet.planner.MessageQueryPlanner` to tune it.
 
-        params["limit"] = limit
+        Args:
+            start_time (datetime): The start date range of the messages returned.
+            end_time (datetime): The end date range of the messages returned.
+            social_profile_ids (List[str]): The ids of social profiles of the
+                messages returned.
+            state (MessageState): The state of the messages returned.
+            max_workers (int): Maximum number of shards queried at once.
+                Defaults to 8.
+            limit (int): Page size requested for each shard. Defaults to 100.
 
-        if state is not None:
-            params["state"] = state.name
+        Returns:
+            The messages deduplicated by id and ordered by scheduled send time.
 
-        if social_profile_ids is not None:
-            params["socialProfileIds"] = social_profile_ids
+        """
+        from hootsweet.planner import MessageQueryPlanner
 
-        if include_unscheduled_review_messages is not None:
-            params["includeUnscheduledReviewMsgs"] = include_unscheduled_review_messages
+        planner = MessageQueryPlanner(self, max_workers=max_workers, limit=limit)
+        return planner.run(start_time, end_time, social_profile_ids, state)
 
-        return self._make_request(resource, params=params)
+    def export_outbound_messages(
+        self,
+        path: str,
+        start_time: datetime,
+        end_time: datetime,
+        state: MessageState = None,
+        social_profile_ids: List[int] = None,
+        format: str = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limit: int = 100,
+    ) -> int:
+        """Export every outbound message in a time range to a Parquet, Arrow IPC
+        or CSV file with a fixed columnar schema.
+
+        Pages are streamed into the file in batches, so memory use is bounded by
+        ``batch_size`` rather than the number of messages. See
+        :mod:`hootsweet.export` for the columns written.
+
+        Args:
+            path (str): The file to write.
+            start_time (datetime): The start date range of the messages exported.
+            end_time (datetime): The end date range of the messages exported.
+            state (MessageState): The state of the messages exported.
+            social_profile_ids (List[int]): The ids of social profiles of the
+                messages exported.
+            format (str): ``parquet``, ``arrow`` or ``csv``. Guessed from the
+                file extension when not given.
+            batch_size (int): Number of messages written at a time. Defaults to
+                10000.
+            limit (int): Number of messages requested per page. Defaults to 100.
+
+        Returns:
+            The number of messages exported.
+
+        """
+        from hootsweet.export import export_messages
+
+        messages = self.iter_outbound_messages(
+            start_time,
+            end_time,
+            state=state,
+            social_profile_ids=social_profile_ids,
+            limit=limit,
+        )
+        return export_messages(messages, path, format=format, batch_size=batch_size)
 
+    @returns(Message)
+    @cached
     def get_message(self, message_id: str) -> Dict[str, Any]:
         """ Retrieve a message.
 
@@ -339,6 +1083,7 @@ class HootSweet:
         resource = "messages/%s" % message_id
         return self._make_request(resource)
 
+    @invalidates("get_message", "get_message_review_history")
     def delete_message(self, message_id: str) -> Dict[str, Any]:
         """Delete a message.
 
@@ -346,8 +1091,12 @@ class HootSweet:
             message_id (str): The Hootsuite message id.
         """
         resource = "messages/%s" % message_id
-        return self._make_request(resource, method="DELETE")
+        result = self._make_request(resource, method="DELETE")
+        if self.idempotency is not None:
+            self.idempotency.forget_message(message_id)
+        return result
 
+    @invalidates("get_message", "get_message_review_history")
     def approve_message(
         self, message_id: str, sequence_number: int, reviewer_type: Reviewer
     ):
@@ -361,9 +1110,9 @@ class HootSweet:
         """
         resource = "messages/%s/approve" % message_id
         data = {"sequenceNumber": sequence_number, "reviewerType": reviewer_type.name}
-        json_ = json.dumps(data)
-        return self._make_request(resource, method="POST", data=json_)
+        return self._make_request(resource, method="POST", json=data)
 
+    @invalidates("get_message", "get_message_review_history")
     def reject_message(
         self,
         message_id: str,
@@ -386,8 +1135,9 @@ class HootSweet:
 
         if reviewer_type is not None:
             data["reviewerType"] = reviewer_type.name
-        return self._make_request(resource, method="POST", data=data)
+        return self._make_request(resource, method="POST", json=data)
 
+    @cached
     def get_message_review_history(self, message_id: str) -> Dict:
         """ Get a messages prescreening review history.
 
@@ -397,6 +1147,97 @@ class HootSweet:
         resource = "messages/%s/history" % message_id
         return self._make_request(resource)
 
+    def review_messages(
+        self,
+        reviews: Iterable["Review"],
+        reviewer_type: Reviewer = Reviewer.MEMBER,
+        reason: str = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_conflict_retries: int = 2,
+    ) -> List["ReviewOutcome"]:
+        """Approve and reject many messages with bounded concurrency.
+
+        Requests go through the client's rate limiter when it has one. A
+        decision made with a stale sequence number is retried with the current
+        one from the message's review history.
+
+        Args:
+            reviews (Iterable[tuple]): ``(message_id, sequence_number,
+                decision)`` tuples, where decision is a ReviewDecision or
+                ``"approve"``/``"reject"``. A rejection reason can follow as a
+                fourth item.
+            reviewer_type (Reviewer): The actor making the decisions.
+                Defaults to Reviewer.MEMBER.
+            reason (str): The rejection reason for rejections without one.
+            max_workers (int): Maximum number of decisions sent at once.
+                Defaults to 8.
+            max_conflict_retries (int): Times a decision is retried after a
+                sequence number conflict. Defaults to 2.
+
+        Returns:
+            A list in the same order as ``reviews`` holding a ReviewOutcome for
+            each review, or the ValueError raised for an invalid one.
+
+        """
+        return run_concurrently(
+            lambda review: self._review_message(
+                review, reviewer_type, reason, max_conflict_retries
+            ),
+            reviews,
+            max_workers,
+        )
+
+    def _review_message(
+        self,
+        review: "Review",
+        reviewer_type: Reviewer,
+        reason: str,
+        max_conflict_retries: int,
+    ) -> "ReviewOutcome":
+        from hootsweet.review import is_sequence_conflict, parse_review
+
+        outcome = parse_review(review, reason)
+        while True:
+            outcome.attempts += 1
+            try:
+                if outcome.decision is ReviewDecision.APPROVE:
+                    outcome.result = self.approve_message(
+                        outcome.message_id, outcome.sequence_number, reviewer_type
+                    )
+                else:
+                    outcome.result = self.reject_message(
+                        outcome.message_id,
+                        outcome.reason,
+                        outcome.sequence_number,
+                        reviewer_type,
+                    )
+                outcome.error = None
+                return outcome
+            except Exception as exc:
+                outcome.error = exc
+                if not is_sequence_conflict(exc):
+                    return outcome
+                if outcome.attempts > max_conflict_retries:
+                    return outcome
+
+            try:
+                sequence_number = self._current_sequence_number(outcome.message_id)
+            except Exception as exc:
+                outcome.error = exc
+                return outcome
+            if sequence_number in (None, outcome.sequence_number):
+                return outcome
+            outcome.sequence_number = sequence_number
+
+    def _current_sequence_number(self, message_id: str) -> Optional[int]:
+        from hootsweet.review import latest_sequence_number
+
+        # The cached history is what went stale, read it from the API
+        if self.cache is not None:
+            self.cache.invalidate("get_message_review_history", (message_id,))
+        return latest_sequence_number(self.get_message_review_history(message_id))
+
+    @returns(MediaUpload)
     def create_media_upload_url(self, size_bytes: int, mime_type: str):
         """Creates an Amazon S3 upload URL that can be used to transfer media to
         Hootsuite.
@@ -417,6 +1258,7 @@ class HootSweet:
         data = {"sizeBytes": size_bytes, "mimeType": mime_type}
         return self._make_request(resource, method="POST", json=data)
 
+    @returns(MediaUpload)
     def get_media_upload_status(self, media_id):
         """Retrieves the status of a media upload to Hootsuite.
 
@@ -426,3 +1268,158 @@ class HootSweet:
         """
         resource = "media/%s" % media_id
         return self._make_request(resource, method="GET")
+
+    def upload_media(
+        self,
+        source: "MediaSource",
+        mime_type: str = None,
+        timeout: float = 300,
+        poll_interval: float = 1.0,
+    ) -> Dict[str, Any]:
+        """Upload a media file to Hootsuite and wait until it is ready.
+
+        The file is streamed to Hootsuite's upload URL, local files are memory
+        mapped, so memory use stays flat whatever the file size.
+
+        Args:
+            source (str, PathLike or file object): The file to upload.
+            mime_type (str): MIME type of the file. Guessed from the file name
+                when not given.
+            timeout (float): Seconds to wait for the media to become ready.
+                Defaults to 300.
+            poll_interval (float): Seconds before the first status poll, later
+                polls back off exponentially. Defaults to 1.
+
+        Returns:
+            The media upload status, its ``id`` can be attached to a message.
+
+        """
+        media_id, _ = self._upload_media_file(source, mime_type)
+        return self.wait_for_media(media_id, timeout, poll_interval)
+
+    def upload_media_batch(
+        self,
+        sources: Iterable["MediaItem"],
+        max_workers: int = 4,
+        timeout: float = 300,
+        poll_interval: float = 1.0,
+        progress_cb: Callable[["MediaUploadResult"], Any] = None,
+    ) -> List["MediaUploadResult"]:
+        """Upload many media files in parallel and wait until they are ready.
+
+        Files are streamed to storage concurrently, then the status of every
+        upload is polled together until all are ready, failed or timed out.
+
+        Args:
+            sources (Iterable): The files to upload, paths or file objects,
+                or ``(file, mime_type)`` tuples for files whose MIME type can't
+                be guessed from their name, like ``io.BytesIO``.
+            max_workers (int): Maximum number of concurrent uploads. Defaults
+                to 4.
+            timeout (float): Seconds to wait for the media to become ready after
+                the uploads finish. Defaults to 300.
+            poll_interval (float): Seconds before the first status poll, later
+                polls back off exponentially. Defaults to 1.
+            progress_cb (callable): Called with each MediaUploadResult once its
+                media is ready or has failed.
+
+        Returns:
+            A MediaUploadResult for each file in the same order as ``sources``.
+
+        """
+        from hootsweet.media import MediaUploadResult, poll_delays, split_media_item
+
+        def upload(item):
+            source, mime_type = split_media_item(item)
+            result = MediaUploadResult(source)
+            try:
+                started = time.monotonic()
+                uploaded = self._upload_media_file(source, mime_type)
+                result.media_id, result.size = uploaded
+                result.upload_seconds = time.monotonic() - started
+            except Exception as exc:
+                result.finish(error=exc)
+                if progress_cb is not None:
+                    progress_cb(result)
+            return result
+
+        results = run_concurrently(upload, sources, max_workers)
+        pending = {r.media_id: r for r in results if r.error is None}
+
+        deadline = time.monotonic() + timeout
+        for delay in poll_delays(poll_interval):
+            media_ids = list(pending)
+            statuses = run_concurrently(
+                self.get_media_upload_status, media_ids, max_workers
+            )
+            for media_id, status in zip(media_ids, statuses):
+                if pending[media_id].settle(status):
+                    result = pending.pop(media_id)
+                    if progress_cb is not None:
+                        progress_cb(result)
+
+            if not pending:
+                break
+            if time.monotonic() + delay > deadline:
+                for result in pending.values():
+                    result.time_out(timeout)
+                    if progress_cb is not None:
+                        progress_cb(result)
+                break
+            time.sleep(delay)
+
+        return results
+
+    def _upload_media_file(
+        self, source: "MediaSource", mime_type: str = None
+    ) -> Tuple[str, int]:
+        # Creates an upload URL and streams the file to it, returning the
+        # media id and the size of the file.
+        from hootsweet.media import open_media, resolve_mime_type
+
+        mime_type = resolve_mime_type(source, mime_type)
+        with open_media(source) as (body, size):
+            upload = self.create_media_upload_url(size, mime_type)
+            self._put_media(upload["uploadUrl"], body, size, mime_type)
+        return upload["id"], size
+
+    def _put_media(self, upload_url: str, body, size: int, mime_type: str):
+        headers = {"Content-Type": mime_type, "Content-Length": str(size)}
+        # The upload URL is pre-signed, sending the OAuth2 token would be rejected
+        response = self.session.put(
+            upload_url,
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            withhold_token=True,
+        )
+        if not response.status_code == 200:
+            raise detect_and_raise_error(response)
+
+    def wait_for_media(
+        self, media_id: str, timeout: float = 300, poll_interval: float = 1.0
+    ) -> Dict[str, Any]:
+        """Poll the status of a media upload until it is ready.
+
+        Args:
+            media_id (str): The Media ID to wait for.
+            timeout (float): Seconds to wait for. Defaults to 300.
+            poll_interval (float): Seconds before the first poll, later polls
+                back off exponentially. Defaults to 1.
+
+        """
+        from hootsweet.media import FAILED, READY, poll_delays
+
+        deadline = time.monotonic() + timeout
+        for delay in poll_delays(poll_interval):
+            status = self.get_media_upload_status(media_id)
+            state = status.get("state")
+            if state == READY:
+                return status
+            if state == FAILED:
+                raise MediaUploadFailed("Media %s failed to upload." % media_id)
+            if time.monotonic() + delay > deadline:
+                raise MediaUploadTimeout(
+                    "Media %s was not ready after %ss." % (media_id, timeout)
+                )
+            time.sleep(delay)
@@ -0,0 +1,42 @@
+"""
+Batch Helpers
+=============
+
+This module provides helpers to run many API calls with bounded concurrency,
+returning a result or an exception for every item so one failure does not
+abort the rest of a batch.
+
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def run_concurrently(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[Any]:
+    """Call a function for every item on a pool of threads.
+
+    Args:
+        func (callable): The function called with each item.
+        items (Iterable): The items to call the function with.
+        max_workers (int): Maximum number of concurrent calls. Defaults to 8.
+
+    Returns:
+        A list in the same order as ``items`` holding the value returned for
+        each item, or the exception raised for it.
+
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, item) for item in items]
+    return [result_or_exception(future) for future in futures]
+
+
+def result_or_exception(future: Future) -> Any:
+    """The result of a completed future or the exception it raised."""
+    exc = future.exception()
+    return exc if exc is not None else future.result()
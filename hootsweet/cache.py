@@ -0,0 +1,362 @@
+"""
+Response Caching
+================
+
+This module provides an opt-in response cache for HootSweet's read-mostly
+endpoints. Entries expire after a per-endpoint TTL, and calls that change a
+resource evict the cached reads of it.
+
+RevalidationStore keeps the ETag and Last-Modified validators of GET responses
+so stale data can be revalidated with a conditional request.
+
+Caches store entries in a backend. MemoryCache is a bounded in-process LRU,
+other stores, e.g. one shared between processes, can be plugged in by
+implementing CacheBackend.
+
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlencode
+
+DEFAULT_TTL = 300
+
+# The request headers RevalidationStore adds to conditional GET requests
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+# Seconds to cache each endpoint for, keyed by HootSweet method name
+DEFAULT_TTLS = {
+    "get_me": DEFAULT_TTL,
+    "get_me_organizations": DEFAULT_TTL,
+    "get_me_social_profiles": DEFAULT_TTL,
+    "get_social_profiles": DEFAULT_TTL,
+    "get_social_profile": DEFAULT_TTL,
+    "get_social_profile_teams": DEFAULT_TTL,
+    "get_member": DEFAULT_TTL,
+    "get_member_organizations": DEFAULT_TTL,
+    "get_message": 60,
+    "get_message_review_history": 60,
+}
+
+
+class CacheBackend:
+    """The interface of a store for cached responses.
+
+    Values are the decoded response data, backends shared between processes
+    need to serialize them.
+
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value stored for a key or None if it is missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store a value for a number of seconds."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Remove a key if it is stored."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every key."""
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """A thread safe in-process LRU cache with per entry expiry.
+
+    Args:
+        maxsize (int): Maximum number of entries, the least recently used entry
+            is evicted when full. Defaults to 1024.
+
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ResponseCache:
+    """Caches the responses of HootSweet's read endpoints.
+
+    Cached values are shared between callers and should be treated as read
+    only.
+
+    Args:
+        backend (CacheBackend): Where entries are stored. Defaults to a
+            MemoryCache.
+        ttls (Dict[str, float]): Seconds to cache each endpoint for, keyed by
+            HootSweet method name. Only endpoints listed are cached. Defaults to
+            DEFAULT_TTLS.
+        namespace (str): Prefix for every key. Set it per member when a backend
+            is shared between clients with different tokens.
+
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend = None,
+        ttls: Dict[str, float] = None,
+        namespace: str = "",
+    ):
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Cache hit and miss counts."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def key(self, endpoint: str, args) -> str:
+        return "%s%s:%s" % (self.namespace, endpoint, "/".join(str(a) for a in args))
+
+    def get(self, endpoint: str, args) -> Optional[Any]:
+        value = self.backend.get(self.key(endpoint, args))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, endpoint: str, args, value: Any):
+        self.backend.set(self.key(endpoint, args), value, self.ttls[endpoint])
+
+    def invalidate(self, endpoint: str, args):
+        self.backend.delete(self.key(endpoint, args))
+
+    def clear(self):
+        self.backend.clear()
+
+
+class RevalidationStore:
+    """Stores the validators and payloads of GET responses so they can be
+    revalidated with a conditional request.
+
+    A ``304 Not Modified`` response then costs a header-only round trip and the
+    stored payload is returned instead of downloading and parsing it again.
+
+    Args:
+        backend (CacheBackend): Where entries are stored. Defaults to a
+            MemoryCache.
+        ttl (float): Seconds an entry is kept for. Defaults to one day.
+
+    """
+
+    def __init__(self, backend: CacheBackend = None, ttl: float = 86400):
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttl = ttl
+        self.revalidated = 0
+
+    @staticmethod
+    def key(url: str, params: Mapping = None) -> str:
+        if not params:
+            return url
+        return "%s?%s" % (url, urlencode(sorted(params.items()), doseq=True))
+
+    def conditional_headers(self, key: str) -> Dict[str, str]:
+        """The If-None-Match and If-Modified-Since headers for a stored key."""
+        entry = self.backend.get(key)
+        if entry is None:
+            return {}
+        validators, _ = entry
+        headers = {}
+        if validators.get("ETag"):
+            headers["If-None-Match"] = validators["ETag"]
+        if validators.get("Last-Modified"):
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+        return headers
+
+    def payload(self, key: str) -> Optional[Any]:
+        """The stored payload for a key that the server reported not modified."""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        self.revalidated += 1
+        return entry[1]
+
+    def store(self, key: str, headers: Mapping[str, str], payload: Any):
+        """Store a payload if its response carried validators."""
+        validators = {
+            name: headers.get(name)
+            for name in ("ETag", "Last-Modified")
+            if headers.get(name)
+        }
+        if validators:
+            self.backend.set(key, (validators, payload), self.ttl)
+
+
+class _Arguments:
+    # Binds the arguments of calls to a method to its parameters, defaults
+    # included. The signature is read once, on the first call, as inspect is
+    # slow to import and only needed once a decorated method is used.
+
+    __slots__ = ("func", "signature", "arity")
+
+    def __init__(self, func):
+        self.func = func
+        self.signature = self.arity = None
+
+    def __call__(self, instance, args, kwargs) -> tuple:
+        if self.signature is None:
+            import inspect
+
+            signature = inspect.signature(self.func)
+            parameters = signature.parameters.values()
+            if all(p.kind is p.POSITIONAL_OR_KEYWORD for p in parameters):
+                self.arity = len(signature.parameters) - 1
+            self.signature = signature
+        if not kwargs and len(args) == self.arity:
+            # Every argument was passed positionally, there is nothing to bind
+            return args
+        bound = self.signature.bind(instance, *args, **kwargs)
+        bound.apply_defaults()
+        return tuple(bound.arguments.values())[1:]
+
+
+# Whether each client class is asynchronous
+_async_clients = {}
+
+
+def _is_async(client) -> bool:
+    cls = type(client)
+    is_async = _async_clients.get(cls)
+    if is_async is None:
+        import inspect
+
+        is_async = _async_clients[cls] = inspect.iscoroutinefunction(
+            client._make_request
+        )
+    return is_async
+
+
+def _is_awaitable(value) -> bool:
+    import inspect
+
+    return inspect.isawaitable(value)
+
+
+async def _resolved(value):
+    return value
+
+
+def cached(func):
+    """Cache the result of a HootSweet method in the client's ResponseCache.
+
+    Works for both HootSweet and AsyncHootSweet, where the method returns a
+    coroutine.
+
+    """
+    endpoint = func.__name__
+    arguments = _Arguments(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        cache = self.cache
+        if cache is None or endpoint not in cache.ttls:
+            return func(self, *args, **kwargs)
+
+        key_args = arguments(self, args, kwargs)
+        value = cache.get(endpoint, key_args)
+        if value is not None:
+            return _resolved(value) if _is_async(self) else value
+
+        result = func(self, *args, **kwargs)
+        if _is_awaitable(result):
+
+            async def store():
+                value = await result
+                cache.set(endpoint, key_args, value)
+                return value
+
+            return store()
+
+        cache.set(endpoint, key_args, result)
+        return result
+
+    return wrapper
+
+
+def invalidates(*endpoints: str):
+    """Evict cached results of other endpoints called with the same arguments
+    once a HootSweet method succeeds.
+
+    Args:
+        endpoints (str): Names of the cached HootSweet methods to evict.
+
+    """
+
+    def decorator(func):
+        arguments = _Arguments(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache = self.cache
+            result = func(self, *args, **kwargs)
+            if cache is None:
+                return result
+
+            # The evicted endpoints take the resource id as their only argument
+            key_args = arguments(self, args, kwargs)[:1]
+
+            def evict():
+                for endpoint in endpoints:
+                    cache.invalidate(endpoint, key_args)
+
+            if _is_awaitable(result):
+
+                async def evict_after():
+                    value = await result
+                    evict()
+                    return value
+
+                return evict_after()
+
+            evict()
+            return result
+
+        return wrapper
+
+    return decorator
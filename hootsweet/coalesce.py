@@ -0,0 +1,127 @@
+"""
+Request Coalescing
+==================
+
+This module collapses identical in-flight GET requests into one HTTP call.
+
+The first caller of a request, the leader, sends it while every identical
+request made before it completes waits for the same result, or exception,
+instead of sending its own. Requests are identical when they have the same url,
+query parameters and response envelope. Nothing is kept once the request
+completes, unlike :mod:`hootsweet.cache`.
+
+Coalesced results are shared between callers and should be treated as read
+only.
+
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Mapping
+from urllib.parse import urlencode
+
+
+def flight_key(url: str, params: Mapping = None, envelope: bool = False) -> str:
+    """The key identical GET requests share."""
+    key = url
+    if params:
+        key = "%s?%s" % (url, urlencode(sorted(params.items()), doseq=True))
+    if envelope:
+        key = "envelope:%s" % key
+    return key
+
+
+class SingleFlight:
+    """Coalesces identical calls made from several threads."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """Call ``func`` unless a call with the same key is in flight, then
+        return that call's result instead.
+
+        Args:
+            key (str): Identifies identical calls.
+            func (callable): Makes the call, without arguments.
+
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            else:
+                self.shared += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            result = func()
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return result
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of calls and of calls that shared another's request."""
+        return {"calls": self.calls, "shared": self.shared}
+
+
+class AsyncSingleFlight:
+    """Coalesces identical calls made from coroutines of one event loop.
+
+    The request runs in its own task, so a waiter that is cancelled, the leader
+    included, does not cancel it for the others.
+
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``func()`` unless a call with the same key is in flight, then
+        return that call's result instead.
+
+        Args:
+            key (str): Identifies identical calls.
+            func (callable): Returns the awaitable making the call.
+
+        """
+        # asyncio is only loaded by asyncio users
+        import asyncio
+
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda _: self._land(key, task))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _land(self, key: str, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieve the exception so it is not logged when every waiter was
+        # cancelled before the request failed.
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of calls and of calls that shared another's request."""
+        return {"calls": self.calls, "shared": self.shared}
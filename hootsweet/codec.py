@@ -0,0 +1,99 @@
+"""
+JSON Codecs
+===========
+
+This module provides the JSON codecs HootSweet decodes response bodies and
+encodes request bodies with. The fastest installed library is used by default:
+orjson, then msgspec, then the standard library.
+
+Responses are decoded straight from their bytes, so requests' charset detection
+is skipped, and request bodies are encoded once however many times the request
+is sent.
+
+"""
+
+import json
+from typing import Any
+
+
+class JSONCodec:
+    """The interface of a JSON codec."""
+
+    name = None
+
+    def loads(self, data: bytes) -> Any:
+        """Decode a UTF-8 encoded JSON document."""
+        raise NotImplementedError
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode an object as a compact UTF-8 encoded JSON document."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return "%s()" % self.__class__.__name__
+
+
+class StdlibCodec(JSONCodec):
+    """A codec using the standard library's json module."""
+
+    name = "json"
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+
+class OrjsonCodec(JSONCodec):
+    """A codec using orjson, requires the optional ``orjson`` dependency."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._loads, self._dumps = orjson.loads, orjson.dumps
+
+    def loads(self, data: bytes) -> Any:
+        return self._loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._dumps(obj)
+
+
+class MsgspecCodec(JSONCodec):
+    """A codec using msgspec, requires the optional ``msgspec`` dependency."""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data: bytes) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+
+def default_codec() -> JSONCodec:
+    """The fastest codec whose library is installed."""
+    for codec_class in (OrjsonCodec, MsgspecCodec):
+        try:
+            return codec_class()
+        except ImportError:
+            pass
+    return StdlibCodec()
+
+
+def is_json(response) -> bool:
+    """Whether a response declares a JSON body in its Content-Type."""
+    headers = getattr(response, "headers", None) or {}
+    content_type = headers.get("Content-Type") or ""
+    return content_type.split(";", 1)[0].strip().lower() == "application/json"
@@ -14,6 +14,11 @@ class Reviewer(Enum):
     MEMBER = 2
 
 
+class ReviewDecision(Enum):
+    APPROVE = 1
+    REJECT = 2
+
+
 class MessageState(Enum):
     PENDING_APPROVAL = 1
     REJECTED = 2
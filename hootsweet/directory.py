@@ -0,0 +1,319 @@
+"""
+Directory
+=========
+
+This module provides Directory, an in-memory copy of an organization's social
+profiles, teams, members and organizations with indexes for constant time
+lookups.
+
+The graph is loaded once with concurrent requests. Each refresh then re-reads
+the profile list, loads what is new, drops what is gone and re-reads a bounded
+number of the entries refreshed longest ago, so keeping the directory current
+costs a few requests per refresh rather than a full reload.
+
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from hootsweet.batch import DEFAULT_MAX_WORKERS, run_concurrently
+
+log = logging.getLogger(__name__)
+
+_EMPTY = frozenset()
+
+# Who owns a social profile, its ``ownerId`` is a member or organization id
+MEMBER = "MEMBER"
+ORGANIZATION = "ORGANIZATION"
+
+
+def _id(value: Any) -> str:
+    return str(value)
+
+
+def _team_id(team: Any) -> str:
+    # The teams of a profile are listed as ids or as objects holding one
+    if isinstance(team, (str, int)):
+        return _id(team)
+    return _id(team.get("teamId", team.get("id")))
+
+
+def _owned_by(profiles: Dict[str, Any], owner: str) -> Dict[str, FrozenSet[str]]:
+    # The ids of the profiles owned by each member or organization
+    owned = {}
+    for profile_id, profile in profiles.items():
+        if profile.get("owner") == owner and profile.get("ownerId"):
+            owned.setdefault(_id(profile["ownerId"]), set()).add(profile_id)
+    return {key: frozenset(values) for key, values in owned.items()}
+
+
+def _invert(index: Dict[str, FrozenSet[str]]) -> Dict[str, FrozenSet[str]]:
+    inverted = {}
+    for key, values in index.items():
+        for value in values:
+            inverted.setdefault(value, set()).add(key)
+    return {key: frozenset(values) for key, values in inverted.items()}
+
+
+class _Indexes:
+    # An immutable snapshot of every index, swapped in whole so readers never
+    # see a half refreshed directory.
+
+    __slots__ = (
+        "profiles",
+        "profiles_by_username",
+        "profiles_by_organization",
+        "teams_by_profile",
+        "profiles_by_team",
+        "members",
+        "organizations",
+        "organizations_by_member",
+        "members_by_organization",
+    )
+
+    def __init__(self, profiles, teams_by_profile, members, organizations_by_member):
+        self.profiles = profiles
+        self.profiles_by_username = {
+            (
+                str(profile.get("type")).upper(),
+                str(profile.get("socialNetworkUsername")).lower(),
+            ): profile
+            for profile in profiles.values()
+            if profile.get("socialNetworkUsername")
+        }
+        self.profiles_by_organization = _owned_by(profiles, ORGANIZATION)
+        self.teams_by_profile = teams_by_profile
+        self.profiles_by_team = _invert(teams_by_profile)
+        self.members = members
+        self.organizations_by_member = {
+            member_id: frozenset(organizations)
+            for member_id, organizations in organizations_by_member.items()
+        }
+        self.organizations = {
+            organization_id: organization
+            for organizations in organizations_by_member.values()
+            for organization_id, organization in organizations.items()
+        }
+        self.members_by_organization = _invert(self.organizations_by_member)
+
+
+class Directory:
+    """Indexed social profiles, teams, members and organizations.
+
+    Members are the authenticated member and the members owning social
+    profiles, the organizations owning social profiles are indexed by
+    :meth:`organization_profiles`. Every lookup is a dictionary read on the last loaded snapshot.
+
+    Args:
+        client (HootSweet): The client to load the directory with.
+        max_workers (int): Maximum number of concurrent requests. Defaults to 8.
+        refresh_batch (int): Number of existing profiles and members re-read on
+            each refresh, the ones refreshed longest ago first. Defaults to 50.
+
+    """
+
+    def __init__(
+        self, client, max_workers: int = DEFAULT_MAX_WORKERS, refresh_batch: int = 50,
+    ):
+        self.client = client
+        self.max_workers = max_workers
+        self.refresh_batch = refresh_batch
+        self.loaded_at = None
+        self.errors = []
+        self._profiles = {}
+        self._teams = {}
+        self._members = {}
+        self._organizations = {}
+        # When each profile's teams and each member were last read
+        self._profile_read_at = {}
+        self._member_read_at = {}
+        self._me_id = None
+        self._indexes = _Indexes({}, {}, {}, {})
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self) -> "Directory":
+        """Load the whole graph, replacing anything loaded before."""
+        with self._refresh_lock:
+            self._profiles, self._teams = {}, {}
+            self._members, self._organizations = {}, {}
+            self._profile_read_at, self._member_read_at = {}, {}
+            self._update(refresh_batch=0)
+        return self
+
+    def refresh(self) -> "Directory":
+        """Load new profiles and members, drop removed ones and re-read the
+        ``refresh_batch`` entries read longest ago.
+
+        """
+        with self._refresh_lock:
+            self._update(refresh_batch=self.refresh_batch)
+        return self
+
+    def start(self, interval: float):
+        """Refresh the directory every ``interval`` seconds on a daemon thread.
+
+        The directory is loaded first when it has not been.
+
+        """
+        if self.loaded_at is None:
+            self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._refresh_periodically, args=(interval,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop refreshing on a schedule."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_periodically(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("Directory refresh failed.")
+
+    def _update(self, refresh_batch: int):
+        self.errors = []
+        self._invalidate("get_social_profiles")
+        profiles = {_id(p.get("id")): p for p in self.client.get_social_profiles()}
+        for profile_id in set(self._profiles) - set(profiles):
+            self._teams.pop(profile_id, None)
+            self._profile_read_at.pop(profile_id, None)
+        self._profiles = profiles
+
+        me = self._get("get_me")
+        self._me_id = _id(me.get("id"))
+        member_ids = {self._me_id}
+        # ownerId is an organization id for profiles owned by an organization
+        member_ids.update(
+            _id(p.get("ownerId"))
+            for p in profiles.values()
+            if p.get("owner") == MEMBER and p.get("ownerId")
+        )
+        for member_id in set(self._members) - member_ids:
+            self._members.pop(member_id)
+            self._organizations.pop(member_id, None)
+            self._member_read_at.pop(member_id, None)
+
+        stale_profiles = self._stale(profiles, self._profile_read_at, refresh_batch)
+        stale_members = self._stale(member_ids, self._member_read_at, refresh_batch)
+        self._members[self._me_id] = me
+
+        self._read(
+            [("teams", profile_id) for profile_id in stale_profiles]
+            + [("member", member_id) for member_id in stale_members]
+        )
+        self._indexes = _Indexes(
+            dict(self._profiles),
+            dict(self._teams),
+            dict(self._members),
+            dict(self._organizations),
+        )
+        self.loaded_at = time.time()
+
+    @staticmethod
+    def _stale(ids: Iterable[str], read_at: Dict[str, float], batch: int) -> List:
+        # Every id never read, then the ``batch`` read longest ago
+        unread = [i for i in ids if i not in read_at]
+        read = sorted((i for i in ids if i in read_at), key=read_at.__getitem__)
+        return unread + read[:batch]
+
+    def _read(self, items: List[Tuple[str, str]]):
+        results = run_concurrently(self._read_item, items, self.max_workers)
+        for (kind, item_id), result in zip(items, results):
+            if isinstance(result, Exception):
+                # Anything loaded before is kept, it is retried next refresh
+                log.warning("Reading %s %s failed: %r" % (kind, item_id, result))
+                self.errors.append((kind, item_id, result))
+            elif kind == "teams":
+                self._teams[item_id] = frozenset(_team_id(t) for t in result)
+                self._profile_read_at[item_id] = time.monotonic()
+            else:
+                member, organizations = result
+                if member is not None:
+                    self._members[item_id] = member
+                self._organizations[item_id] = {
+                    _id(o.get("id")): o for o in organizations
+                }
+                self._member_read_at[item_id] = time.monotonic()
+
+    def _read_item(self, item: Tuple[str, str]):
+        kind, item_id = item
+        if kind == "teams":
+            return self._get("get_social_profile_teams", item_id) or []
+        member = None
+        if item_id != self._me_id:
+            member = self._get("get_member", item_id)
+        organizations = self._get("get_member_organizations", item_id) or []
+        return member, organizations
+
+    def _get(self, endpoint: str, *args):
+        self._invalidate(endpoint, *args)
+        return getattr(self.client, endpoint)(*args)
+
+    def _invalidate(self, endpoint: str, *args):
+        # Reads go to the API rather than the client's response cache
+        cache = getattr(self.client, "cache", None)
+        if cache is not None:
+            cache.invalidate(endpoint, args)
+
+    def profile(self, profile_id: str) -> Optional[Any]:
+        """The social profile with an id."""
+        return self._indexes.profiles.get(_id(profile_id))
+
+    def profile_by_username(self, network: str, username: str) -> Optional[Any]:
+        """The social profile of a network, e.g. ``TWITTER``, and username."""
+        return self._indexes.profiles_by_username.get(
+            (network.upper(), username.lower())
+        )
+
+    def profiles(self) -> List[Any]:
+        """Every social profile."""
+        return list(self._indexes.profiles.values())
+
+    def organization_profiles(self, organization_id: str) -> FrozenSet[str]:
+        """The ids of the social profiles owned by an organization."""
+        return self._indexes.profiles_by_organization.get(
+            _id(organization_id), _EMPTY
+        )
+
+    def teams(self, profile_id: str) -> FrozenSet[str]:
+        """The ids of the teams with access to a social profile."""
+        return self._indexes.teams_by_profile.get(_id(profile_id), _EMPTY)
+
+    def team_profiles(self, team_id: str) -> FrozenSet[str]:
+        """The ids of the social profiles a team has access to."""
+        return self._indexes.profiles_by_team.get(_id(team_id), _EMPTY)
+
+    def member(self, member_id: str) -> Optional[Any]:
+        """The member with an id."""
+        return self._indexes.members.get(_id(member_id))
+
+    def organization(self, organization_id: str) -> Optional[Any]:
+        """The organization with an id."""
+        return self._indexes.organizations.get(_id(organization_id))
+
+    def organizations(self, member_id: str) -> FrozenSet[str]:
+        """The ids of the organizations a member is in."""
+        return self._indexes.organizations_by_member.get(_id(member_id), _EMPTY)
+
+    def members(self, organization_id: str) -> FrozenSet[str]:
+        """The ids of the members of an organization."""
+        return self._indexes.members_by_organization.get(_id(organization_id), _EMPTY)
+
+    def team_has_access(self, team_id: str, profile_id: str) -> bool:
+        """Whether a team has access to a social profile."""
+        return _id(team_id) in self.teams(profile_id)
+
+    def is_member(self, member_id: str, organization_id: str) -> bool:
+        """Whether a member is in an organization."""
+        return _id(organization_id) in self.organizations(member_id)
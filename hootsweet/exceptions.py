@@ -37,6 +37,12 @@ class NotFound(HootSuiteException):
     pass
 
 
+class Conflict(BadRequest):
+    """409"""
+
+    pass
+
+
 class TooManyRequests(HootSuiteException):
     """429"""
 
@@ -61,6 +67,14 @@ class MIMETypeNotAllowed(Exception):
     pass
 
 
+class MediaUploadFailed(Exception):
+    pass
+
+
+class MediaUploadTimeout(Exception):
+    pass
+
+
 def detect_and_raise_error(response: Response):
     status_code = response.status_code
     if status_code == 400:
@@ -71,9 +85,13 @@ def detect_and_raise_error(response: Response):
         raise Forbidden(response)
     elif status_code == 404:
         raise NotFound(response)
+    elif status_code == 409:
+        raise Conflict(response)
     elif status_code == 429:
         raise TooManyRequests(response)
     elif status_code >= 500:
         raise ServerError(response)
     elif status_code >= 400:
         raise BadRequest(response)
+    elif status_code != 200:
+        raise HootSuiteException(response)
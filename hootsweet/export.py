@@ -0,0 +1,189 @@
+"""
+Columnar Export
+===============
+
+This module streams outbound messages into columnar batches with a fixed schema
+and writes them to Parquet, Arrow IPC or CSV files. Only one batch is held in
+memory at a time, whatever the number of messages exported.
+
+Arrow IPC files can be memory mapped by downstream jobs instead of re-parsing
+JSON. Parquet and Arrow output require the optional ``pyarrow`` dependency,
+``pip install hootsweet[arrow]``, CSV is written with the standard library.
+
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Union
+
+from hootsweet.models import parse_timestamp
+
+DEFAULT_BATCH_SIZE = 10000
+
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".csv": "csv"}
+
+CSV_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _nested_id(key: str):
+    return lambda message: (message.get(key) or {}).get("id")
+
+
+def _ids(key: str, id_key: str = "id"):
+    return lambda message: [item.get(id_key) for item in message.get(key) or []]
+
+
+def _field(key: str):
+    return lambda message: message.get(key)
+
+
+# The export columns, as (name, arrow type, value from a message) triples
+MESSAGE_COLUMNS = (
+    ("id", "string", _field("id")),
+    ("state", "string", _field("state")),
+    ("text", "string", _field("text")),
+    ("social_profile_id", "string", _nested_id("socialProfile")),
+    (
+        "scheduled_send_time",
+        "timestamp",
+        lambda message: parse_timestamp(message.get("scheduledSendTime")),
+    ),
+    ("sequence_number", "int64", _field("sequenceNumber")),
+    ("post_id", "string", _field("postId")),
+    ("post_url", "string", _field("postUrl")),
+    ("created_by_member_id", "string", _nested_id("createdByMember")),
+    ("last_updated_by_member_id", "string", _nested_id("lastUpdatedByMember")),
+    ("tags", "list", lambda message: list(message.get("tags") or [])),
+    ("media_ids", "list", _ids("media")),
+    ("media_urls", "list", _ids("mediaUrls", "url")),
+)
+
+COLUMN_NAMES = tuple(name for name, _, _ in MESSAGE_COLUMNS)
+
+
+def message_schema():
+    """The Arrow schema of exported messages."""
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "timestamp": pa.timestamp("s", tz="UTC"),
+        "list": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[type_]) for name, type_, _ in MESSAGE_COLUMNS])
+
+
+def iter_columns(
+    messages: Iterable[Mapping[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[Dict[str, List[Any]]]:
+    """Group messages into batches of columns, keyed by column name.
+
+    Args:
+        messages (Iterable): Message dictionaries or models, e.g. from
+            :meth:`hootsweet.api.HootSweet.iter_outbound_messages`.
+        batch_size (int): Maximum number of messages per batch.
+
+    """
+    columns = {name: [] for name in COLUMN_NAMES}
+    size = 0
+    for message in messages:
+        for name, _, value in MESSAGE_COLUMNS:
+            columns[name].append(value(message))
+        size += 1
+        if size == batch_size:
+            yield columns
+            columns = {name: [] for name in COLUMN_NAMES}
+            size = 0
+    if size:
+        yield columns
+
+
+def iter_record_batches(
+    messages: Iterable[Mapping[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE
+):
+    """Stream messages into Arrow RecordBatches with the message schema.
+
+    Args:
+        messages (Iterable): Message dictionaries or models.
+        batch_size (int): Maximum number of rows per batch.
+
+    """
+    import pyarrow as pa
+
+    schema = message_schema()
+    for columns in iter_columns(messages, batch_size):
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def export_messages(
+    messages: Iterable[Mapping[str, Any]],
+    path: Union[str, os.PathLike],
+    format: str = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Write messages to a Parquet, Arrow IPC or CSV file.
+
+    Args:
+        messages (Iterable): Message dictionaries or models.
+        path (str or PathLike): The file to write.
+        format (str): ``parquet``, ``arrow`` or ``csv``. Guessed from the file
+            extension when not given.
+        batch_size (int): Number of messages held in memory and written at a
+            time.
+
+    Returns:
+        The number of messages written.
+
+    """
+    if format is None:
+        _, extension = os.path.splitext(os.fspath(path))
+        format = FORMATS.get(extension.lower())
+    if format not in FORMATS.values():
+        raise ValueError(
+            "Unknown export format %r, use one of parquet, arrow or csv." % format
+        )
+
+    if format == "csv":
+        return _write_csv(messages, path, batch_size)
+
+    import pyarrow as pa
+
+    rows = 0
+    schema = message_schema()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(os.fspath(path), schema)
+    else:
+        writer = pa.ipc.new_file(os.fspath(path), schema)
+    try:
+        for batch in iter_record_batches(messages, batch_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime(CSV_TIMESTAMP_FORMAT)
+    if isinstance(value, list):
+        return json.dumps(value)
+    return value
+
+
+def _write_csv(messages, path, batch_size: int) -> int:
+    import csv
+
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMN_NAMES)
+        for columns in iter_columns(messages, batch_size):
+            batch = zip(*(columns[name] for name in COLUMN_NAMES))
+            writer.writerows([_csv_value(value) for value in row] for row in batch)
+            rows += len(columns["id"])
+    return rows
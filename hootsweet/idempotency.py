@@ -0,0 +1,201 @@
+"""
+Idempotent Scheduling
+=====================
+
+This module makes :meth:`hootsweet.api.HootSweet.schedule_message` safe to
+retry.
+
+Hootsuite has no idempotency keys, so a schedule request that timed out or
+failed with a 5xx may have scheduled the message anyway, and sending it again
+posts it twice. An IdempotencyIndex fingerprints each message by its text,
+social profiles, send time and media and remembers the messages scheduled for
+recent fingerprints. Before a message is sent again the index is checked, then
+the outbound messages around its send time are searched for it, and it is only
+re-submitted when neither knows it.
+
+"""
+
+import hashlib
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from hootsweet.cache import CacheBackend, MemoryCache
+from hootsweet.exceptions import ServerError
+from requests.exceptions import ConnectionError, Timeout
+
+DEFAULT_MAXSIZE = 10000
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_LOOKUP_WINDOW = timedelta(minutes=1)
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Errors after which a schedule request may or may not have been acted on
+AMBIGUOUS_ERRORS = (ServerError, ConnectionError, Timeout)
+
+
+def _id(value: Any) -> str:
+    return str(value["id"] if isinstance(value, Mapping) else value)
+
+
+def fingerprint(
+    text: str,
+    social_profile_ids: Iterable[Any],
+    send_time: datetime,
+    media: Iterable[Any] = None,
+) -> str:
+    """The fingerprint of a message, equal for messages with the same text,
+    social profiles, in any order, send time and media.
+
+    Args:
+        text (str): The text of the message.
+        social_profile_ids (List[str]): The ids of the social profiles.
+        send_time (datetime): Time to send the message in UTC time.
+        media (List[Dict]): The media of the message, ``{"id": ...}``
+            dictionaries or ids.
+
+    """
+    content = {
+        "text": text,
+        "social_profile_ids": sorted({str(i) for i in social_profile_ids}),
+        "send_time": send_time.strftime(_TIME_FORMAT),
+        "media": [_id(m) for m in media or ()],
+    }
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def matching_messages(
+    messages: Iterable[Dict[str, Any]],
+    text: str,
+    social_profile_ids: Iterable[Any],
+    media: Iterable[Any] = None,
+) -> List[Dict[str, Any]]:
+    """The outbound messages with a text and media on one of some social
+    profiles."""
+    profile_ids = {str(i) for i in social_profile_ids}
+    media_ids = [_id(m) for m in media or ()]
+    return [
+        message
+        for message in messages
+        if message.get("text") == text
+        and str((message.get("socialProfile") or {}).get("id")) in profile_ids
+        and [_id(m) for m in message.get("media") or ()] == media_ids
+    ]
+
+
+class IdempotencyIndex:
+    """The messages scheduled for recent fingerprints, and how schedule
+    requests failing ambiguously are retried.
+
+    A message with the fingerprint of one scheduled less than ``ttl`` seconds
+    ago is not sent again, the messages already scheduled are returned instead.
+    Deleting one of them through the client forgets the fingerprint.
+
+    Args:
+        backend (CacheBackend): Where fingerprints are stored. Defaults to a
+            MemoryCache of 10000 entries, a backend shared between processes
+            deduplicates their retries too.
+        ttl (float): Seconds a fingerprint is remembered. Defaults to a day.
+        max_attempts (int): Times a schedule request failing with a 5xx or a
+            connection error is sent before the error is raised. Defaults to 3.
+        lookup_window (timedelta): How far around its send time a message is
+            searched for before it is sent again. Defaults to 1 minute.
+        backoff_base (float): Backoff in seconds before the first retry,
+            doubled on every retry. Defaults to 0.5.
+        backoff_max (float): Upper bound of a single backoff. Defaults to 10.
+
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend = None,
+        ttl: float = DEFAULT_TTL,
+        max_attempts: int = 3,
+        lookup_window: timedelta = DEFAULT_LOOKUP_WINDOW,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+    ):
+        self.backend = (
+            backend if backend is not None else MemoryCache(maxsize=DEFAULT_MAXSIZE)
+        )
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.lookup_window = lookup_window
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._counts = dict.fromkeys(("hits", "scheduled", "found", "retries"), 0)
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """The messages scheduled for a fingerprint, None if it is unknown."""
+        messages = self.backend.get("fingerprint:%s" % key)
+        if messages is None:
+            return None
+        self._count("hits")
+        return list(messages)
+
+    def add(self, key: str, messages: List[Dict[str, Any]], found: bool = False):
+        """Remember the messages scheduled for a fingerprint.
+
+        Args:
+            key (str): The fingerprint.
+            messages (List[Dict]): The scheduled messages.
+            found (bool): Whether the messages were found by a lookup rather
+                than scheduled.
+
+        """
+        self._count("found" if found else "scheduled")
+        self.backend.set("fingerprint:%s" % key, list(messages), self.ttl)
+        for message in messages:
+            self.backend.set("message:%s" % _id(message), key, self.ttl)
+        self.backend.delete("uncertain:%s" % key)
+
+    def mark_uncertain(self, key: str):
+        """Remember that a schedule request for a fingerprint failed in a way
+        that may have scheduled the message, so that any later attempt, from
+        another call or process sharing the backend, looks it up first.
+
+        """
+        self.backend.set("uncertain:%s" % key, True, self.ttl)
+
+    def is_uncertain(self, key: str) -> bool:
+        """Whether a message with a fingerprint may have been scheduled by a
+        failed request."""
+        return self.backend.get("uncertain:%s" % key) is not None
+
+    def forget_message(self, message_id: str):
+        """Forget the fingerprint of a deleted message, so the same content can
+        be scheduled again.
+
+        """
+        key = self.backend.get("message:%s" % message_id)
+        if key is not None:
+            self.backend.delete("fingerprint:%s" % key)
+            self.backend.delete("message:%s" % message_id)
+
+    def retry_delay(self, attempt: int) -> Optional[float]:
+        """Seconds to wait before checking and re-sending a message after
+        ``attempt`` failed requests, None once ``max_attempts`` is reached.
+
+        """
+        if attempt >= self.max_attempts:
+            return None
+        self._count("retries")
+        # "Full jitter" so that concurrent retries are spread out
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of messages served from the index, scheduled, found by a
+        lookup and of retries.
+
+        """
+        with self._lock:
+            return dict(self._counts)
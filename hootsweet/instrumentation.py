@@ -0,0 +1,287 @@
+"""
+Instrumentation
+===============
+
+This module provides request level instrumentation for HootSweet. Hooks passed
+to the client are called before and after every API request with a RequestEvent
+describing it.
+
+HistogramCollector is a built-in hook keeping latency histograms, status code
+counts, payload sizes and retries per endpoint, which can be exported in the
+Prometheus text format. OpenTelemetryHook records the same measurements with
+the OpenTelemetry metrics API when it is installed.
+
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+# Path segments that are part of the API, any other segment is a resource id
+_LITERAL_SEGMENTS = frozenset(
+    [
+        "approve",
+        "history",
+        "me",
+        "media",
+        "members",
+        "messages",
+        "organizations",
+        "reject",
+        "socialProfiles",
+        "teams",
+    ]
+)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def endpoint_template(resource: str) -> str:
+    """The endpoint template of a resource path, e.g. ``socialProfiles/{id}``
+    for ``socialProfiles/1234``.
+
+    """
+    return "/".join(
+        segment if segment in _LITERAL_SEGMENTS else "{id}"
+        for segment in resource.split("/")
+    )
+
+
+class RequestEvent:
+    """A request made by HootSweet.
+
+    Attributes:
+        method (str): The HTTP method.
+        endpoint (str): The endpoint template, e.g. ``messages/{id}``.
+        url (str): The requested url.
+        status (int): The final response status code, None if no response was
+            received.
+        duration (float): Seconds taken including retries, set after the
+            request.
+        bytes_out (int): Size of the request body.
+        bytes_in (int): Size of the response body.
+        retries (int): Number of times the request was sent again after a 401,
+            429 or 5xx.
+        error (Exception): The exception raised by the request, if any.
+
+    """
+
+    __slots__ = (
+        "method",
+        "endpoint",
+        "url",
+        "status",
+        "duration",
+        "bytes_out",
+        "bytes_in",
+        "retries",
+        "error",
+        "_started",
+    )
+
+    def __init__(self, method: str, endpoint: str, url: str):
+        self.method = method
+        self.endpoint = endpoint
+        self.url = url
+        self.status = None
+        self.duration = None
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.error = None
+        self._started = time.perf_counter()
+
+    def __repr__(self):
+        return "RequestEvent(%s %s status=%s duration=%s)" % (
+            self.method,
+            self.endpoint,
+            self.status,
+            self.duration,
+        )
+
+
+class RequestHook:
+    """Base class for instrumentation hooks, override either method."""
+
+    def before_request(self, event: RequestEvent):
+        pass
+
+    def after_request(self, event: RequestEvent):
+        pass
+
+
+class Histogram:
+    """A cumulative latency histogram."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The upper bound of the bucket holding the q-th quantile, None for an
+        empty histogram and infinity when it is above the largest bucket.
+
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class HistogramCollector(RequestHook):
+    """Collects latency histograms, status codes, payload sizes and retries per
+    endpoint in memory.
+
+    Args:
+        buckets (Sequence[float]): Upper bounds in seconds of the latency
+            histogram buckets.
+
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.statuses: Dict[Tuple[str, str, str], int] = {}
+        self.bytes_in: Dict[Tuple[str, str], int] = {}
+        self.bytes_out: Dict[Tuple[str, str], int] = {}
+        self.retries: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def after_request(self, event: RequestEvent):
+        key = (event.method, event.endpoint)
+        status = str(event.status) if event.status is not None else "error"
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.buckets)
+            histogram.observe(event.duration)
+            status_key = key + (status,)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + event.bytes_in
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + event.bytes_out
+            self.retries[key] = self.retries.get(key, 0) + event.retries
+
+    def quantile(self, method: str, endpoint: str, q: float) -> Optional[float]:
+        """Approximate latency quantile of an endpoint, e.g. ``q=0.99``.
+
+        Args:
+            method (str): The HTTP method.
+            endpoint (str): The endpoint template.
+            q (float): The quantile between 0 and 1.
+
+        """
+        with self._lock:
+            histogram = self.latency.get((method, endpoint))
+            return histogram.quantile(q) if histogram else None
+
+    def to_prometheus(self, prefix: str = "hootsweet") -> str:
+        """Export the collected metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            name = "%s_request_duration_seconds" % prefix
+            lines.append("# TYPE %s histogram" % name)
+            for (method, endpoint), histogram in sorted(self.latency.items()):
+                labels = 'method="%s",endpoint="%s"' % (method, endpoint)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        '%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative)
+                    )
+                lines.append(
+                    '%s_bucket{%s,le="+Inf"} %d' % (name, labels, histogram.count)
+                )
+                lines.append("%s_sum{%s} %s" % (name, labels, histogram.sum))
+                lines.append("%s_count{%s} %d" % (name, labels, histogram.count))
+
+            name = "%s_requests_total" % prefix
+            lines.append("# TYPE %s counter" % name)
+            for (method, endpoint, status), count in sorted(self.statuses.items()):
+                lines.append(
+                    '%s{method="%s",endpoint="%s",status="%s"} %d'
+                    % (name, method, endpoint, status, count)
+                )
+
+            for metric, values in [
+                ("request_bytes_total", self.bytes_out),
+                ("response_bytes_total", self.bytes_in),
+                ("request_retries_total", self.retries),
+            ]:
+                name = "%s_%s" % (prefix, metric)
+                lines.append("# TYPE %s counter" % name)
+                for (method, endpoint), value in sorted(values.items()):
+                    lines.append(
+                        '%s{method="%s",endpoint="%s"} %d'
+                        % (name, method, endpoint, value)
+                    )
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryHook(RequestHook):
+    """Records request metrics with the OpenTelemetry metrics API.
+
+    Requires the optional ``opentelemetry-api`` dependency.
+
+    Args:
+        meter_provider: The MeterProvider to use, defaults to the global one.
+
+    """
+
+    def __init__(self, meter_provider=None):
+        from opentelemetry import metrics
+
+        meter = metrics.get_meter("hootsweet", meter_provider=meter_provider)
+        self.duration = meter.create_histogram("hootsweet.request.duration", unit="s")
+        self.bytes_in = meter.create_counter("hootsweet.response.size", unit="By")
+        self.bytes_out = meter.create_counter("hootsweet.request.size", unit="By")
+        self.retries = meter.create_counter("hootsweet.request.retries")
+
+    def after_request(self, event: RequestEvent):
+        attributes = {
+            "http.method": event.method,
+            "hootsweet.endpoint": event.endpoint,
+            "http.status_code": event.status if event.status is not None else 0,
+        }
+        self.duration.record(event.duration, attributes)
+        self.bytes_in.add(event.bytes_in, attributes)
+        self.bytes_out.add(event.bytes_out, attributes)
+        self.retries.add(event.retries, attributes)
+
+
+def finish_event(event: RequestEvent, response=None, error: Exception = None):
+    """Record the outcome of a request on its event."""
+    event.duration = time.perf_counter() - event._started
+    event.error = error
+    if response is not None:
+        event.status = response.status_code
+        request = getattr(response, "request", None)
+        event.bytes_out = body_size(getattr(request, "body", None))
+        if not event.bytes_out and hasattr(request, "content"):
+            event.bytes_out = body_size(request.content)
+        event.bytes_in = body_size(getattr(response, "content", None))
+
+
+def body_size(body) -> int:
+    """The size in bytes of a request or response body, 0 when unknown."""
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    return 0
@@ -1,4 +1,16 @@
-import pytz
+"""
+Locale Validation
+=================
+
+This module validates the languages and timezones Hootsuite accepts for members.
+
+Both are checked against frozensets. The timezone names come from a backend and
+are loaded on first use, ``pytz`` by default or the standard library
+``zoneinfo``, which avoids importing pytz at all.
+
+"""
+
+from typing import FrozenSet, Optional
 
 ACCEPTED_LANGUAGES = [
     "en",
@@ -21,10 +33,65 @@ ACCEPTED_LANGUAGES = [
     "tr",
 ]
 
+_LANGUAGES = frozenset(ACCEPTED_LANGUAGES)
+
+
+def _pytz_timezones() -> FrozenSet[str]:
+    import pytz
+
+    return frozenset(pytz.all_timezones)
+
+
+def _zoneinfo_timezones() -> FrozenSet[str]:
+    try:
+        import zoneinfo
+    except ImportError:  # Python < 3.9
+        from backports import zoneinfo
+
+    return frozenset(zoneinfo.available_timezones())
+
+
+TIMEZONE_BACKENDS = {
+    "pytz": _pytz_timezones,
+    "zoneinfo": _zoneinfo_timezones,
+}
+
+_backend = None
+_timezones = None
+
+
+def use_timezone_backend(name: Optional[str]):
+    """Choose where valid timezone names come from.
+
+    Args:
+        name (str): ``pytz`` or ``zoneinfo``. None uses pytz when it is
+            installed, otherwise zoneinfo.
+
+    """
+    global _backend, _timezones
+    if name is not None and name not in TIMEZONE_BACKENDS:
+        raise ValueError("Unknown timezone backend %r." % name)
+    _backend, _timezones = name, None
+
+
+def timezones() -> FrozenSet[str]:
+    """The valid timezone names, loaded from the backend on first use."""
+    global _timezones
+    if _timezones is None:
+        backend = _backend
+        if backend is None:
+            try:
+                _timezones = _pytz_timezones()
+                return _timezones
+            except ImportError:
+                backend = "zoneinfo"
+        _timezones = TIMEZONE_BACKENDS[backend]()
+    return _timezones
+
 
 def is_valid_language(language: str):
-    return language in ACCEPTED_LANGUAGES
+    return language in _LANGUAGES
 
 
 def is_valid_timezone(timezone: str):
-    return timezone in pytz.all_timezones
+    return timezone in timezones()
@@ -0,0 +1,223 @@
+"""
+Media Uploads
+=============
+
+This module provides helpers for streaming media files to the upload URLs
+returned by :meth:`hootsweet.api.HootSweet.create_media_upload_url` without
+reading them into memory.
+
+"""
+
+import io
+import mimetypes
+import mmap
+import os
+import time
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Tuple, Union
+
+from hootsweet.exceptions import (
+    MediaUploadFailed,
+    MediaUploadTimeout,
+    MIMETypeNotAllowed,
+)
+
+READY = "READY"
+FAILED = "FAILED"
+
+CHUNK_SIZE = 1024 * 1024
+
+MediaSource = Union[str, os.PathLike, IO[bytes]]
+MediaItem = Union[MediaSource, Tuple[MediaSource, str]]
+
+
+class MediaUploadResult:
+    """The outcome and metrics of one file uploaded by
+    :meth:`hootsweet.api.HootSweet.upload_media_batch`.
+
+    Attributes:
+        source: The file that was uploaded.
+        media_id (str): The Hootsuite media id, None if the upload URL could
+            not be created.
+        size (int): Size of the file in bytes.
+        upload_seconds (float): Time spent streaming the file to storage.
+        elapsed (float): Time from starting the upload until the media was
+            ready, or failed.
+        status (Dict): The last media upload status retrieved.
+        error (Exception): Why the upload failed, None if it succeeded.
+
+    """
+
+    __slots__ = (
+        "source",
+        "media_id",
+        "size",
+        "upload_seconds",
+        "elapsed",
+        "status",
+        "error",
+        "_started",
+    )
+
+    def __init__(self, source: MediaSource):
+        self.source = source
+        self.media_id = None
+        self.size = 0
+        self.upload_seconds = 0.0
+        self.elapsed = 0.0
+        self.status = None
+        self.error = None
+        self._started = time.monotonic()
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Upload throughput to storage."""
+        if not self.upload_seconds:
+            return 0.0
+        return self.size / self.upload_seconds
+
+    def finish(self, status=None, error: Exception = None):
+        self.status = status if status is not None else self.status
+        self.error = error
+        self.elapsed = time.monotonic() - self._started
+
+    def settle(self, status) -> bool:
+        """Record a polled media upload status, or the exception raised polling
+        it. Returns True once the media is ready or has failed.
+
+        """
+        if isinstance(status, Exception):
+            self.finish(error=status)
+        elif status.get("state") == READY:
+            self.finish(status)
+        elif status.get("state") == FAILED:
+            error = MediaUploadFailed("Media %s failed to upload." % self.media_id)
+            self.finish(status, error)
+        else:
+            self.status = status
+            return False
+        return True
+
+    def time_out(self, timeout: float):
+        error = MediaUploadTimeout(
+            "Media %s was not ready after %ss." % (self.media_id, timeout)
+        )
+        self.finish(error=error)
+
+    def __repr__(self):
+        return (
+            "MediaUploadResult(media_id=%r, size=%s, bytes_per_second=%.0f, error=%r)"
+            % (
+                self.media_id,
+                self.size,
+                self.bytes_per_second,
+                self.error,
+            )
+        )
+
+
+def guess_mime_type(source: MediaSource) -> Optional[str]:
+    """Guess the MIME type of a file from its name.
+
+    Args:
+        source (str, PathLike or file object): The file, file objects without
+            a ``name`` attribute, like ``io.BytesIO``, can't be guessed.
+
+    Returns:
+        The MIME type, None if the file has no name or an unknown extension.
+
+    """
+    if isinstance(source, (str, os.PathLike)):
+        name = source
+    else:
+        name = getattr(source, "name", None)
+        # Files opened from a descriptor have an int name
+        if not isinstance(name, (str, os.PathLike)):
+            return None
+    mime_type, _ = mimetypes.guess_type(os.fspath(name))
+    return mime_type
+
+
+def resolve_mime_type(source: MediaSource, mime_type: str = None) -> str:
+    """The MIME type to upload a file as, ``mime_type`` when given, otherwise
+    guessed from the file name.
+
+    Raises:
+        MIMETypeNotAllowed: The MIME type was not given and can't be guessed.
+
+    """
+    mime_type = mime_type or guess_mime_type(source)
+    if mime_type is None:
+        raise MIMETypeNotAllowed(
+            "Cannot guess the MIME type of %r, pass mime_type." % (source,)
+        )
+    return mime_type
+
+
+def split_media_item(item: MediaItem) -> Tuple[MediaSource, Optional[str]]:
+    """Split an item of a batch upload, a file or a ``(file, mime_type)``
+    tuple, into the file and its MIME type, None when not given.
+
+    """
+    if isinstance(item, tuple):
+        source, mime_type = item
+        return source, mime_type
+    return item, None
+
+
+@contextmanager
+def open_media(source: MediaSource) -> Iterator[Tuple[object, int]]:
+    """Open a media file as a request body without reading it into memory.
+
+    Local files are memory mapped, file objects are streamed from their current
+    position.
+
+    Args:
+        source (str, PathLike or file object): The file to open.
+
+    Yields:
+        A ``(body, size)`` tuple, where ``body`` is a memory map or file object.
+
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                # Empty files cannot be memory mapped
+                yield b"", 0
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as body:
+                yield body, size
+    else:
+        position = source.tell()
+        size = source.seek(0, io.SEEK_END) - position
+        source.seek(position)
+        yield source, size
+
+
+def iter_chunks(body, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a memory map or file object in chunks."""
+    if isinstance(body, (bytes, mmap.mmap)):
+        view = memoryview(body)
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset : offset + chunk_size])
+        view.release()
+    else:
+        chunk = body.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = body.read(chunk_size)
+
+
+def poll_delays(
+    initial: float = 1.0, maximum: float = 10.0, factor: float = 1.5
+) -> Iterator[float]:
+    """An endless series of exponentially increasing delays between polls."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(maximum, delay * factor)
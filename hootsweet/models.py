@@ -0,0 +1,247 @@
+"""
+Response Models
+===============
+
+This module provides opt-in typed models for HootSweet responses. Models keep
+their fields in ``__slots__`` instead of a dictionary per record, which uses a
+fraction of the memory when many records are held at once.
+
+Nested objects are only turned into models when they are first accessed, and
+timestamps are parsed on access. Models can still be read like the response
+dictionaries with the API's field names, ``message["socialProfile"]``, and
+``to_dict`` returns the original dictionary.
+
+Enable them with ``HootSweet(..., models=True)``.
+
+"""
+
+import functools
+from collections.abc import Awaitable
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+_TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Hootsuite timestamp into a UTC datetime."""
+    if value is None:
+        return None
+    for timestamp_format in _TIMESTAMP_FORMATS:
+        try:
+            parsed = datetime.strptime(value, timestamp_format)
+        except ValueError:
+            continue
+        return parsed.replace(tzinfo=timezone.utc)
+    raise ValueError("%r is not a Hootsuite timestamp." % value)
+
+
+def nested(slot: str, model) -> property:
+    """A field holding a nested object, decoded into ``model`` on first access."""
+
+    def get(self):
+        value = getattr(self, slot)
+        if isinstance(value, dict):
+            value = model.from_dict(value)
+            setattr(self, slot, value)
+        return value
+
+    return property(get)
+
+
+def timestamp(slot: str) -> property:
+    """A field holding a timestamp, parsed on every access."""
+    return property(lambda self: parse_timestamp(getattr(self, slot)))
+
+
+class Model:
+    """Base class of the response models.
+
+    Subclasses list their fields in ``_fields`` as ``(slot, key)`` pairs, where
+    ``key`` is the field name in the API response. Keys the model does not know
+    about are kept in ``_extra``.
+
+    """
+
+    __slots__ = ("_extra",)
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._slots_by_key = {key: slot for slot, key in cls._fields}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Model":
+        """Build a model from a response dictionary."""
+        obj = cls.__new__(cls)
+        for slot, key in cls._fields:
+            setattr(obj, slot, data.get(key))
+        slots_by_key = cls._slots_by_key
+        obj._extra = {k: v for k, v in data.items() if k not in slots_by_key} or None
+        return obj
+
+    @classmethod
+    def build(cls, data: Union[Dict, List[Dict], None]):
+        """Build a model, or a list of models, from response data."""
+        if isinstance(data, list):
+            return [cls.from_dict(item) for item in data]
+        if isinstance(data, dict):
+            return cls.from_dict(data)
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The response dictionary the model was built from."""
+        data = {}
+        for slot, key in self._fields:
+            value = getattr(self, slot)
+            if value is not None:
+                data[key] = value.to_dict() if isinstance(value, Model) else value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        slot = self._slots_by_key.get(key)
+        if slot is not None:
+            value = getattr(self, slot)
+            if value is not None:
+                return value.to_dict() if isinstance(value, Model) else value
+        elif self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, Model):
+            return NotImplemented
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(id=%r)" % (self.__class__.__name__, self.get("id"))
+
+
+class Organization(Model):
+    """A Hootsuite organization."""
+
+    _fields = (("id", "id"),)
+    __slots__ = tuple(slot for slot, _ in _fields)
+
+
+class Member(Model):
+    """A Hootsuite organization member."""
+
+    _fields = (
+        ("id", "id"),
+        ("full_name", "fullName"),
+        ("email", "email"),
+        ("company_name", "companyName"),
+        ("bio", "bio"),
+        ("timezone", "timezone"),
+        ("language", "language"),
+    )
+    __slots__ = tuple(slot for slot, _ in _fields)
+
+
+class SocialProfile(Model):
+    """A social network profile connected to Hootsuite."""
+
+    _fields = (
+        ("id", "id"),
+        ("type", "type"),
+        ("social_network_id", "socialNetworkId"),
+        ("social_network_username", "socialNetworkUsername"),
+        ("avatar_url", "avatarUrl"),
+        ("owner", "owner"),
+        ("owner_id", "ownerId"),
+    )
+    __slots__ = tuple(slot for slot, _ in _fields)
+
+
+class MediaUpload(Model):
+    """A media upload URL or the status of an upload."""
+
+    _fields = (
+        ("id", "id"),
+        ("state", "state"),
+        ("upload_url", "uploadUrl"),
+        ("upload_url_duration_seconds", "uploadUrlDurationSeconds"),
+        ("download_url", "downloadUrl"),
+        ("download_url_duration_seconds", "downloadUrlDurationSeconds"),
+    )
+    __slots__ = tuple(slot for slot, _ in _fields)
+
+
+class Message(Model):
+    """An outbound message.
+
+    ``social_profile``, ``created_by_member`` and ``last_updated_by_member`` are
+    decoded into models on first access, ``scheduled_send_time`` is parsed into
+    a UTC datetime on access.
+
+    """
+
+    _fields = (
+        ("id", "id"),
+        ("state", "state"),
+        ("text", "text"),
+        ("_social_profile", "socialProfile"),
+        ("media_urls", "mediaUrls"),
+        ("media", "media"),
+        ("webhook_urls", "webhookUrls"),
+        ("tags", "tags"),
+        ("targeting", "targeting"),
+        ("privacy", "privacy"),
+        ("location", "location"),
+        ("email_notification", "emailNotification"),
+        ("post_url", "postUrl"),
+        ("post_id", "postId"),
+        ("reviewers", "reviewers"),
+        ("_created_by_member", "createdByMember"),
+        ("_last_updated_by_member", "lastUpdatedByMember"),
+        ("extended_info", "extendedInfo"),
+        ("sequence_number", "sequenceNumber"),
+        ("_scheduled_send_time", "scheduledSendTime"),
+    )
+    __slots__ = tuple(slot for slot, _ in _fields)
+
+    social_profile = nested("_social_profile", SocialProfile)
+    created_by_member = nested("_created_by_member", Member)
+    last_updated_by_member = nested("_last_updated_by_member", Member)
+    scheduled_send_time = timestamp("_scheduled_send_time")
+
+
+def returns(model):
+    """Build ``model`` instances from the result of a HootSweet method when the
+    client has models enabled.
+
+    Works for both HootSweet and AsyncHootSweet, where the method returns a
+    coroutine.
+
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            result = func(self, *args, **kwargs)
+            if not self.models:
+                return result
+
+            if isinstance(result, Awaitable):
+
+                async def build():
+                    return model.build(await result)
+
+                return build()
+
+            return model.build(result)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,359 @@
+"""
+Outbox
+======
+
+This module provides Outbox, a write-ahead log of schedule and delete requests
+kept in SQLite on local disk.
+
+Requests are recorded as intents, which returns as soon as they are on disk, and
+are sent to Hootsuite later by :meth:`Outbox.drain` in batches with bounded
+concurrency. The message ids returned are stored with each intent, so after a
+crash or restart draining resumes with the intents that were not sent.
+
+An intent that was in flight when the process died, or whose request failed
+without a response, may have reached Hootsuite. It is marked uncertain and
+before it is sent again the outbound messages around its send time are searched
+for it, so it is not scheduled twice.
+
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Union
+
+from hootsweet.batch import DEFAULT_MAX_WORKERS, run_concurrently
+from hootsweet.exceptions import NotFound, TooManyRequests
+from hootsweet.idempotency import AMBIGUOUS_ERRORS
+
+SCHEDULE = "schedule"
+DELETE = "delete"
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    uncertain INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    message_ids TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intents_state ON intents (state, id);
+"""
+
+_COLUMNS = (
+    "id, action, payload, state, uncertain, attempts, message_ids, error, "
+    "created_at, updated_at"
+)
+
+# Errors retried on a later drain
+RETRYABLE_ERRORS = (TooManyRequests,) + AMBIGUOUS_ERRORS
+
+
+class Intent:
+    """A request recorded in the outbox.
+
+    Attributes:
+        id (int): The intent id returned when it was recorded.
+        action (str): ``schedule`` or ``delete``.
+        payload (Dict): The arguments of the request.
+        state (str): ``pending``, ``in_flight``, ``done`` or ``failed``.
+        uncertain (bool): Whether an earlier attempt may have reached Hootsuite.
+        attempts (int): Number of times the request was sent.
+        message_ids (List[str]): The ids of the messages scheduled or deleted.
+        error (str): Why the last attempt failed.
+
+    """
+
+    __slots__ = (
+        "id",
+        "action",
+        "payload",
+        "state",
+        "uncertain",
+        "attempts",
+        "message_ids",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+
+    def __init__(self, row):
+        (
+            self.id,
+            self.action,
+            payload,
+            self.state,
+            uncertain,
+            self.attempts,
+            message_ids,
+            self.error,
+            self.created_at,
+            self.updated_at,
+        ) = row
+        self.payload = json.loads(payload)
+        self.uncertain = bool(uncertain)
+        self.message_ids = json.loads(message_ids) if message_ids else None
+
+    def __repr__(self):
+        return "Intent(%s, %s, %s)" % (self.id, self.action, self.state)
+
+
+class Outbox:
+    """A durable queue of schedule and delete requests.
+
+    One process should drain an outbox file at a time, any number may record
+    intents in it.
+
+    Args:
+        path (str or PathLike): The database file.
+        max_attempts (int): Times a request failing with a retryable error,
+            a 429, 5xx or connection error, is sent before it fails. Defaults
+            to 5.
+        lookup_window (timedelta): How far around its send time an uncertain
+            message is searched for. Defaults to the client's, see
+            :meth:`hootsweet.api.HootSweet.find_scheduled_messages`.
+
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        max_attempts: int = 5,
+        lookup_window: timedelta = None,
+    ):
+        self.path = os.fspath(path)
+        self.max_attempts = max_attempts
+        self.lookup_window = lookup_window
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._db.close()
+
+    def schedule_message(
+        self,
+        text: str,
+        social_profile_ids: List[str],
+        send_time: datetime,
+        **kwargs,
+    ) -> int:
+        """Record a message to schedule.
+
+        Takes the arguments of :meth:`hootsweet.api.HootSweet.schedule_message`,
+        which must be JSON serializable apart from ``send_time``.
+
+        Returns:
+            The intent id.
+
+        """
+        assert isinstance(send_time, datetime), "send_time must be a datetime"
+        payload = dict(
+            kwargs,
+            text=text,
+            social_profile_ids=list(social_profile_ids),
+            send_time=send_time.strftime(_TIME_FORMAT),
+        )
+        return self._record(SCHEDULE, payload)
+
+    def delete_message(self, message_id: str) -> int:
+        """Record a message to delete.
+
+        Returns:
+            The intent id.
+
+        """
+        return self._record(DELETE, {"message_id": message_id})
+
+    def _record(self, action: str, payload: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO intents (action, payload, state, created_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?)",
+                (action, json.dumps(payload), PENDING, now, now),
+            )
+        return cursor.lastrowid
+
+    def recover(self):
+        """Return intents left in flight by a drain that died to pending,
+        marked uncertain. Called when a drain starts.
+
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE intents SET state = ?, uncertain = 1, updated_at = ? "
+                "WHERE state = ?",
+                (PENDING, time.time(), IN_FLIGHT),
+            )
+
+    def get(self, intent_id: int) -> Optional[Intent]:
+        """The intent with an id."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT %s FROM intents WHERE id = ?" % _COLUMNS, (intent_id,)
+            ).fetchone()
+        return Intent(row) if row else None
+
+    def intents(self, state: str = None) -> List[Intent]:
+        """Every intent, or those in a state, in the order recorded."""
+        query = "SELECT %s FROM intents" % _COLUMNS
+        args = ()
+        if state is not None:
+            query += " WHERE state = ?"
+            args = (state,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id", args).fetchall()
+        return [Intent(row) for row in rows]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of intents in each state."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*) FROM intents GROUP BY state"
+            ).fetchall()
+        counts = dict.fromkeys((PENDING, IN_FLIGHT, DONE, FAILED), 0)
+        counts.update(rows)
+        return counts
+
+    def drain(
+        self,
+        client,
+        batch_size: int = 100,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_batches: int = None,
+    ) -> List[Intent]:
+        """Send pending intents until none are left.
+
+        Intents failing with a retryable error stay pending for the next
+        drain, until they have been attempted ``max_attempts`` times.
+
+        Args:
+            client (HootSweet): The client to send the requests with.
+            batch_size (int): Number of intents claimed at a time. Defaults to
+                100.
+            max_workers (int): Maximum number of requests sent at once.
+                Defaults to 8.
+            max_batches (int): Stop after this many batches. Defaults to no
+                limit.
+
+        Returns:
+            The intents that were done or failed in this drain.
+
+        """
+        self.recover()
+        settled = []
+        # Intents are claimed in id order, so retried intents, behind the
+        # cursor, wait for the next drain rather than spin in this one.
+        cursor = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            batch = self._claim(batch_size, after=cursor)
+            if not batch:
+                break
+            batches += 1
+            cursor = batch[-1].id
+            results = run_concurrently(
+                lambda intent: self._send(client, intent), batch, max_workers
+            )
+            for intent, result in zip(batch, results):
+                intent = self._settle(intent, result)
+                if intent.state != PENDING:
+                    settled.append(intent)
+        return settled
+
+    def _claim(self, batch_size: int, after: int) -> List[Intent]:
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT %s FROM intents WHERE state = ? AND id > ? "
+                "ORDER BY id LIMIT ?" % _COLUMNS,
+                (PENDING, after, batch_size),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE intents SET state = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                [(IN_FLIGHT, time.time(), row[0]) for row in rows],
+            )
+        intents = [Intent(row) for row in rows]
+        for intent in intents:
+            intent.state = IN_FLIGHT
+            intent.attempts += 1
+        return intents
+
+    def _send(self, client, intent: Intent) -> List[str]:
+        payload = dict(intent.payload)
+        if intent.action == DELETE:
+            try:
+                client.delete_message(payload["message_id"])
+            except NotFound:
+                # An earlier attempt may have deleted it already
+                if not intent.uncertain:
+                    raise
+            return [payload["message_id"]]
+
+        payload["send_time"] = datetime.strptime(payload["send_time"], _TIME_FORMAT)
+        if intent.uncertain:
+            message_ids = self._find_scheduled(client, payload)
+            if message_ids:
+                return message_ids
+        return [message["id"] for message in client.schedule_message(**payload)]
+
+    def _find_scheduled(self, client, payload: Dict[str, Any]) -> List[str]:
+        messages = client.find_scheduled_messages(
+            payload["text"],
+            payload["social_profile_ids"],
+            payload["send_time"],
+            payload.get("media"),
+            window=self.lookup_window,
+        )
+        return [message["id"] for message in messages]
+
+    def _settle(self, intent: Intent, result) -> Intent:
+        if not isinstance(result, Exception):
+            intent.state, intent.message_ids, intent.error = DONE, result, None
+        else:
+            intent.error = repr(result)
+            intent.uncertain = intent.uncertain or isinstance(result, AMBIGUOUS_ERRORS)
+            retryable = isinstance(result, RETRYABLE_ERRORS)
+            if retryable and intent.attempts < self.max_attempts:
+                intent.state = PENDING
+            else:
+                intent.state = FAILED
+
+        intent.updated_at = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE intents SET state = ?, uncertain = ?, message_ids = ?, "
+                "error = ?, updated_at = ? WHERE id = ?",
+                (
+                    intent.state,
+                    int(intent.uncertain),
+                    (
+                        json.dumps(intent.message_ids)
+                        if intent.message_ids is not None
+                        else None
+                    ),
+                    intent.error,
+                    intent.updated_at,
+                    intent.id,
+                ),
+            )
+        return intent
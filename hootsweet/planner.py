@@ -0,0 +1,349 @@
+"""
+Sharded Message Queries
+=======================
+
+This module splits large outbound message queries into shards, time windows of
+a group of social profiles, that are queried concurrently and merged.
+
+Each shard is a single ``get_outbound_messages`` request. Window sizes adapt to
+the density of messages seen so far so a shard stays under the page limit, and
+a shard that fills a page is split in half and queried again so no message is
+lost to the limit. A query plans at most ``max_shards`` shards, once they are
+spent the rest of the range is paged through instead of split further.
+
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from hootsweet.batch import DEFAULT_MAX_WORKERS
+from hootsweet.constants import MessageState
+
+
+class Shard:
+    """A time window of a group of social profiles.
+
+    Attributes:
+        start_time (datetime): The start of the window.
+        end_time (datetime): The end of the window.
+        social_profile_ids (List[str]): The profiles queried, None for all.
+        group (int): The index of the profile group.
+        paged (bool): Follow the pagination cursor instead of reading a single
+            page, for windows that cannot be split any further.
+
+    """
+
+    __slots__ = ("start_time", "end_time", "social_profile_ids", "group", "paged")
+
+    def __init__(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        social_profile_ids: Optional[List[str]],
+        group: int = 0,
+        paged: bool = False,
+    ):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.social_profile_ids = social_profile_ids
+        self.group = group
+        self.paged = paged
+
+    @property
+    def span(self) -> timedelta:
+        return self.end_time - self.start_time
+
+    def split(self) -> List["Shard"]:
+        """The two halves of the window."""
+        middle = self.start_time + self.span / 2
+        return [
+            Shard(self.start_time, middle, self.social_profile_ids, self.group),
+            Shard(middle, self.end_time, self.social_profile_ids, self.group),
+        ]
+
+    def __repr__(self):
+        return "Shard(%s, %s, %s)" % (
+            self.start_time,
+            self.end_time,
+            self.social_profile_ids,
+        )
+
+
+class MessageQueryPlanner:
+    """Queries outbound messages over a large time range and many profiles with
+    concurrent shards.
+
+    Args:
+        client (HootSweet): The client to query messages with.
+        max_workers (int): Maximum number of shards queried at once. Defaults
+            to 8.
+        limit (int): Page size requested for each shard. Defaults to 100.
+        fill (float): Fraction of a page a new shard aims to fill, based on the
+            message density seen so far. Defaults to 0.5.
+        profiles_per_shard (int): Number of social profiles queried together.
+            Defaults to 10.
+        initial_window (timedelta): Window of the first shards, before any
+            density is known. Defaults to 7 days.
+        min_window (timedelta): Shards are not split below this, a full shard
+            of this size is paged through instead. Defaults to 1 minute.
+        max_window (timedelta): The largest window queried. Defaults to 28
+            days.
+        max_shards (int): Number of shards a query plans before it stops
+            splitting and pages through each remaining window instead. A query
+            whose pages are always full sends at most about twice this many
+            requests. Defaults to 256.
+
+    """
+
+    def __init__(
+        self,
+        client,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        limit: int = 100,
+        fill: float = 0.5,
+        profiles_per_shard: int = 10,
+        initial_window: timedelta = timedelta(days=7),
+        min_window: timedelta = timedelta(minutes=1),
+        max_window: timedelta = timedelta(days=28),
+        max_shards: int = 256,
+    ):
+        self.client = client
+        self.max_workers = max_workers
+        self.limit = limit
+        self.fill = fill
+        self.profiles_per_shard = profiles_per_shard
+        self.initial_window = initial_window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.max_shards = max_shards
+        self.shards = 0
+        self.splits = 0
+        self._densities = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        social_profile_ids: Sequence[str] = None,
+        state: MessageState = None,
+    ) -> List[Any]:
+        """Retrieve every outbound message in a time range.
+
+        Args:
+            start_time (datetime): The start date range of the messages returned.
+            end_time (datetime): The end date range of the messages returned.
+            social_profile_ids (Sequence[str]): The ids of social profiles of the
+                messages returned.
+            state (MessageState): The state of the messages returned.
+
+        Returns:
+            The messages deduplicated by id and ordered by scheduled send time.
+
+        """
+        plan = _Plan(self, start_time, end_time, social_profile_ids)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            try:
+                while True:
+                    while len(running) < self.max_workers:
+                        shard = plan.next_shard()
+                        if shard is None:
+                            break
+                        future = executor.submit(self._query, shard, state)
+                        running[future] = shard
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        plan.collect(running.pop(future), future.result())
+            finally:
+                for future in running:
+                    future.cancel()
+        return plan.results()
+
+    async def run_async(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        social_profile_ids: Sequence[str] = None,
+        state: MessageState = None,
+    ) -> List[Any]:
+        """Retrieve every outbound message in a time range with an
+        AsyncHootSweet client, ``max_workers`` shards being awaited at once.
+
+        Takes the arguments of :meth:`run`.
+
+        """
+        # asyncio is only loaded by asyncio users
+        import asyncio
+
+        plan = _Plan(self, start_time, end_time, social_profile_ids)
+        running = {}
+        try:
+            while True:
+                while len(running) < self.max_workers:
+                    shard = plan.next_shard()
+                    if shard is None:
+                        break
+                    task = asyncio.ensure_future(self._query_async(shard, state))
+                    running[task] = shard
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    plan.collect(running.pop(task), task.result())
+        finally:
+            for task in running:
+                task.cancel()
+        return plan.results()
+
+    def _profile_groups(self, social_profile_ids) -> List[Optional[List[str]]]:
+        if not social_profile_ids:
+            return [None]
+        ids = list(social_profile_ids)
+        size = self.profiles_per_shard
+        return [ids[i : i + size] for i in range(0, len(ids), size)]
+
+    def _window(self, group: int) -> timedelta:
+        # The window expected to hold ``fill`` of a page at the density seen
+        density = self._densities.get(group)
+        if density is None:
+            return self.initial_window
+        if density == 0:
+            return self.max_window
+        window = timedelta(seconds=self.limit * self.fill / density)
+        return max(self.min_window, min(self.max_window, window))
+
+    def _observe(self, shard: Shard, count: int):
+        # A full page only gives a lower bound of the density, which still
+        # shrinks later windows.
+        seconds = shard.span.total_seconds()
+        if shard.paged or not seconds:
+            return
+        density = count / seconds
+        with self._lock:
+            previous = self._densities.get(shard.group)
+            if previous is not None:
+                density = (previous + density) / 2
+            self._densities[shard.group] = density
+
+    def _query(self, shard: Shard, state: MessageState) -> List[Any]:
+        with self._lock:
+            self.shards += 1
+        if shard.paged:
+            return list(
+                self.client.iter_outbound_messages(
+                    shard.start_time,
+                    shard.end_time,
+                    state=state,
+                    social_profile_ids=shard.social_profile_ids,
+                    limit=self.limit,
+                    prefetch=False,
+                )
+            )
+        return self.client.get_outbound_messages(
+            shard.start_time,
+            shard.end_time,
+            state=state,
+            social_profile_ids=shard.social_profile_ids,
+            limit=self.limit,
+        )
+
+    async def _query_async(self, shard: Shard, state: MessageState) -> List[Any]:
+        with self._lock:
+            self.shards += 1
+        if shard.paged:
+            messages = self.client.iter_outbound_messages(
+                shard.start_time,
+                shard.end_time,
+                state=state,
+                social_profile_ids=shard.social_profile_ids,
+                limit=self.limit,
+                prefetch=False,
+            )
+            return [message async for message in messages]
+        return await self.client.get_outbound_messages(
+            shard.start_time,
+            shard.end_time,
+            state=state,
+            social_profile_ids=shard.social_profile_ids,
+            limit=self.limit,
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of shards queried and split."""
+        return {"shards": self.shards, "splits": self.splits}
+
+
+class _Plan:
+    # The shards left to query and the messages merged during one run
+
+    def __init__(self, planner, start_time, end_time, social_profile_ids):
+        self.planner = planner
+        self.end_time = end_time
+        self.groups = planner._profile_groups(social_profile_ids)
+        self.cursors = [start_time] * len(self.groups)
+        self.retries = deque()
+        self.merged = {}
+        # Shards planned so far, bounded by the planner's max_shards
+        self.planned = 0
+
+    def next_shard(self) -> Optional[Shard]:
+        if self.retries:
+            return self.retries.popleft()
+        for group, cursor in enumerate(self.cursors):
+            if cursor < self.end_time:
+                self.planned += 1
+                if self.planned >= self.planner.max_shards:
+                    # Out of shards, the rest of the range is one paged query
+                    self.cursors[group] = self.end_time
+                    return Shard(
+                        cursor, self.end_time, self.groups[group], group, paged=True
+                    )
+                window_end = min(cursor + self.planner._window(group), self.end_time)
+                self.cursors[group] = window_end
+                return Shard(cursor, window_end, self.groups[group], group)
+        return None
+
+    def collect(self, shard: Shard, messages: List[Any]):
+        planner = self.planner
+        planner._observe(shard, len(messages))
+        if shard.paged or len(messages) < planner.limit:
+            for message in messages:
+                self.merged[message["id"]] = message
+        elif (
+            shard.span / 2 >= planner.min_window
+            and self.planned + 2 <= planner.max_shards
+        ):
+            planner.splits += 1
+            self.planned += 2
+            self.retries.extendleft(reversed(shard.split()))
+        else:
+            self.retries.appendleft(_paged(shard))
+
+    def results(self) -> List[Any]:
+        return sorted(
+            self.merged.values(),
+            key=lambda message: (message.get("scheduledSendTime") or "", message["id"]),
+        )
+
+
+def _paged(shard: Shard) -> Shard:
+    return Shard(
+        shard.start_time,
+        shard.end_time,
+        shard.social_profile_ids,
+        shard.group,
+        paged=True,
+    )
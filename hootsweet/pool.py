@@ -0,0 +1,178 @@
+"""
+Multi-tenant Client Pool
+========================
+
+This module provides HootSweetPool, which hands out a HootSweet client per
+tenant, a member or token id, for applications acting on behalf of many
+Hootsuite members.
+
+Clients are built once per tenant and kept in an LRU, the least recently used
+client is dropped when the pool is full. Every client mounts the same transport
+adapter so tenants share one HTTP connection pool, while the token, refresh
+state and rate limiter of each tenant stay its own.
+
+"""
+
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+from hootsweet.adapters import PoolAdapter
+from hootsweet.api import HootSweet
+from hootsweet.ratelimit import RateLimiter
+from hootsweet.tokens import TokenStore
+from requests.adapters import DEFAULT_POOLBLOCK
+
+DEFAULT_MAX_CLIENTS = 1024
+
+
+def _tenant_refresh_cb(refresh_cb, tenant_id):
+    @functools.wraps(refresh_cb)
+    def wrapper(token):
+        return refresh_cb(tenant_id, token)
+
+    return wrapper
+
+
+class HootSweetPool:
+    """An LRU of HootSweet clients keyed by tenant.
+
+    Args:
+        client_id (str): The Hootsuite app client id.
+        client_secret (str): The Hootsuite app client secret.
+        token_loader (callable): Called with a tenant id to get its token when
+            the tenant has no client yet.
+        refresh_cb (callable): Called with the tenant id and the new token when
+            a tenant's token is refreshed.
+        rate_limiter_factory (callable): Called with a tenant id to build the
+            tenant's RateLimiter, e.g. ``lambda tenant: RateLimiter(rate=5)``.
+        token_store_factory (callable): Called with a tenant id to build the
+            tenant's TokenStore, e.g. ``lambda tenant: SQLiteTokenStore(path,
+            key=tenant)``, so processes share tenant tokens.
+        max_clients (int): Number of clients kept, the least recently used is
+            dropped beyond it. Defaults to 1024.
+        pool_connections (int): Number of host pools of the shared adapter.
+        pool_maxsize (int): Maximum number of connections kept per host by the
+            shared adapter. Defaults to 100.
+        pool_block (bool): Whether threads wait for a free connection.
+        tcp_keepalive (bool): Enable TCP keep-alive probes.
+        client_kwargs: Other arguments passed to every HootSweet. They are
+            shared between tenants, so a ResponseCache should not be passed
+            unless tenants may see each other's data.
+
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        token_loader: Callable[[Hashable], Dict[str, Any]] = None,
+        refresh_cb: Callable[[Hashable, Dict[str, Any]], Any] = None,
+        rate_limiter_factory: Callable[[Hashable], RateLimiter] = None,
+        token_store_factory: Callable[[Hashable], TokenStore] = None,
+        max_clients: int = DEFAULT_MAX_CLIENTS,
+        pool_connections: int = 10,
+        pool_maxsize: int = 100,
+        pool_block: bool = DEFAULT_POOLBLOCK,
+        tcp_keepalive: bool = False,
+        **client_kwargs,
+    ):
+        self.client_id, self.client_secret = client_id, client_secret
+        self.token_loader = token_loader
+        self.refresh_cb = refresh_cb
+        self.rate_limiter_factory = rate_limiter_factory
+        self.token_store_factory = token_store_factory
+        self.max_clients = max_clients
+        self.client_kwargs = client_kwargs
+        self.adapter = PoolAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            tcp_keepalive=tcp_keepalive,
+        )
+        self.evictions = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __contains__(self, tenant_id: Hashable) -> bool:
+        return tenant_id in self._clients
+
+    def get(self, tenant_id: Hashable, token: Dict[str, Any] = None) -> HootSweet:
+        """The client of a tenant, built on first use.
+
+        Args:
+            tenant_id (Hashable): The member or token id of the tenant.
+            token (Dict): The tenant's token, used when the tenant has no client
+                yet. Defaults to the token returned by ``token_loader``.
+
+        """
+        # The hot path is a dictionary lookup and a relink of the LRU
+        with self._lock:
+            client = self._clients.get(tenant_id)
+            if client is not None:
+                self._clients.move_to_end(tenant_id)
+                return client
+
+        if token is None and self.token_loader is not None:
+            token = self.token_loader(tenant_id)
+        client = self._build(tenant_id, token)
+
+        with self._lock:
+            # Another thread may have built the tenant's client meanwhile
+            existing = self._clients.get(tenant_id)
+            if existing is not None:
+                self._clients.move_to_end(tenant_id)
+                return existing
+            self._clients[tenant_id] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        return client
+
+    def add(self, tenant_id: Hashable, token: Dict[str, Any]) -> HootSweet:
+        """Build a tenant's client with a new token, replacing any client it
+        had.
+
+        """
+        self.remove(tenant_id)
+        return self.get(tenant_id, token)
+
+    def remove(self, tenant_id: Hashable):
+        """Drop a tenant's client."""
+        with self._lock:
+            self._clients.pop(tenant_id, None)
+
+    def clear(self):
+        """Drop every client."""
+        with self._lock:
+            self._clients.clear()
+
+    def close(self):
+        """Drop every client and close the shared connection pool."""
+        self.clear()
+        self.adapter.close()
+
+    def _build(self, tenant_id: Hashable, token: Dict[str, Any]) -> HootSweet:
+        kwargs = dict(self.client_kwargs)
+        if self.refresh_cb is not None:
+            kwargs["refresh_cb"] = _tenant_refresh_cb(self.refresh_cb, tenant_id)
+        if self.rate_limiter_factory is not None:
+            kwargs["rate_limiter"] = self.rate_limiter_factory(tenant_id)
+        if self.token_store_factory is not None:
+            kwargs["token_store"] = self.token_store_factory(tenant_id)
+        return HootSweet(
+            self.client_id,
+            self.client_secret,
+            token=token,
+            adapter=self.adapter,
+            **kwargs,
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of clients kept and evicted."""
+        return {"clients": len(self._clients), "evictions": self.evictions}
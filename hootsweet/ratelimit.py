@@ -0,0 +1,216 @@
+"""
+Rate Limiting
+=============
+
+This module provides a client side request scheduler, RateLimiter, combining a
+token bucket, the rate limit headers returned by Hootsuite and jittered
+exponential backoff for 429 and 5xx responses.
+
+A RateLimiter instance is one quota. Give each HootSweet client its own instance
+to limit per client, or share one instance between the clients acting for the
+same member to limit per member.
+
+"""
+
+import math
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+class RateLimitStats:
+    """Counters describing how requests went through a RateLimiter.
+
+    Attributes:
+        requests (int): Requests that were sent.
+        queued (int): Requests that had to wait for a token before being sent.
+        throttled (int): 429 responses received.
+        retried (int): Requests that were sent again after a 429 or 5xx.
+        wait_seconds (float): Total time spent waiting for tokens and backoff.
+
+    """
+
+    __slots__ = ("requests", "queued", "throttled", "retried", "wait_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.queued = 0
+        self.throttled = 0
+        self.retried = 0
+        self.wait_seconds = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "RateLimitStats(%s)" % ", ".join(
+            "%s=%s" % item for item in self.as_dict().items()
+        )
+
+
+class RateLimiter:
+    """A thread safe token bucket with backoff for retryable responses.
+
+    Args:
+        rate (float): Tokens added to the bucket per second. None disables the
+            bucket so only response headers and backoff are honoured.
+        burst (int): Maximum number of tokens held by the bucket. Defaults to
+            ``rate`` rounded up.
+        max_retries (int): Maximum number of times a 429 or 5xx response is
+            retried before its error is raised. Defaults to 5.
+        backoff_base (float): Backoff in seconds before the first retry, doubled
+            on every retry. Defaults to 0.5.
+        backoff_max (float): Upper bound of a single backoff. Defaults to 60.
+
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: int = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 60.0,
+    ):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, math.ceil(rate or 1))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = RateLimitStats()
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token from the bucket.
+
+        Returns the number of seconds the caller must wait before sending its
+        request. Tokens are reserved in call order so waiting callers are served
+        first in first out.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+
+            if self.rate is not None:
+                elapsed = now - self._updated
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+
+            self.stats.requests += 1
+            if wait > 0:
+                self.stats.queued += 1
+                self.stats.wait_seconds += wait
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for a number of seconds.
+
+        Args:
+            seconds (float): Seconds from now until requests may be sent again.
+
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update(self, headers: Mapping[str, str]):
+        """Honour the rate limit headers of a response.
+
+        When no requests remain in the current window the bucket is blocked
+        until the window resets.
+
+        Args:
+            headers (Mapping): The response headers.
+
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = _parse_seconds(headers.get("X-RateLimit-Reset"))
+        if remaining is not None and reset is not None:
+            try:
+                exhausted = int(remaining) <= 0
+            except ValueError:
+                exhausted = False
+            if exhausted:
+                self.block_for(reset)
+
+    def retry_delay(
+        self,
+        status_code: int,
+        headers: Mapping[str, str],
+        attempt: int,
+        idempotent: bool = True,
+    ) -> Optional[float]:
+        """The number of seconds to wait before retrying a response.
+
+        Returns None when the response should not be retried, either because
+        the status code is not retryable or ``max_retries`` has been reached.
+        A 429 is always safe to retry, a 5xx is only retried for idempotent
+        requests as the server may have acted on it.
+
+        Args:
+            status_code (int): The response status code.
+            headers (Mapping): The response headers.
+            attempt (int): The number of retries already made for this request.
+            idempotent (bool): Whether the request can safely be sent twice.
+
+        """
+        if status_code == 429:
+            with self._lock:
+                self.stats.throttled += 1
+        elif not idempotent:
+            return None
+
+        if status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+            return None
+
+        delay = _parse_seconds(headers.get("Retry-After"))
+        if delay is None:
+            # "Full jitter" so that throttled clients do not retry in lockstep
+            ceiling = min(self.backoff_max, self.backoff_base * 2**attempt)
+            delay = random.uniform(0, ceiling)
+        elif status_code == 429:
+            self.block_for(delay)
+
+        with self._lock:
+            self.stats.retried += 1
+            self.stats.wait_seconds += delay
+        return delay
+
+
+def _parse_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a header holding either delta seconds, an epoch timestamp or a
+    HTTP date into a number of seconds from now.
+
+    """
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+
+    # Values this large are epoch timestamps rather than a delta
+    if seconds > 10**9:
+        seconds -= time.time()
+    return max(0.0, seconds)
@@ -0,0 +1,122 @@
+"""
+Batch Review
+============
+
+This module provides the outcome report and helpers of
+:meth:`hootsweet.api.HootSweet.review_messages`, which approves and rejects many
+messages concurrently.
+
+Approving or rejecting a message needs its current sequence number. When a
+message changed since it was read the request fails with a sequence number
+conflict, the current number is then read from the message's review history and
+the decision retried.
+
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from hootsweet.constants import ReviewDecision
+from hootsweet.exceptions import BadRequest, Conflict
+
+# A (message_id, sequence_number, decision) tuple, optionally followed by a
+# rejection reason
+Review = Tuple
+
+
+class ReviewOutcome:
+    """The outcome of one decision of a batch review.
+
+    Attributes:
+        message_id (str): The Hootsuite message id.
+        decision (ReviewDecision): Whether the message was approved or rejected.
+        sequence_number (int): The sequence number last sent.
+        result: The response data when the decision succeeded.
+        error (Exception): Why the decision failed, None if it succeeded.
+        attempts (int): Number of requests made, more than one after sequence
+            number conflicts.
+
+    """
+
+    __slots__ = (
+        "message_id",
+        "decision",
+        "sequence_number",
+        "reason",
+        "result",
+        "error",
+        "attempts",
+    )
+
+    def __init__(
+        self,
+        message_id: str,
+        sequence_number: int,
+        decision: ReviewDecision,
+        reason: str = None,
+    ):
+        self.message_id = message_id
+        self.sequence_number = sequence_number
+        self.decision = decision
+        self.reason = reason
+        self.result = None
+        self.error = None
+        self.attempts = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.attempts > 0
+
+    def __repr__(self):
+        return "ReviewOutcome(%r, %s, ok=%s, attempts=%s, error=%r)" % (
+            self.message_id,
+            self.decision.name,
+            self.ok,
+            self.attempts,
+            self.error,
+        )
+
+
+def parse_review(review: Review, reason: str = None) -> ReviewOutcome:
+    """Build the outcome of a review tuple before it is sent.
+
+    Args:
+        review (tuple): ``(message_id, sequence_number, decision)`` or
+            ``(message_id, sequence_number, decision, reason)``, where decision
+            is a ReviewDecision or ``"approve"``/``"reject"``.
+        reason (str): The rejection reason used when the tuple has none.
+
+    """
+    message_id, sequence_number, decision = review[:3]
+    if len(review) > 3:
+        reason = review[3]
+    if isinstance(decision, str):
+        try:
+            decision = ReviewDecision[decision.upper()]
+        except KeyError:
+            raise ValueError(
+                "Unknown decision %r for message %s." % (decision, message_id)
+            ) from None
+    if decision is ReviewDecision.REJECT and not reason:
+        raise ValueError("Rejecting message %s needs a reason." % message_id)
+    return ReviewOutcome(message_id, sequence_number, decision, reason)
+
+
+def is_sequence_conflict(exc: Exception) -> bool:
+    """Whether a failed decision was made with a stale sequence number."""
+    if isinstance(exc, Conflict):
+        return True
+    return isinstance(exc, BadRequest) and "sequence" in str(exc).lower()
+
+
+def latest_sequence_number(
+    history: Union[Iterable[Dict[str, Any]], Dict[str, Any]]
+) -> Optional[int]:
+    """The highest sequence number in a message's review history."""
+    if isinstance(history, dict):
+        history = history.get("history") or [history]
+    numbers = [
+        entry["sequenceNumber"]
+        for entry in history or []
+        if entry.get("sequenceNumber") is not None
+    ]
+    return max(numbers) if numbers else None
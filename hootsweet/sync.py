@@ -0,0 +1,328 @@
+"""
+Incremental Message Sync
+========================
+
+This module keeps a local SQLite copy of outbound messages up to date without
+re-polling their whole history.
+
+Messages can only change state until they are sent, rejected or fail for good,
+and new messages cannot be scheduled in the past. So for each social profile a
+watermark is kept, the scheduled send time before which every stored message is
+settled. Each sync only queries from the watermark to a horizon in the future,
+and reports the messages that were inserted, updated or deleted.
+
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from hootsweet.constants import MessageState
+from hootsweet.models import Model, parse_timestamp
+
+INSERTED = "inserted"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# States a message never leaves
+SETTLED_STATES = frozenset(
+    [
+        MessageState.SENT.name,
+        MessageState.REJECTED.name,
+        MessageState.SEND_FAILED_PERMANENTLY.name,
+    ]
+)
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    social_profile_id TEXT,
+    state TEXT,
+    scheduled_send_time TEXT,
+    fingerprint TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_profile_time
+    ON messages (social_profile_id, scheduled_send_time);
+CREATE TABLE IF NOT EXISTS watermarks (
+    social_profile_id TEXT PRIMARY KEY,
+    synced_until TEXT NOT NULL
+);
+"""
+
+
+class MessageChange:
+    """A change to a stored message.
+
+    Attributes:
+        kind (str): ``inserted``, ``updated`` or ``deleted``.
+        message_id (str): The Hootsuite message id.
+        message (Dict): The message now, None when it was deleted.
+        previous (Dict): The stored message before the change, None when it
+            was inserted.
+
+    """
+
+    __slots__ = ("kind", "message_id", "message", "previous")
+
+    def __init__(
+        self, kind: str, message_id: str, message: Dict = None, previous: Dict = None
+    ):
+        self.kind = kind
+        self.message_id = message_id
+        self.message = message
+        self.previous = previous
+
+    def __repr__(self):
+        return "MessageChange(%s, %r)" % (self.kind, self.message_id)
+
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime(_TIME_FORMAT) if value is not None else None
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    # Stored times are naive UTC, like the datetimes HootSweet takes
+    parsed = parse_timestamp(value)
+    return parsed.replace(tzinfo=None) if parsed is not None else None
+
+
+def _fingerprint(message: Dict[str, Any]) -> str:
+    canonical = json.dumps(message, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class MessageStore:
+    """A SQLite store of outbound messages keyed by id, with a watermark per
+    social profile.
+
+    Args:
+        path (str or PathLike): The database file, ``:memory:`` for a
+            temporary store.
+
+    """
+
+    def __init__(self, path: Union[str, os.PathLike] = ":memory:"):
+        self._db = sqlite3.connect(os.fspath(path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """The stored message with an id, None if it is not stored."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM messages WHERE id = ?", (message_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def messages(self, social_profile_id: str = None) -> List[Dict[str, Any]]:
+        """Every stored message, or those of one social profile, ordered by
+        scheduled send time.
+
+        """
+        query = "SELECT data FROM messages"
+        args = ()
+        if social_profile_id is not None:
+            query += " WHERE social_profile_id = ?"
+            args = (str(social_profile_id),)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY scheduled_send_time", args)
+            return [json.loads(data) for data, in rows.fetchall()]
+
+    def watermark(self, social_profile_id: str) -> Optional[datetime]:
+        """The time before which every stored message of a profile is settled."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT synced_until FROM watermarks WHERE social_profile_id = ?",
+                (str(social_profile_id),),
+            ).fetchone()
+        return _parse_time(row[0]) if row else None
+
+    def set_watermark(self, social_profile_id: str, value: datetime):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?)",
+                (str(social_profile_id), _format_time(value)),
+            )
+
+    def earliest_unsettled(
+        self, social_profile_id: str, since: datetime
+    ) -> Optional[datetime]:
+        """The earliest scheduled send time after ``since`` of a profile's
+        messages that can still change state.
+
+        """
+        placeholders = ",".join("?" * len(SETTLED_STATES))
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(scheduled_send_time) FROM messages "
+                "WHERE social_profile_id = ? AND scheduled_send_time >= ? "
+                "AND state NOT IN (%s)" % placeholders,
+                (str(social_profile_id), _format_time(since)) + tuple(SETTLED_STATES),
+            ).fetchone()
+        return _parse_time(row[0])
+
+    def apply(
+        self,
+        social_profile_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        messages: Iterable[Dict[str, Any]],
+    ) -> List[MessageChange]:
+        """Replace the stored messages of a profile in a time window with the
+        messages retrieved for it.
+
+        The messages are read, e.g. every page downloaded, before the store is
+        locked for writing, so readers are not blocked meanwhile.
+
+        Args:
+            social_profile_id (str): The profile the messages were retrieved for.
+            start_time (datetime): The start of the window queried.
+            end_time (datetime): The end of the window queried.
+            messages (Iterable): Every message retrieved for the window.
+
+        Returns:
+            The changes made to the store.
+
+        """
+        profile_id = str(social_profile_id)
+        messages = [
+            message.to_dict() if isinstance(message, Model) else message
+            for message in messages
+        ]
+        changes = []
+        with self._lock, self._db:
+            window = self._db.execute(
+                "SELECT id, data FROM messages WHERE social_profile_id = ? "
+                "AND scheduled_send_time >= ? AND scheduled_send_time < ?",
+                (profile_id, _format_time(start_time), _format_time(end_time)),
+            )
+            missing = {message_id: data for message_id, data in window.fetchall()}
+
+            for message in messages:
+                message_id = str(message["id"])
+                missing.pop(message_id, None)
+                fingerprint = _fingerprint(message)
+                row = self._db.execute(
+                    "SELECT fingerprint, data FROM messages WHERE id = ?",
+                    (message_id,),
+                ).fetchone()
+                if row is not None and row[0] == fingerprint:
+                    continue
+
+                send_time = _parse_time(message.get("scheduledSendTime"))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        message_id,
+                        profile_id,
+                        message.get("state"),
+                        _format_time(send_time),
+                        fingerprint,
+                        json.dumps(message),
+                    ),
+                )
+                if row is None:
+                    changes.append(MessageChange(INSERTED, message_id, message))
+                else:
+                    previous = json.loads(row[1])
+                    changes.append(
+                        MessageChange(UPDATED, message_id, message, previous)
+                    )
+
+            for message_id, data in missing.items():
+                self._db.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                changes.append(
+                    MessageChange(DELETED, message_id, previous=json.loads(data))
+                )
+        return changes
+
+
+class MessageSync:
+    """Incrementally syncs the outbound messages of social profiles into a
+    MessageStore.
+
+    Each profile's watermark starts ``lookback`` before the first sync. After
+    every sync it advances to the earliest message that can still change state,
+    or to ``settle_after`` before now when there is none, so later syncs only
+    query from there to ``horizon`` after now.
+
+    Args:
+        client (HootSweet): The client to query messages with.
+        store (MessageStore): Where messages and watermarks are kept.
+        social_profile_ids (Iterable[str]): The profiles to sync.
+        lookback (timedelta): How far back the first sync goes. Defaults to 28
+            days.
+        horizon (timedelta): How far ahead of now to look for scheduled
+            messages. Defaults to 28 days.
+        settle_after (timedelta): How long after its scheduled send time a
+            message that has not settled is no longer polled, e.g. one left
+            pending approval. Defaults to 7 days.
+        limit (int): Number of messages requested per page. Defaults to 100.
+
+    """
+
+    def __init__(
+        self,
+        client,
+        store: MessageStore,
+        social_profile_ids: Iterable[str],
+        lookback: timedelta = timedelta(days=28),
+        horizon: timedelta = timedelta(days=28),
+        settle_after: timedelta = timedelta(days=7),
+        limit: int = 100,
+    ):
+        self.client = client
+        self.store = store
+        self.social_profile_ids = [str(i) for i in social_profile_ids]
+        self.lookback = lookback
+        self.horizon = horizon
+        self.settle_after = settle_after
+        self.limit = limit
+
+    def sync(self, now: datetime = None) -> List[MessageChange]:
+        """Query the windows that can have changed and update the store.
+
+        Args:
+            now (datetime): The current UTC time. Defaults to ``utcnow()``.
+
+        Returns:
+            The messages inserted, updated or deleted since the last sync.
+
+        """
+        now = now or datetime.utcnow()
+        changes = []
+        for profile_id in self.social_profile_ids:
+            changes.extend(self.sync_profile(profile_id, now))
+        return changes
+
+    def sync_profile(
+        self, social_profile_id: str, now: datetime
+    ) -> List[MessageChange]:
+        start = self.store.watermark(social_profile_id) or now - self.lookback
+        end = now + self.horizon
+        messages = self.client.iter_outbound_messages(
+            start, end, social_profile_ids=[social_profile_id], limit=self.limit
+        )
+        changes = self.store.apply(social_profile_id, start, end, messages)
+
+        # Nothing can be scheduled in the past, so the window before now only
+        # needs polling while messages in it may still change state.
+        cutoff = max(start, now - self.settle_after)
+        unsettled = self.store.earliest_unsettled(social_profile_id, cutoff)
+        watermark = min(now, unsettled) if unsettled is not None else now
+        self.store.set_watermark(social_profile_id, max(start, watermark))
+        return changes
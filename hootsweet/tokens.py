@@ -0,0 +1,212 @@
+"""
+Token Stores
+============
+
+This module provides stores that share an OAuth2 token between processes, e.g.
+gunicorn or celery workers each with their own HootSweet client.
+
+A client with a token store reads the token from it when it starts and refreshes
+under the store's lock. The first process to take the lock refreshes and saves
+the new token, the others wait and pick it up instead of refreshing again, which
+would invalidate the refresh token the first one used.
+
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, ContextManager, Dict, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover, Windows
+    fcntl = None
+    import msvcrt
+
+
+class TokenStore:
+    """Where a token shared between clients is kept.
+
+    Subclasses implement :meth:`load`, :meth:`save` and :meth:`lock`.
+
+    """
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """The stored token, None if there is none."""
+        raise NotImplementedError
+
+    def save(self, token: Dict[str, Any]):
+        """Replace the stored token."""
+        raise NotImplementedError
+
+    def lock(self) -> ContextManager:
+        """A lock held while a token is refreshed, exclusive between every
+        client sharing the store.
+
+        """
+        raise NotImplementedError
+
+
+class MemoryTokenStore(TokenStore):
+    """A token store shared by the clients of one process."""
+
+    def __init__(self, token: Dict[str, Any] = None):
+        self._token = dict(token) if token else None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        return dict(self._token) if self._token else None
+
+    def save(self, token: Dict[str, Any]):
+        self._token = dict(token)
+
+    def lock(self) -> ContextManager:
+        return self._lock
+
+
+class FileTokenStore(TokenStore):
+    """A token kept in a JSON file, locked with an advisory lock on a
+    ``.lock`` file next to it.
+
+    The file is replaced atomically so readers never see a partial token.
+
+    Args:
+        path (str or PathLike): The token file.
+
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = os.fspath(path)
+        self.lock_path = self.path + ".lock"
+        self._thread_lock = threading.Lock()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, token: Dict[str, Any]):
+        temp_path = "%s.%s.tmp" % (self.path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump(token, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    @contextmanager
+    def lock(self):
+        # Advisory locks are held per process, the thread lock keeps threads of
+        # the same process out too.
+        with self._thread_lock, open(self.lock_path, "a+") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:  # pragma: no cover
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:  # pragma: no cover
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SQLiteTokenStore(TokenStore):
+    """Tokens kept in a SQLite database, several under different keys.
+
+    The lock is an immediate write transaction on the database, tokens saved
+    while it is held are written in that transaction.
+
+    Args:
+        path (str or PathLike): The database file.
+        key (str): The name the token is stored under. Defaults to
+            ``default``.
+        timeout (float): Seconds to wait for the lock. Defaults to 60.
+
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        key: str = "default",
+        timeout: float = 60,
+    ):
+        self.path = os.fspath(path)
+        self.key = key
+        self.timeout = timeout
+        self._thread_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._lock_db = None
+        db = self._connect()
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS tokens "
+                    "(key TEXT PRIMARY KEY, token TEXT NOT NULL)"
+                )
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        row = self._execute("SELECT token FROM tokens WHERE key = ?", (self.key,))
+        return json.loads(row[0]) if row else None
+
+    def save(self, token: Dict[str, Any]):
+        self._execute(
+            "INSERT OR REPLACE INTO tokens VALUES (?, ?)",
+            (self.key, json.dumps(token)),
+        )
+
+    def _execute(self, query: str, args):
+        # While the lock is held every other connection is refused writes, so
+        # the lock's own transaction is used.
+        with self._db_lock:
+            if self._lock_db is not None:
+                return self._lock_db.execute(query, args).fetchone()
+
+        db = self._connect()
+        try:
+            with db:
+                return db.execute(query, args).fetchone()
+        finally:
+            db.close()
+
+    @contextmanager
+    def lock(self):
+        with self._thread_lock:
+            db = self._connect()
+            db.isolation_level = None
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                with self._db_lock:
+                    self._lock_db = db
+                try:
+                    yield
+                finally:
+                    with self._db_lock:
+                        self._lock_db = None
+                        db.execute("COMMIT")
+            finally:
+                db.close()
@@ -0,0 +1,11 @@
+from unittest.mock import Mock
+
+from requests import Response
+
+
+def make_response(status_code=200, body=None, headers=None, content=b""):
+    """A mock Response whose json() returns ``body``."""
+    response = Mock(spec=Response, status_code=status_code, content=content)
+    response.json.return_value = body
+    response.headers = headers or {}
+    return response
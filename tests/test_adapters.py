@@ -0,0 +1,42 @@
+import pickle
+import socket
+from unittest.mock import patch
+
+from hootsweet.adapters import PoolAdapter, keepalive_socket_options
+from hootsweet.api import HootSweet
+from requests_oauthlib import OAuth2Session
+
+
+def test_pool_adapter_sizing():
+    adapter = PoolAdapter(pool_connections=2, pool_maxsize=64, pool_block=True)
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 64
+    assert adapter.poolmanager.connection_pool_kw["block"] is True
+    assert "socket_options" not in adapter.poolmanager.connection_pool_kw
+
+
+def test_pool_adapter_tcp_keepalive():
+    adapter = PoolAdapter(tcp_keepalive=True)
+    options = adapter.poolmanager.connection_pool_kw["socket_options"]
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+    assert options == keepalive_socket_options()
+
+
+def test_pool_adapter_pickle():
+    adapter = pickle.loads(pickle.dumps(PoolAdapter(tcp_keepalive=True)))
+    assert "socket_options" in adapter.poolmanager.connection_pool_kw
+
+
+@patch("hootsweet.api.OAuth2Session", autospec=True)
+def test_client_mounts_pool_adapter(mock_session):
+    HootSweet("client_id", "client_secret", pool_maxsize=32)
+    mounted = dict(c[0] for c in mock_session.return_value.mount.call_args_list)
+    assert set(mounted) == {"https://", "http://"}
+    assert mounted["https://"]._pool_maxsize == 32
+
+
+def test_client_token_setter():
+    hoot_suite = HootSweet("client_id", "client_secret")
+    assert isinstance(hoot_suite.session, OAuth2Session)
+    hoot_suite.token = {"access_token": "abc", "expires_at": 100}
+    assert hoot_suite.session.token["access_token"] == "abc"
+    assert hoot_suite.expires_at == 100
@@ -0,0 +1,431 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+from unittest.mock import Mock
+
+import httpx
+import pytest
+from hootsweet.aio import AsyncHootSweet
+from hootsweet.api import HOOTSUITE_TOKEN_URL
+from hootsweet.cache import ResponseCache
+from hootsweet.constants import Reviewer
+from hootsweet.exceptions import BadRequest, NotFound
+from hootsweet.idempotency import IdempotencyIndex
+from hootsweet.models import SocialProfile
+from hootsweet.tokens import MemoryTokenStore
+
+# The event loop needs a socket pair for its self-pipe, no network is used as all
+# requests go through an httpx.MockTransport.
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def make_client(handler, **kwargs):
+    transport = httpx.MockTransport(handler)
+    client = httpx.AsyncClient(transport=transport)
+    return AsyncHootSweet(
+        "client_id", "client_secret", token=dict(test_token), client=client, **kwargs
+    )
+
+
+def test_get_endpoint():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"data": {"id": "1234"}})
+
+    hoot_suite = make_client(handler)
+    actual = run(hoot_suite.get_social_profile("1234"))
+
+    assert actual == {"id": "1234"}
+    assert len(requests) == 1
+    assert requests[0].method == "GET"
+    assert str(requests[0].url) == (
+        "https://platform.hootsuite.com/v1/socialProfiles/1234"
+    )
+    assert requests[0].headers["Authorization"] == "Bearer access_token"
+
+
+def test_get_endpoint_models():
+    def handler(request):
+        return httpx.Response(200, json={"data": {"id": "1234", "type": "TWITTER"}})
+
+    hoot_suite = make_client(handler, models=True)
+    profile = run(hoot_suite.get_social_profile("1234"))
+
+    assert isinstance(profile, SocialProfile)
+    assert profile.type == "TWITTER"
+
+
+def test_delete_endpoint():
+    def handler(request):
+        assert request.method == "DELETE"
+        return httpx.Response(200, json={"data": {}})
+
+    hoot_suite = make_client(handler)
+    assert run(hoot_suite.delete_message("1234")) == {}
+
+
+def test_approve_message_sends_raw_body():
+    def handler(request):
+        assert json.loads(request.content) == {
+            "sequenceNumber": 11,
+            "reviewerType": "EXTERNAL",
+        }
+        return httpx.Response(200, json={"data": {}})
+
+    hoot_suite = make_client(handler)
+    run(hoot_suite.approve_message("1234", 11, Reviewer.EXTERNAL))
+
+
+def test_error_raised():
+    def handler(request):
+        return httpx.Response(404, json={"errors": [{"code": 1, "message": "Nope"}]})
+
+    hoot_suite = make_client(handler)
+    with pytest.raises(NotFound) as exc:
+        run(hoot_suite.get_me())
+    assert str(exc.value) == "1 - Nope"
+
+
+def test_refresh_token_on_401():
+    refreshed = {"access_token": "new_token", "refresh_token": "r", "expires_in": 10}
+    statuses = iter([401, 200])
+
+    def handler(request):
+        if str(request.url) == HOOTSUITE_TOKEN_URL:
+            return httpx.Response(200, json=refreshed)
+        return httpx.Response(next(statuses), json={"data": {"id": "me"}})
+
+    refresh_cb = Mock(__name__="refresh_cb")
+    hoot_suite = make_client(handler, refresh_cb=refresh_cb)
+
+    assert run(hoot_suite.get_me()) == {"id": "me"}
+    refresh_cb.assert_called_once()
+    assert refresh_cb.call_args[0][0]["refresh_token"] == "r"
+    assert hoot_suite.token["access_token"] == "new_token"
+
+
+def test_concurrent_refreshes_share_one_request():
+    token_requests = []
+
+    async def handler(request):
+        token_requests.append(request)
+        await asyncio.sleep(0)
+        return httpx.Response(
+            200, json={"access_token": "new", "refresh_token": "r", "expires_in": 10}
+        )
+
+    hoot_suite = make_client(handler)
+
+    async def refresh_many():
+        return await asyncio.gather(*[hoot_suite.refresh_token() for _ in range(5)])
+
+    tokens = run(refresh_many())
+    assert len(token_requests) == 1
+    assert all(t["access_token"] == "new" for t in tokens)
+
+
+def test_clients_share_refreshed_token():
+    token_requests = []
+
+    async def handler(request):
+        token_requests.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(
+            200, json={"access_token": "new", "refresh_token": "r", "expires_in": 10}
+        )
+
+    store = MemoryTokenStore()
+    clients = [make_client(handler, token_store=store) for _ in range(3)]
+
+    async def refresh_all():
+        return await asyncio.gather(*[client.refresh_token() for client in clients])
+
+    tokens = run(refresh_all())
+    assert len(token_requests) == 1
+    assert all(t["access_token"] == "new" for t in tokens)
+    assert store.load()["access_token"] == "new"
+
+
+def test_schedule_messages():
+    def handler(request):
+        text = json.loads(request.content)["text"]
+        if text == "bad":
+            return httpx.Response(400, json={"errors": [{"code": 1, "message": "x"}]})
+        return httpx.Response(200, json={"data": [{"id": text}]})
+
+    hoot_suite = make_client(handler)
+    send_time = datetime.datetime(2020, 1, 1, 13, 10, 14)
+    batch = [
+        {"text": text, "social_profile_ids": ["1234"], "send_time": send_time}
+        for text in ["one", "bad", "three"]
+    ]
+
+    results = run(hoot_suite.schedule_messages(batch, max_concurrency=2))
+
+    assert results[0] == [{"id": "one"}]
+    assert isinstance(results[1], BadRequest)
+    assert results[2] == [{"id": "three"}]
+
+
+def test_idempotent_schedule_messages():
+    messages = {}
+    methods = []
+
+    def handler(request):
+        methods.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(200, json={"data": list(messages.values())})
+        data = json.loads(request.content)
+        message_id = str(len(messages) + 1)
+        messages[message_id] = {
+            "id": message_id,
+            "text": data["text"],
+            "socialProfile": {"id": data["socialProfileIds"][0]},
+        }
+        if data["text"] == "one":
+            raise httpx.ReadTimeout("lost", request=request)
+        return httpx.Response(200, json={"data": [{"id": message_id}]})
+
+    index = IdempotencyIndex(backoff_base=0)
+    hoot_suite = make_client(handler, idempotency=index)
+    send_time = datetime.datetime(2020, 1, 1, 13, 10, 14)
+    batch = [
+        {"text": text, "social_profile_ids": ["1234"], "send_time": send_time}
+        for text in ["one", "one", "two"]
+    ]
+
+    results = run(hoot_suite.schedule_messages(batch, max_concurrency=3))
+
+    assert results[0] == results[1]
+    assert [message["text"] for message in results[0]] == ["one"]
+    assert results[2] != results[0]
+    assert sorted(methods) == ["GET", "POST", "POST"]
+    assert index.stats["found"] == 1
+
+
+def test_review_messages():
+    sequence_numbers = {"1": 0, "2": 3}
+
+    def handler(request):
+        message_id, action = request.url.path.split("/")[-2:]
+        current = sequence_numbers[message_id]
+        if action == "history":
+            return httpx.Response(200, json={"data": [{"sequenceNumber": current}]})
+        assert request.headers["Content-Type"] == "application/json"
+        sent = json.loads(request.content)["sequenceNumber"]
+        if sent != current:
+            return httpx.Response(409, json={"errors": [{"code": 1, "message": "x"}]})
+        return httpx.Response(200, json={"data": [{"id": message_id}]})
+
+    hoot_suite = make_client(handler)
+
+    outcomes = run(
+        hoot_suite.review_messages(
+            [("1", 0, "approve"), ("2", 0, "reject", "Off brand")]
+        )
+    )
+
+    assert [outcome.ok for outcome in outcomes] == [True, True]
+    assert [outcome.attempts for outcome in outcomes] == [1, 2]
+    assert outcomes[1].result == [{"id": "2"}]
+
+
+def test_cached_reads():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"data": {"id": "1234"}})
+
+    hoot_suite = make_client(handler, cache=ResponseCache())
+
+    async def read_twice():
+        first = await hoot_suite.get_member("1234")
+        second = await hoot_suite.get_member("1234")
+        return first, second
+
+    assert run(read_twice()) == ({"id": "1234"}, {"id": "1234"})
+    assert len(requests) == 1
+
+
+def outbound_pages_handler(pages, requests=None):
+    # Serves pages of messages, following the cursor
+    def handler(request):
+        if requests is not None:
+            requests.append(request)
+        cursor = request.url.params.get("cursor")
+        return httpx.Response(200, json=pages[cursor])
+
+    return handler
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iter_outbound_messages(prefetch):
+    pages = {
+        None: {"data": [{"id": "1"}, {"id": "2"}], "cursor": {"next": "abc"}},
+        "abc": {"data": [{"id": "3"}], "cursor": {"next": "def"}},
+        "def": {"data": [{"id": "4"}]},
+    }
+    requests = []
+    hoot_suite = make_client(outbound_pages_handler(pages, requests))
+    start = datetime.datetime(2020, 1, 1, 12, 1, 1)
+
+    async def collect():
+        messages = hoot_suite.iter_outbound_messages(
+            start, start + datetime.timedelta(days=31), limit=2, prefetch=prefetch
+        )
+        return [message["id"] async for message in messages]
+
+    assert run(collect()) == ["1", "2", "3", "4"]
+    assert [r.url.params.get("cursor") for r in requests] == [None, "abc", "def"]
+    assert requests[0].url.params["limit"] == "2"
+
+
+def test_query_outbound_messages():
+    def handler(request):
+        start_time = request.url.params["startTime"]
+        message = {
+            "id": start_time,
+            "socialProfile": {"id": "1"},
+            "scheduledSendTime": "2020-01-01T00:00:00Z",
+        }
+        return httpx.Response(200, json={"data": [message, dict(message, id="same")]})
+
+    hoot_suite = make_client(handler)
+    start = datetime.datetime(2020, 1, 1)
+
+    results = run(
+        hoot_suite.query_outbound_messages(
+            start, start + datetime.timedelta(days=14), social_profile_ids=["1"]
+        )
+    )
+
+    assert [m["id"] for m in results] == [
+        "2020-01-01T00:00:00Z",
+        "2020-01-08T00:00:00Z",
+        "same",
+    ]
+
+
+def test_export_outbound_messages(tmp_path):
+    messages = [
+        {"id": str(i), "text": "Message %d" % i, "socialProfile": {"id": "1"}}
+        for i in range(3)
+    ]
+    pages = {
+        None: {"data": messages[:2], "cursor": {"next": "page-2"}},
+        "page-2": {"data": messages[2:]},
+    }
+    hoot_suite = make_client(outbound_pages_handler(pages))
+    path = tmp_path / "messages.csv"
+    start = datetime.datetime(2020, 1, 1)
+
+    exported = run(
+        hoot_suite.export_outbound_messages(
+            path, start, start + datetime.timedelta(days=1), batch_size=2
+        )
+    )
+
+    assert exported == 3
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["id"] for row in rows] == ["0", "1", "2"]
+    assert rows[2]["social_profile_id"] == "1"
+
+
+def test_coalesced_gets():
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"data": {"id": request.url.path[-4:]}})
+
+    hoot_suite = make_client(handler, coalesce=True)
+
+    async def read_concurrently():
+        return await asyncio.gather(
+            *[hoot_suite.get_member("1234") for _ in range(5)],
+            hoot_suite.get_member("5678"),
+        )
+
+    results = run(read_concurrently())
+
+    assert results == [{"id": "1234"}] * 5 + [{"id": "5678"}]
+    assert len(requests) == 2
+    assert hoot_suite.singleflight.stats == {"calls": 6, "shared": 4}
+
+
+def test_upload_media():
+    uploaded = []
+
+    async def handler(request):
+        if request.url.host == "s3":
+            uploaded.append((request.headers, await request.aread()))
+            return httpx.Response(200)
+        if request.method == "POST":
+            return httpx.Response(
+                200, json={"data": {"id": "m1", "uploadUrl": "https://s3/upload"}}
+            )
+        return httpx.Response(200, json={"data": {"id": "m1", "state": "READY"}})
+
+    hoot_suite = make_client(handler)
+    fileobj = io.BytesIO(b"png-bytes")
+    fileobj.name = "image.png"
+
+    status = run(hoot_suite.upload_media(fileobj))
+
+    assert status == {"id": "m1", "state": "READY"}
+    headers, body = uploaded[0]
+    assert body == b"png-bytes"
+    assert headers["Content-Length"] == "9"
+    assert "Authorization" not in headers
+
+
+def test_upload_media_batch():
+    async def handler(request):
+        if request.url.host == "s3":
+            return httpx.Response(200)
+        if request.method == "POST":
+            media_id = json.loads(request.content)["mimeType"].split("/")[1]
+            return httpx.Response(
+                200, json={"data": {"id": media_id, "uploadUrl": "https://s3/up"}}
+            )
+        media_id = request.url.path.rsplit("/", 1)[1]
+        return httpx.Response(200, json={"data": {"id": media_id, "state": "READY"}})
+
+    hoot_suite = make_client(handler)
+    sources = []
+    for name in ["a.png", "b.gif"]:
+        fileobj = io.BytesIO(b"bytes")
+        fileobj.name = name
+        sources.append(fileobj)
+
+    results = run(hoot_suite.upload_media_batch(sources, max_concurrency=2))
+
+    assert [r.media_id for r in results] == ["png", "gif"]
+    assert all(r.ok and r.size == 5 for r in results)
+
+    nameless = io.BytesIO(b"bytes")
+    (result,) = run(hoot_suite.upload_media_batch([(nameless, "image/jpeg")]))
+
+    assert result.ok and result.media_id == "jpeg"
+    assert result.source is nameless
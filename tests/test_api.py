@@ -1,5 +1,10 @@
 import datetime
 import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, call, patch
 
 import pytest
@@ -11,7 +16,12 @@ from hootsweet.api import (
     default_refresh_cb,
 )
 from hootsweet.constants import MessageState, Reviewer
-from hootsweet.exceptions import InvalidLanguage, InvalidTimezone, MIMETypeNotAllowed
+from hootsweet.exceptions import (
+    BadRequest,
+    InvalidLanguage,
+    InvalidTimezone,
+    MIMETypeNotAllowed,
+)
 from requests import Response
 from requests_oauthlib import OAuth2Session
 
@@ -102,6 +112,21 @@ def test_get_endpoint_urls(mock_session, func, args, kwargs, expected_url):
     assert actual == data["data"]
 
 
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_base_url(mock_session):
+    response = Mock(status_code=200, spec=Response)
+    response.json.return_value = {"data": {}}
+    mock_session.return_value.request.return_value = response
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, base_url="http://local:8080/"
+    )
+    hoot_suite.get_me()
+    mock_session.return_value.request.assert_called_once_with(
+        "GET", "http://local:8080/v1/me"
+    )
+    assert hoot_suite.token_url == "http://local:8080/oauth2/token"
+
+
 @patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
 def test_schedule_message(mock_session):
     response = Mock(status_code=200, spec=Response)
@@ -121,7 +146,10 @@ def test_schedule_message(mock_session):
     }
     expected_url = "https://platform.hootsuite.com/v1/messages"
     mock_session.return_value.request.assert_called_once_with(
-        "POST", expected_url, json=data
+        "POST",
+        expected_url,
+        data=hoot_suite.json_codec.dumps(data),
+        headers={"Content-Type": "application/json"},
     )
 
 
@@ -140,12 +168,15 @@ def test_approve_message(mock_session):
     hoot_suite.approve_message(
         message_id=message_id, sequence_number=sequence, reviewer_type=Reviewer.EXTERNAL
     )
-    expected_json = json.dumps(
+    expected_json = hoot_suite.json_codec.dumps(
         {"sequenceNumber": sequence, "reviewerType": reviewer_type.name}
     )
     expected_url = "https://platform.hootsuite.com/v1/messages/%s/approve" % message_id
     mock_session.return_value.request.assert_called_once_with(
-        "POST", expected_url, data=expected_json
+        "POST",
+        expected_url,
+        data=expected_json,
+        headers={"Content-Type": "application/json"},
     )
 
 
@@ -168,14 +199,19 @@ def test_reject_message(mock_session):
         sequence=sequence,
         reviewer_type=Reviewer.EXTERNAL,
     )
-    expected_data = {
-        "sequenceNumber": sequence,
-        "reviewerType": reviewer_type.name,
-        "reason": reason,
-    }
+    expected_json = hoot_suite.json_codec.dumps(
+        {
+            "reason": reason,
+            "sequenceNumber": sequence,
+            "reviewerType": reviewer_type.name,
+        }
+    )
     expected_url = "https://platform.hootsuite.com/v1/messages/%s/reject" % message_id
     mock_session.return_value.request.assert_called_once_with(
-        "POST", expected_url, data=expected_data
+        "POST",
+        expected_url,
+        data=expected_json,
+        headers={"Content-Type": "application/json"},
     )
 
 
@@ -321,5 +357,186 @@ def test_create_media_upload_url(mock_session):
     expected_data = {"sizeBytes": args[0], "mimeType": args[1]}
     hoot_suite.create_media_upload_url(*args)
     mock_session.return_value.request.assert_called_once_with(
-        "POST", expected_url, json=expected_data
+        "POST",
+        expected_url,
+        data=hoot_suite.json_codec.dumps(expected_data),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_iter_outbound_messages(mock_session, prefetch):
+    expected_url = "https://platform.hootsuite.com/v1/messages"
+    args = (
+        datetime.datetime(2020, 1, 1, 12, 1, 1),
+        datetime.datetime(2020, 2, 1, 12, 1, 1),
+    )
+    pages = [
+        {"data": [{"id": "1"}, {"id": "2"}], "cursor": {"next": "abc"}},
+        {"data": [{"id": "3"}], "cursor": {"next": "def"}},
+        {"data": [{"id": "4"}]},
+    ]
+    responses = [
+        Mock(spec=Response, status_code=200, **{"json.return_value": page})
+        for page in pages
+    ]
+    mock_session.return_value.request.side_effect = responses
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    messages = hoot_suite.iter_outbound_messages(*args, limit=2, prefetch=prefetch)
+    assert [m["id"] for m in messages] == ["1", "2", "3", "4"]
+
+    params = {
+        "startTime": args[0].strftime(ISO_FORMAT),
+        "endTime": args[1].strftime(ISO_FORMAT),
+        "limit": 2,
+    }
+    calls = [
+        call("GET", expected_url, params=params),
+        call("GET", expected_url, params=dict(params, cursor="abc")),
+        call("GET", expected_url, params=dict(params, cursor="def")),
+    ]
+    assert mock_session.return_value.request.mock_calls == calls
+
+
+@patch("hootsweet.api.OAuth2Session", autospec=True)
+def test_expires_at_from_expires_in(mock_session):
+    mock_session.return_value.token = {"expires_in": 100}
+    hoot_suite = HootSweet("client_id", "client_secret")
+    with patch("hootsweet.api.time.time", return_value=1000):
+        assert hoot_suite.expires_at == 1100
+    # expires_in is not decremented, so the first computed expiry is kept
+    with patch("hootsweet.api.time.time", return_value=1050):
+        assert hoot_suite.expires_at == 1100
+
+    mock_session.return_value.token = {"expires_at": 5000, "expires_in": 100}
+    assert hoot_suite.expires_at == 5000
+
+    mock_session.return_value.token = {"access_token": "token"}
+    assert hoot_suite.expires_at is None
+
+
+@patch("hootsweet.api.threading.Thread")
+@patch("hootsweet.api.OAuth2Session", autospec=True)
+def test_background_refresh_before_expiry(mock_session, mock_thread):
+    response = Mock(spec=Response, status_code=200)
+    response.json.return_value = {"data": {}}
+    mock_session.return_value.request.return_value = response
+    mock_session.return_value.token = {"expires_at": 1000, "expires_in": 3600}
+    hoot_suite = HootSweet("client_id", "client_secret")
+
+    with patch("hootsweet.api.time.time", return_value=100):
+        hoot_suite.get_me()
+    mock_thread.assert_not_called()
+
+    with patch("hootsweet.api.time.time", return_value=800):
+        hoot_suite.get_me()
+    mock_thread.assert_called_once_with(
+        target=hoot_suite._background_refresh,
+        args=(hoot_suite._refresh_flight, None),
+        daemon=True,
+    )
+    mock_session.return_value.refresh_token.assert_not_called()
+
+    # The refresh is in flight, later requests do not start another thread
+    with patch("hootsweet.api.time.time", return_value=800):
+        hoot_suite.get_me()
+    mock_thread.assert_called_once()
+
+
+@patch("hootsweet.api.OAuth2Session", autospec=True)
+def test_refresh_of_a_replaced_token_is_skipped(mock_session):
+    mock_session.return_value.token = {"access_token": "new"}
+    hoot_suite = HootSweet("client_id", "client_secret")
+
+    assert hoot_suite.refresh_token("old") == {"access_token": "new"}
+    mock_session.return_value.refresh_token.assert_not_called()
+
+
+@patch("hootsweet.api.OAuth2Session", autospec=True)
+def test_concurrent_refreshes_share_one_request(mock_session):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_refresh(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return {"access_token": "new"}
+
+    mock_session.return_value.refresh_token.side_effect = slow_refresh
+    hoot_suite = HootSweet("client_id", "client_secret")
+
+    arrived = threading.Semaphore(0)
+
+    def follow():
+        arrived.release()
+        return hoot_suite.refresh_token()
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(hoot_suite.refresh_token)
+        started.wait(5)
+        followers = [executor.submit(follow) for _ in range(4)]
+        for _ in followers:
+            arrived.acquire(timeout=5)
+        time.sleep(0.05)
+        release.set()
+        tokens = [f.result() for f in [leader] + followers]
+
+    assert tokens == [{"access_token": "new"}] * 5
+    mock_session.return_value.refresh_token.assert_called_once()
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_401_after_concurrent_refresh_does_not_refresh_again(mock_session):
+    responses = [Mock(spec=Response, status_code=c) for c in [401, 200]]
+    responses[1].json.return_value = {"data": {}}
+
+    def request(*args, **kwargs):
+        # another thread refreshes the token while this request is in flight
+        mock_session.return_value.token = {"access_token": "new", "expires_in": 10}
+        return responses.pop(0)
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    hoot_suite.get_me()
+
+    assert mock_session.return_value.request.call_count == 2
+    mock_session.return_value.refresh_token.assert_not_called()
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_schedule_messages(mock_session):
+    def request(method, url, data=None, **kwargs):
+        text = json.loads(data)["text"]
+        response = Mock(spec=Response)
+        response.status_code = 400 if text == "bad" else 200
+        response.json.return_value = {"data": [{"id": text}]}
+        response.content = b"bad request"
+        return response
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    send_time = datetime.datetime(2020, 1, 1, 13, 10, 14)
+    batch = [
+        {"text": text, "social_profile_ids": ["1234"], "send_time": send_time}
+        for text in ["one", "bad", "three"]
+    ]
+
+    results = hoot_suite.schedule_messages(batch, max_workers=2)
+
+    assert results[0] == [{"id": "one"}]
+    assert isinstance(results[1], BadRequest)
+    assert results[2] == [{"id": "three"}]
+
+
+def test_import_is_lazy():
+    code = (
+        "import sys, hootsweet, hootsweet.cache, hootsweet.export\n"
+        "assert 'requests_oauthlib' not in sys.modules\n"
+        "assert 'csv' not in sys.modules and 'inspect' not in sys.modules\n"
+        "assert hootsweet.HootSweet.__module__ == 'hootsweet.api'\n"
+        "assert 'requests_oauthlib' in sys.modules\n"
+        "for name in ('mmap', 'sqlite3', 'hootsweet.planner', 'hootsweet.media'):\n"
+        "    assert name not in sys.modules, name\n"
     )
+    subprocess.run([sys.executable, "-c", code], check=True)
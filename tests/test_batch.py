@@ -0,0 +1,37 @@
+import threading
+import time
+
+import pytest
+from hootsweet.batch import run_concurrently
+
+
+def test_run_concurrently_keeps_order_and_exceptions():
+    def func(item):
+        if item == 3:
+            raise ValueError(item)
+        time.sleep(0.01 * (5 - item))
+        return item * 2
+
+    results = run_concurrently(func, range(5), max_workers=5)
+
+    assert results[:3] == [0, 2, 4]
+    assert isinstance(results[3], ValueError)
+    assert results[4] == 8
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_run_concurrently_bounds_concurrency(max_workers):
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def func(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(item)
+
+    run_concurrently(func, range(10), max_workers=max_workers)
+    assert max(peak) <= max_workers
@@ -0,0 +1,207 @@
+import inspect
+from unittest.mock import Mock, call, patch
+
+from hootsweet.api import HootSweet
+from hootsweet.cache import MemoryCache, ResponseCache, RevalidationStore, _Arguments
+from requests import Response
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+@patch("hootsweet.cache.time.monotonic")
+def test_memory_cache_expiry(mock_monotonic):
+    mock_monotonic.return_value = 100
+    cache = MemoryCache()
+    cache.set("a", {"id": 1}, ttl=10)
+    assert cache.get("a") == {"id": 1}
+
+    mock_monotonic.return_value = 110
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_arguments_read_the_signature_once():
+    def method(self, message_id, fields=None):
+        pass
+
+    arguments = _Arguments(method)
+    with patch("inspect.signature", wraps=inspect.signature) as signature:
+        assert arguments(None, ("1", "a"), {}) == ("1", "a")
+        assert arguments(None, ("1",), {}) == ("1", None)
+        assert arguments(None, (), {"message_id": "1"}) == ("1", None)
+    assert signature.call_count == 1
+
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_memory_cache_delete_and_clear():
+    cache = MemoryCache()
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def make_client(mock_session, cache):
+    response = Mock(spec=Response, status_code=200)
+    response.json.return_value = {"data": {"id": "1234"}}
+    mock_session.return_value.request.return_value = response
+    return HootSweet("client_id", "client_secret", token=test_token, cache=cache)
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_caches_reads(mock_session):
+    cache = ResponseCache()
+    hoot_suite = make_client(mock_session, cache)
+
+    assert hoot_suite.get_social_profile("1234") == {"id": "1234"}
+    assert hoot_suite.get_social_profile(profile_id="1234") == {"id": "1234"}
+    hoot_suite.get_social_profile("5678")
+
+    assert mock_session.return_value.request.call_count == 2
+    assert cache.stats == {"hits": 1, "misses": 2}
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_only_caches_configured_endpoints(mock_session):
+    hoot_suite = make_client(mock_session, ResponseCache(ttls={"get_me": 60}))
+
+    hoot_suite.get_me()
+    hoot_suite.get_me()
+    hoot_suite.get_member("1234")
+    hoot_suite.get_member("1234")
+
+    assert mock_session.return_value.request.call_count == 3
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_delete_message_invalidates_get_message(mock_session):
+    hoot_suite = make_client(mock_session, ResponseCache())
+
+    hoot_suite.get_message("1234")
+    hoot_suite.get_message("1234")
+    assert mock_session.return_value.request.call_count == 1
+
+    hoot_suite.delete_message(message_id="1234")
+    hoot_suite.get_message("1234")
+    assert mock_session.return_value.request.call_count == 3
+
+
+def test_namespaced_keys():
+    backend = MemoryCache()
+    first = ResponseCache(backend, namespace="member-1:")
+    second = ResponseCache(backend, namespace="member-2:")
+    first.set("get_me", (), {"id": "1"})
+
+    assert first.get("get_me", ()) == {"id": "1"}
+    assert second.get("get_me", ()) is None
+
+
+def test_revalidation_store_key_sorts_params():
+    key = RevalidationStore.key("https://x/v1/messages", {"b": 2, "a": [1, 3]})
+    assert key == "https://x/v1/messages?a=1&a=3&b=2"
+    assert RevalidationStore.key("https://x/v1/me") == "https://x/v1/me"
+
+
+def test_revalidation_store_only_keeps_validated_responses():
+    store = RevalidationStore()
+    store.store("a", {}, {"data": 1})
+    store.store("b", {"ETag": '"v1"', "Last-Modified": "Wed"}, {"data": 2})
+
+    assert store.conditional_headers("a") == {}
+    assert store.conditional_headers("b") == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Wed",
+    }
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_conditional_get(mock_session):
+    body = {"data": {"id": "1234"}}
+    mock_session.return_value.request.side_effect = [
+        make_response(200, body, {"ETag": '"v1"'}),
+        make_response(304),
+    ]
+    store = RevalidationStore()
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, revalidation_store=store
+    )
+
+    assert hoot_suite.get_member("1234") == {"id": "1234"}
+    assert hoot_suite.get_member("1234") == {"id": "1234"}
+
+    url = "https://platform.hootsuite.com/v1/members/1234"
+    assert mock_session.return_value.request.mock_calls == [
+        call("GET", url),
+        call("GET", url, headers={"If-None-Match": '"v1"'}),
+    ]
+    assert store.revalidated == 1
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_conditional_get_of_an_expired_payload(mock_session):
+    store = RevalidationStore(MemoryCache(maxsize=1))
+
+    responses = iter(
+        [
+            make_response(200, {"data": {"id": "1"}}, {"ETag": '"v1"'}),
+            make_response(304),
+            make_response(200, {"data": {"id": "2"}}, {"ETag": '"v2"'}),
+        ]
+    )
+
+    def request(method, url, **kwargs):
+        response = next(responses)
+        if response.status_code == 304:
+            # The payload is evicted while the conditional request is in flight
+            store.backend.clear()
+        return response
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, revalidation_store=store
+    )
+
+    assert hoot_suite.get_member("1234") == {"id": "1"}
+    assert hoot_suite.get_member("1234") == {"id": "2"}
+
+    url = "https://platform.hootsuite.com/v1/members/1234"
+    assert mock_session.return_value.request.mock_calls == [
+        call("GET", url),
+        call("GET", url, headers={"If-None-Match": '"v1"'}),
+        call("GET", url),
+    ]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_conditional_get_ignores_writes(mock_session):
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": {}}, {"ETag": '"v1"'}
+    )
+    store = RevalidationStore()
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, revalidation_store=store
+    )
+
+    hoot_suite.create_media_upload_url(10, "image/png")
+    assert len(store.backend) == 0
@@ -0,0 +1,146 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.coalesce import SingleFlight, flight_key
+from hootsweet.exceptions import NotFound
+from requests import Response
+from requests_oauthlib import OAuth2Session
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def call_concurrently(func, count):
+    results = [None] * count
+
+    def call(index):
+        try:
+            results[index] = func()
+        except Exception as exc:
+            results[index] = exc
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_flight_key():
+    assert flight_key("https://a/b") == "https://a/b"
+    assert flight_key("https://a/b", {"y": 2, "x": 1}) == flight_key(
+        "https://a/b", {"x": 1, "y": 2}
+    )
+    assert flight_key("https://a/b", envelope=True) != flight_key("https://a/b")
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_single_flight(fails):
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait()
+        if fails:
+            raise ValueError("failed")
+        return {"id": "1"}
+
+    threads, results = call_concurrently(lambda: flight.do("key", func), 5)
+    wait_for(lambda: flight.stats == {"calls": 5, "shared": 4})
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    if fails:
+        assert all(isinstance(result, ValueError) for result in results)
+    else:
+        assert results == [{"id": "1"}] * 5
+
+    assert flight.do("key", lambda: "again") == "again"
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_coalesced_gets(mock_session):
+    release = threading.Event()
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        release.wait()
+        response = Mock(status_code=200, spec=Response)
+        response.json.return_value = {"data": {"id": url.rsplit("/", 1)[1]}}
+        return response
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, coalesce=True
+    )
+
+    threads, results = call_concurrently(lambda: hoot_suite.get_member("1234"), 4)
+    others, other_results = call_concurrently(lambda: hoot_suite.get_member("5"), 2)
+    wait_for(lambda: hoot_suite.singleflight.stats["calls"] == 6)
+    release.set()
+    for thread in threads + others:
+        thread.join()
+
+    assert results == [{"id": "1234"}] * 4
+    assert other_results == [{"id": "5"}] * 2
+    assert sorted(urls) == [
+        "https://platform.hootsuite.com/v1/members/1234",
+        "https://platform.hootsuite.com/v1/members/5",
+    ]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_coalesced_errors(mock_session):
+    release = threading.Event()
+
+    def request(method, url, **kwargs):
+        release.wait()
+        response = Mock(status_code=404, spec=Response)
+        response.json.return_value = {"errors": [{"code": 1, "message": "x"}]}
+        return response
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, coalesce=True
+    )
+
+    threads, results = call_concurrently(lambda: hoot_suite.get_message("1"), 3)
+    wait_for(lambda: hoot_suite.singleflight.stats["shared"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert mock_session.return_value.request.call_count == 1
+    assert all(isinstance(result, NotFound) for result in results)
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_writes_are_not_coalesced(mock_session):
+    response = Mock(status_code=200, spec=Response)
+    response.json.return_value = {"data": {}}
+    mock_session.return_value.request.return_value = response
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, coalesce=True
+    )
+
+    hoot_suite.delete_message("1")
+    hoot_suite.get_message("1")
+
+    assert hoot_suite.singleflight.stats == {"calls": 1, "shared": 0}
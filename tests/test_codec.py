@@ -0,0 +1,97 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.codec import (
+    MsgspecCodec,
+    OrjsonCodec,
+    StdlibCodec,
+    default_codec,
+    is_json,
+)
+from requests import Response
+from requests_oauthlib import OAuth2Session
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+DOCUMENT = {"data": [{"id": "1", "text": "Café ☃", "tags": []}]}
+
+
+def codecs():
+    yield StdlibCodec
+    for name, codec_class in [("orjson", OrjsonCodec), ("msgspec", MsgspecCodec)]:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        yield codec_class
+
+
+@pytest.mark.parametrize("codec_class", list(codecs()))
+def test_codec_round_trip(codec_class):
+    codec = codec_class()
+    encoded = codec.dumps(DOCUMENT)
+    assert isinstance(encoded, bytes)
+    assert b'": ' not in encoded
+    assert codec.loads(encoded) == DOCUMENT
+    assert StdlibCodec().loads(encoded) == DOCUMENT
+
+
+def test_default_codec_falls_back_to_stdlib():
+    with patch.dict("sys.modules", {"orjson": None, "msgspec": None}):
+        assert isinstance(default_codec(), StdlibCodec)
+
+
+@pytest.mark.parametrize(
+    "content_type,expected",
+    [
+        ("application/json", True),
+        ("application/json; charset=utf-8", True),
+        ("Application/JSON", True),
+        ("text/html", False),
+        (None, False),
+    ],
+)
+def test_is_json(content_type, expected):
+    response = Response()
+    if content_type is not None:
+        response.headers["Content-Type"] = content_type
+    assert is_json(response) is expected
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_decodes_with_codec(mock_session):
+    response = Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json"
+    response._content = StdlibCodec().dumps(DOCUMENT)
+    mock_session.return_value.request.return_value = response
+    codec = Mock(wraps=StdlibCodec())
+    hoot_suite = HootSweet("client_id", "client_secret", json_codec=codec)
+
+    assert hoot_suite.get_message("1") == DOCUMENT["data"]
+    codec.loads.assert_called_once_with(response.content)
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_encodes_body_once(mock_session):
+    responses = [Mock(status_code=401, spec=Response)]
+    responses.append(Mock(status_code=200, spec=Response))
+    responses[1].json.return_value = {"data": {}}
+    mock_session.return_value.request.side_effect = responses
+    mock_session.return_value.refresh_token.return_value = dict(test_token)
+    codec = Mock(wraps=StdlibCodec())
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, json_codec=codec
+    )
+
+    hoot_suite.create_media_upload_url(100, "image/png")
+
+    codec.dumps.assert_called_once_with({"sizeBytes": 100, "mimeType": "image/png"})
+    first, second = mock_session.return_value.request.call_args_list
+    assert first == second
+    assert first[1]["data"] == b'{"sizeBytes":100,"mimeType":"image/png"}'
@@ -0,0 +1,124 @@
+import time
+
+from hootsweet.cache import ResponseCache
+from hootsweet.directory import Directory
+
+
+def make_profile(profile_id, network, username, owner, owner_id):
+    return {
+        "id": profile_id,
+        "type": network,
+        "socialNetworkUsername": username,
+        "owner": owner,
+        "ownerId": owner_id,
+    }
+
+
+class FakeClient:
+    def __init__(self):
+        self.cache = ResponseCache()
+        self.profiles = [
+            make_profile(1, "TWITTER", "Acme", "MEMBER", 7),
+            make_profile(2, "FACEBOOK", "acme", "MEMBER", 8),
+            make_profile(4, "LINKEDIN", "acme", "ORGANIZATION", 200),
+        ]
+        self.teams = {
+            "1": [{"teamId": 10}],
+            "2": [{"teamId": 10}, {"teamId": 11}],
+            "4": [],
+        }
+        self.organizations = {"7": [{"id": 100}], "8": [{"id": 100}, {"id": 200}]}
+        self.calls = []
+
+    def get_social_profiles(self):
+        self.calls.append(("get_social_profiles",))
+        return list(self.profiles)
+
+    def get_me(self):
+        self.calls.append(("get_me",))
+        return {"id": 7, "fullName": "Me"}
+
+    def get_social_profile_teams(self, profile_id):
+        self.calls.append(("get_social_profile_teams", profile_id))
+        return self.teams[profile_id]
+
+    def get_member(self, member_id):
+        self.calls.append(("get_member", member_id))
+        if member_id == "9":
+            raise ValueError("Not found")
+        return {"id": int(member_id), "fullName": "Member %s" % member_id}
+
+    def get_member_organizations(self, member_id):
+        self.calls.append(("get_member_organizations", member_id))
+        return self.organizations.get(member_id, [])
+
+
+def test_load_indexes_the_graph():
+    client = FakeClient()
+    directory = Directory(client).load()
+
+    assert directory.profile(1)["type"] == "TWITTER"
+    assert directory.profile_by_username("twitter", "ACME")["id"] == 1
+    assert directory.profile_by_username("FACEBOOK", "acme")["id"] == 2
+    assert directory.profile_by_username("INSTAGRAM", "acme") is None
+    assert directory.teams(2) == {"10", "11"}
+    assert directory.team_profiles(10) == {"1", "2"}
+    assert directory.team_has_access(11, 2)
+    assert not directory.team_has_access(11, 1)
+    assert directory.member(7)["fullName"] == "Me"
+    assert directory.member(8)["fullName"] == "Member 8"
+    assert directory.organizations(8) == {"100", "200"}
+    assert directory.members(100) == {"7", "8"}
+    assert directory.is_member(8, 200)
+    assert directory.organization(200) == {"id": 200}
+    assert directory.organization_profiles(200) == {"4"}
+    assert directory.organization_profiles(100) == frozenset()
+    assert ("get_member", "7") not in client.calls
+    # Organization owners are not read as members
+    member_reads = [c[1] for c in client.calls if c[0].startswith("get_member")]
+    assert "200" not in member_reads
+    assert directory.member(200) is None
+    assert directory.members(200) == {"8"}
+
+
+def test_refresh_is_incremental():
+    client = FakeClient()
+    directory = Directory(client, refresh_batch=1).load()
+
+    client.profiles = client.profiles[1:] + [
+        make_profile(3, "TWITTER", "new", "MEMBER", 9)
+    ]
+    client.teams["3"] = [{"teamId": 12}]
+    client.calls = []
+    directory.refresh()
+
+    assert directory.profile(1) is None
+    assert directory.teams(1) == frozenset()
+    assert directory.team_profiles(12) == {"3"}
+    teams_read = [c[1] for c in client.calls if c[0] == "get_social_profile_teams"]
+    assert sorted(teams_read) == ["2", "3"]
+
+    # Member 9 failed to load, it is reported and retried on the next refresh
+    (error,) = directory.errors
+    assert error[:2] == ("member", "9")
+    assert directory.member(9) is None
+    assert directory.member(7) is not None
+
+    client.calls = []
+    directory.refresh()
+    assert ("get_member", "9") in client.calls
+
+
+def test_scheduled_refresh():
+    client = FakeClient()
+    directory = Directory(client)
+    directory.start(interval=0.01)
+    try:
+        assert directory.profile(1) is not None
+        client.profiles = client.profiles[:1]
+        deadline = time.monotonic() + 5
+        while directory.profile(2) is not None:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        directory.stop()
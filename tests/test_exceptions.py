@@ -3,6 +3,7 @@ from unittest.mock import Mock
 import pytest
 from hootsweet.exceptions import (
     BadRequest,
+    Conflict,
     Forbidden,
     NotFound,
     ServerError,
@@ -20,6 +21,7 @@ from requests import Response
         (401, Unauthorized),
         (403, Forbidden),
         (404, NotFound),
+        (409, Conflict),
         (429, TooManyRequests),
         (500, ServerError),
     ],
@@ -0,0 +1,132 @@
+import csv
+import datetime
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.export import (
+    COLUMN_NAMES,
+    export_messages,
+    iter_columns,
+    iter_record_batches,
+)
+from hootsweet.models import Message
+from requests import Response
+from requests_oauthlib import OAuth2Session
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+def make_message(index):
+    return {
+        "id": str(index),
+        "state": "SCHEDULED",
+        "text": "Message %d" % index,
+        "socialProfile": {"id": "profile-%d" % (index % 2)},
+        "scheduledSendTime": "2020-01-01T13:10:%02dZ" % index,
+        "sequenceNumber": index,
+        "tags": ["a", "b"],
+        "media": [{"id": "media-%d" % index}],
+    }
+
+
+MESSAGES = [make_message(i) for i in range(5)]
+
+
+def test_iter_columns_batches():
+    batches = list(iter_columns(iter(MESSAGES), batch_size=2))
+    assert [len(batch["id"]) for batch in batches] == [2, 2, 1]
+    assert set(batches[0]) == set(COLUMN_NAMES)
+    assert batches[0]["social_profile_id"] == ["profile-0", "profile-1"]
+    assert batches[0]["media_ids"] == [["media-0"], ["media-1"]]
+    assert batches[2]["created_by_member_id"] == [None]
+    assert batches[0]["scheduled_send_time"][0] == datetime.datetime(
+        2020, 1, 1, 13, 10, 0, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_iter_columns_accepts_models():
+    messages = [Message.from_dict(message) for message in MESSAGES]
+    (batch,) = iter_columns(messages)
+    assert batch["social_profile_id"][:2] == ["profile-0", "profile-1"]
+
+
+def test_export_csv(tmp_path):
+    path = tmp_path / "messages.csv"
+    assert export_messages(MESSAGES, path, batch_size=2) == 5
+
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 5
+    assert rows[1]["id"] == "1"
+    assert rows[1]["scheduled_send_time"] == "2020-01-01T13:10:01Z"
+    assert rows[1]["tags"] == '["a", "b"]'
+    assert rows[1]["post_url"] == ""
+
+
+def test_export_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        export_messages(MESSAGES, tmp_path / "messages.xlsx")
+
+
+def test_export_arrow_memory_map(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    path = tmp_path / "messages.arrow"
+    assert export_messages(MESSAGES, path, batch_size=2) == 5
+
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.num_rows == 5
+    assert table.column("sequence_number").to_pylist() == [0, 1, 2, 3, 4]
+    assert table.column("tags")[0].as_py() == ["a", "b"]
+
+
+def test_export_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "messages.parquet"
+    assert export_messages(MESSAGES, path) == 5
+
+    table = pq.read_table(str(path))
+    assert table.column_names == list(COLUMN_NAMES)
+    assert table.column("social_profile_id").to_pylist()[:2] == [
+        "profile-0",
+        "profile-1",
+    ]
+
+
+def test_iter_record_batches():
+    pytest.importorskip("pyarrow")
+    batches = list(iter_record_batches(MESSAGES, batch_size=3))
+    assert [batch.num_rows for batch in batches] == [3, 2]
+    assert str(batches[0].schema.field("scheduled_send_time").type) == (
+        "timestamp[s, tz=UTC]"
+    )
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_export_outbound_messages(mock_session, tmp_path):
+    pages = [
+        {"data": MESSAGES[:3], "cursor": {"next": "page-2"}},
+        {"data": MESSAGES[3:]},
+    ]
+
+    def request(method, url, params=None, **kwargs):
+        response = Mock(status_code=200, spec=Response)
+        response.json.return_value = pages[1 if params.get("cursor") else 0]
+        return response
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    start = datetime.datetime(2020, 1, 1)
+    end = datetime.datetime(2020, 1, 2)
+    path = tmp_path / "messages.csv"
+
+    assert hoot_suite.export_outbound_messages(str(path), start, end) == 5
+    with open(path, newline="") as f:
+        assert [row["id"] for row in csv.DictReader(f)] == ["0", "1", "2", "3", "4"]
@@ -0,0 +1,206 @@
+import datetime
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.exceptions import ServerError
+from hootsweet.idempotency import IdempotencyIndex, fingerprint, matching_messages
+from requests import Response
+from requests.exceptions import ConnectionError
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+SEND_TIME = datetime.datetime(2020, 1, 1, 13, 10, 14)
+
+
+class FakeMessages:
+    """Schedules, lists and deletes messages. ``failures`` are returned, or
+    raised, for the next schedule requests, ``lost`` ones after scheduling the
+    message."""
+
+    def __init__(self, failures=(), lost=()):
+        self.messages = {}
+        self.failures = list(failures)
+        self.lost = list(lost)
+        self.requests = []
+
+    def __call__(self, method, url, **kwargs):
+        self.requests.append(method)
+        if method == "GET":
+            return make_response(200, {"data": list(self.messages.values())})
+        if method == "DELETE":
+            del self.messages[url.rsplit("/", 1)[1]]
+            return make_response(200, {"data": {}})
+
+        if self.failures:
+            return self._fail(self.failures.pop(0))
+        data = json.loads(kwargs["data"])
+        scheduled = []
+        for profile_id in data["socialProfileIds"]:
+            message_id = str(len(self.messages) + 1)
+            self.messages[message_id] = {
+                "id": message_id,
+                "text": data["text"],
+                "socialProfile": {"id": profile_id},
+                "media": data.get("media", []),
+            }
+            scheduled.append({"id": message_id})
+        if self.lost:
+            return self._fail(self.lost.pop(0))
+        return make_response(200, {"data": scheduled})
+
+    def _fail(self, failure):
+        if isinstance(failure, Exception):
+            raise failure
+        return make_response(failure, {})
+
+
+def make_client(mock_session, messages, **kwargs):
+    mock_session.return_value.request.side_effect = messages
+    index = IdempotencyIndex(backoff_base=0, **kwargs)
+    return HootSweet("client_id", "client_secret", token=test_token, idempotency=index)
+
+
+def test_fingerprint():
+    key = fingerprint("Hello", ["1", "2"], SEND_TIME, [{"id": "m"}])
+    assert key == fingerprint("Hello", [2, 1], SEND_TIME, ["m"])
+    assert key != fingerprint("Hello", ["1", "2"], SEND_TIME)
+    assert key != fingerprint("Hello", ["1"], SEND_TIME, ["m"])
+    assert key != fingerprint("Hello!", ["1", "2"], SEND_TIME, ["m"])
+    later = SEND_TIME + datetime.timedelta(minutes=1)
+    assert key != fingerprint("Hello", ["1", "2"], later, ["m"])
+
+
+def test_matching_messages():
+    messages = [
+        {"id": 1, "text": "Hello", "socialProfile": {"id": 1}},
+        {"id": 2, "text": "Hello", "socialProfile": {"id": 3}},
+        {"id": 3, "text": "Bye", "socialProfile": {"id": 1}},
+        {"id": 4, "text": "Hello", "socialProfile": {"id": 1}, "media": [{"id": 5}]},
+    ]
+    assert matching_messages(messages, "Hello", ["1", "2"]) == messages[:1]
+    assert matching_messages(messages, "Hello", ["1"], ["5"]) == messages[3:]
+
+
+def test_index_forgets_deleted_messages():
+    index = IdempotencyIndex()
+    index.add("key", [{"id": "1"}, {"id": "2"}])
+    assert index.get("key") == [{"id": "1"}, {"id": "2"}]
+
+    index.forget_message("2")
+    assert index.get("key") is None
+    assert index.stats == {"hits": 1, "scheduled": 1, "found": 0, "retries": 0}
+
+
+def test_index_uncertain_fingerprints():
+    index = IdempotencyIndex()
+    index.mark_uncertain("key")
+    assert index.is_uncertain("key")
+    assert not index.is_uncertain("other")
+
+    index.add("key", [{"id": "1"}], found=True)
+    assert not index.is_uncertain("key")
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_identical_message_is_not_scheduled_twice(mock_session):
+    messages = FakeMessages()
+    hoot_suite = make_client(mock_session, messages)
+
+    first = hoot_suite.schedule_message("Hello", ["1", "2"], SEND_TIME)
+    again = hoot_suite.schedule_message("Hello", ["2", "1"], SEND_TIME)
+
+    assert again == first == [{"id": "1"}, {"id": "2"}]
+    assert messages.requests == ["POST"]
+    assert len(messages.messages) == 2
+
+    hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+    assert messages.requests == ["POST", "POST"]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_lost_response_is_found_instead_of_resent(mock_session):
+    messages = FakeMessages(lost=[ConnectionError()])
+    hoot_suite = make_client(mock_session, messages)
+
+    scheduled = hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+
+    assert [message["id"] for message in scheduled] == ["1"]
+    assert messages.requests == ["POST", "GET"]
+    assert len(messages.messages) == 1
+    assert hoot_suite.idempotency.stats["found"] == 1
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_message_lost_by_an_earlier_call_is_found(mock_session):
+    messages = FakeMessages(lost=[ConnectionError()])
+    hoot_suite = make_client(mock_session, messages, max_attempts=1)
+    media = [{"id": "m"}]
+
+    with pytest.raises(ConnectionError):
+        hoot_suite.schedule_message("Hello", ["1"], SEND_TIME, media=media)
+    scheduled = hoot_suite.schedule_message("Hello", ["1"], SEND_TIME, media=media)
+
+    assert [message["id"] for message in scheduled] == ["1"]
+    assert messages.requests == ["POST", "GET"]
+    assert len(messages.messages) == 1
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_failed_request_is_resent(mock_session):
+    messages = FakeMessages(failures=[503])
+    hoot_suite = make_client(mock_session, messages)
+
+    scheduled = hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+
+    assert scheduled == [{"id": "1"}]
+    assert messages.requests == ["POST", "GET", "POST"]
+    assert hoot_suite.idempotency.stats["retries"] == 1
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_retries_stop_after_max_attempts(mock_session):
+    messages = FakeMessages(failures=[500, 502, 503])
+    hoot_suite = make_client(mock_session, messages, max_attempts=2)
+
+    with pytest.raises(ServerError):
+        hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+    assert messages.requests == ["POST", "GET", "POST"]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_deleted_message_can_be_scheduled_again(mock_session):
+    messages = FakeMessages()
+    hoot_suite = make_client(mock_session, messages)
+
+    (scheduled,) = hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+    hoot_suite.delete_message(scheduled["id"])
+    hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+
+    assert messages.requests == ["POST", "DELETE", "POST"]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_find_scheduled_messages(mock_session):
+    messages = FakeMessages()
+    mock_session.return_value.request.side_effect = messages
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    hoot_suite.schedule_message("Hello", ["1"], SEND_TIME)
+    hoot_suite.schedule_message("Bye", ["1"], SEND_TIME)
+
+    window = datetime.timedelta(hours=1)
+    found = hoot_suite.find_scheduled_messages("Hello", ["1"], SEND_TIME, window=window)
+
+    assert [message["id"] for message in found] == ["1"]
+    params = mock_session.return_value.request.call_args[1]["params"]
+    assert (params["startTime"], params["endTime"]) == (
+        "2020-01-01T12:10:14Z",
+        "2020-01-01T14:10:14Z",
+    )
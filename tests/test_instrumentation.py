@@ -0,0 +1,112 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.exceptions import NotFound
+from hootsweet.instrumentation import (
+    HistogramCollector,
+    RequestEvent,
+    RequestHook,
+    endpoint_template,
+)
+from requests import PreparedRequest, Response
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+@pytest.mark.parametrize(
+    "resource,expected",
+    [
+        ("me", "me"),
+        ("me/organizations", "me/organizations"),
+        ("socialProfiles/1234/teams", "socialProfiles/{id}/teams"),
+        ("messages/abc/approve", "messages/{id}/approve"),
+        ("media/xyz", "media/{id}"),
+    ],
+)
+def test_endpoint_template(resource, expected):
+    assert endpoint_template(resource) == expected
+
+
+def make_event(duration, status=200, method="GET", endpoint="me"):
+    event = RequestEvent(method, endpoint, "https://x/%s" % endpoint)
+    event.duration, event.status = duration, status
+    event.bytes_in, event.bytes_out, event.retries = 100, 10, 1
+    return event
+
+
+def test_histogram_collector():
+    collector = HistogramCollector(buckets=(0.1, 0.5, 1))
+    for duration in [0.05, 0.05, 0.3, 2]:
+        collector.after_request(make_event(duration))
+    collector.after_request(make_event(0.2, status=None))
+
+    assert collector.quantile("GET", "me", 0.5) == 0.5
+    assert collector.quantile("GET", "me", 0.99) == float("inf")
+    assert collector.quantile("GET", "other", 0.5) is None
+    assert collector.statuses == {("GET", "me", "200"): 4, ("GET", "me", "error"): 1}
+    assert collector.bytes_in[("GET", "me")] == 500
+    assert collector.retries[("GET", "me")] == 5
+
+
+def test_histogram_collector_to_prometheus():
+    collector = HistogramCollector(buckets=(0.1, 1))
+    collector.after_request(make_event(0.05, endpoint="messages/{id}"))
+    text = collector.to_prometheus()
+
+    assert "# TYPE hootsweet_request_duration_seconds histogram" in text
+    labels = 'method="GET",endpoint="messages/{id}"'
+    assert 'hootsweet_request_duration_seconds_bucket{%s,le="0.1"} 1' % labels in text
+    assert 'hootsweet_request_duration_seconds_bucket{%s,le="+Inf"} 1' % labels in text
+    assert 'hootsweet_requests_total{%s,status="200"} 1' % labels in text
+    assert "hootsweet_response_bytes_total{%s} 100" % labels in text
+
+
+def make_sent_response(status_code):
+    body = {"data": {}, "errors": [{"code": 1, "message": ""}]}
+    response = make_response(status_code, body, content=b'{"data": {}}')
+    response.request = Mock(spec=PreparedRequest, body='{"a": 1}')
+    return response
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_calls_hooks(mock_session):
+    mock_session.return_value.request.side_effect = [
+        make_sent_response(401),
+        make_sent_response(200),
+        make_sent_response(404),
+    ]
+    mock_session.return_value.refresh_token.return_value = dict(test_token)
+    hook = Mock(spec=RequestHook)
+    failing_hook = Mock(spec=RequestHook)
+    failing_hook.after_request.side_effect = RuntimeError
+    hoot_suite = HootSweet(
+        "client_id",
+        "client_secret",
+        token=test_token,
+        instrumentation=[failing_hook, hook],
+    )
+
+    hoot_suite.get_social_profile("1234")
+    with pytest.raises(NotFound):
+        hoot_suite.get_message("abc")
+
+    assert hook.before_request.call_count == 2
+    first, second = [c[0][0] for c in hook.after_request.call_args_list]
+    assert (first.method, first.endpoint, first.status) == (
+        "GET",
+        "socialProfiles/{id}",
+        200,
+    )
+    assert first.retries == 1
+    assert first.bytes_in == len(b'{"data": {}}')
+    assert first.bytes_out == len('{"a": 1}')
+    assert first.duration >= 0
+    assert second.status == 404
+    assert isinstance(second.error, NotFound)
@@ -1,5 +1,14 @@
+import subprocess
+import sys
+
 import pytest
-from hootsweet.locale import ACCEPTED_LANGUAGES, is_valid_language, is_valid_timezone
+from hootsweet.locale import (
+    ACCEPTED_LANGUAGES,
+    is_valid_language,
+    is_valid_timezone,
+    timezones,
+    use_timezone_backend,
+)
 
 
 @pytest.mark.parametrize(
@@ -17,3 +26,35 @@ def test_is_valid_language_valid(test_input):
 @pytest.mark.parametrize("test_input", ["ba", "aa", "rr"])
 def test_is_valid_language_not_valid(test_input):
     assert not is_valid_language(test_input)
+
+
+@pytest.fixture
+def timezone_backend():
+    yield use_timezone_backend
+    use_timezone_backend(None)
+
+
+@pytest.mark.parametrize("backend", ["pytz", "zoneinfo"])
+def test_timezone_backends(timezone_backend, backend):
+    timezone_backend(backend)
+    assert is_valid_timezone("Europe/London")
+    assert is_valid_timezone("America/New_York")
+    assert not is_valid_timezone("Europa/Mars")
+    assert isinstance(timezones(), frozenset)
+
+
+def test_unknown_timezone_backend():
+    with pytest.raises(ValueError):
+        use_timezone_backend("dateutil")
+
+
+def test_zoneinfo_backend_does_not_import_pytz(timezone_backend):
+    code = (
+        "import sys\n"
+        "from hootsweet.locale import is_valid_timezone, use_timezone_backend\n"
+        "use_timezone_backend('zoneinfo')\n"
+        "assert is_valid_timezone('Europe/London')\n"
+        "assert 'pytz' not in sys.modules\n"
+        "assert 'requests_oauthlib' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
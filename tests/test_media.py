@@ -0,0 +1,238 @@
+import io
+import itertools
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.exceptions import (
+    MediaUploadFailed,
+    MediaUploadTimeout,
+    MIMETypeNotAllowed,
+)
+from hootsweet.media import (
+    MediaUploadResult,
+    guess_mime_type,
+    iter_chunks,
+    open_media,
+    poll_delays,
+    resolve_mime_type,
+    split_media_item,
+)
+from requests import Response
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [("video.mp4", "video/mp4"), ("image.png", "image/png"), ("a.gif", "image/gif")],
+)
+def test_guess_mime_type(name, expected):
+    assert guess_mime_type(name) == expected
+
+    fileobj = io.BytesIO()
+    fileobj.name = "/tmp/%s" % name
+    assert guess_mime_type(fileobj) == expected
+
+
+def test_guess_mime_type_without_name():
+    assert guess_mime_type(io.BytesIO(b"png")) is None
+
+
+def test_resolve_mime_type():
+    fileobj = io.BytesIO(b"png")
+    assert resolve_mime_type(fileobj, "image/png") == "image/png"
+    assert resolve_mime_type("image.png") == "image/png"
+
+    with pytest.raises(MIMETypeNotAllowed, match="pass mime_type"):
+        resolve_mime_type(fileobj)
+
+
+def test_split_media_item():
+    fileobj = io.BytesIO(b"png")
+    assert split_media_item(fileobj) == (fileobj, None)
+    assert split_media_item((fileobj, "image/png")) == (fileobj, "image/png")
+
+
+def test_open_media_path(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"x" * 10)
+    with open_media(path) as (body, size):
+        assert size == 10
+        assert body[:] == b"x" * 10
+
+    empty = tmp_path / "empty.png"
+    empty.write_bytes(b"")
+    with open_media(str(empty)) as (body, size):
+        assert size == 0
+
+
+def test_open_media_fileobj_from_position():
+    fileobj = io.BytesIO(b"0123456789")
+    fileobj.seek(4)
+    with open_media(fileobj) as (body, size):
+        assert size == 6
+        assert body.read() == b"456789"
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(b"abcdefg", chunk_size=3)) == [b"abc", b"def", b"g"]
+    assert list(iter_chunks(io.BytesIO(b"abcd"), chunk_size=3)) == [b"abc", b"d"]
+
+
+def test_poll_delays():
+    delays = list(itertools.islice(poll_delays(1, maximum=3, factor=2), 4))
+    assert delays == [1, 2, 3, 3]
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_upload_media(mock_session, mock_sleep, tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"v" * 100)
+    upload = {"id": "media-1", "uploadUrl": "https://s3/upload"}
+    mock_session.return_value.request.side_effect = [
+        make_response(200, {"data": upload}),
+        make_response(200, {"data": {"id": "media-1", "state": "PENDING"}}),
+        make_response(200, {"data": {"id": "media-1", "state": "READY"}}),
+    ]
+    mock_session.return_value.put.return_value = Mock(status_code=200)
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    status = hoot_suite.upload_media(path)
+
+    assert status == {"id": "media-1", "state": "READY"}
+    create_call = mock_session.return_value.request.mock_calls[0]
+    assert json.loads(create_call[2]["data"]) == {
+        "sizeBytes": 100,
+        "mimeType": "video/mp4",
+    }
+
+    args, kwargs = mock_session.return_value.put.call_args
+    assert args == ("https://s3/upload",)
+    assert kwargs["headers"] == {"Content-Type": "video/mp4", "Content-Length": "100"}
+    assert kwargs["withhold_token"] is True
+    mock_sleep.assert_called_once_with(1.0)
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_wait_for_media_failed(mock_session, mock_sleep):
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": {"id": "media-1", "state": "FAILED"}}
+    )
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    with pytest.raises(MediaUploadFailed):
+        hoot_suite.wait_for_media("media-1")
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_wait_for_media_timeout(mock_session, mock_sleep):
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": {"id": "media-1", "state": "PENDING"}}
+    )
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    with pytest.raises(MediaUploadTimeout):
+        hoot_suite.wait_for_media("media-1", timeout=5, poll_interval=1)
+    assert mock_sleep.call_count < 6
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_upload_media_batch(mock_session, mock_sleep, tmp_path):
+    paths = []
+    for name in ["a.png", "b.mp4", "c.gif"]:
+        path = tmp_path / name
+        path.write_bytes(b"x" * 10)
+        paths.append(path)
+    polls = {"media-a": ["PENDING", "READY"], "media-b": ["FAILED"]}
+
+    def request(method, url, data=None, **kwargs):
+        if method == "POST":
+            mime_type = json.loads(data)["mimeType"]
+            if mime_type == "image/gif":
+                return make_response(400, {"data": {}})
+            media_id = "media-%s" % ("a" if mime_type == "image/png" else "b")
+            return make_response(
+                200, {"data": {"id": media_id, "uploadUrl": "https://s3/up"}}
+            )
+        media_id = url.rsplit("/", 1)[1]
+        return make_response(
+            200, {"data": {"id": media_id, "state": polls[media_id].pop(0)}}
+        )
+
+    mock_session.return_value.request.side_effect = request
+    mock_session.return_value.put.return_value = Mock(status_code=200)
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    progress = []
+
+    results = hoot_suite.upload_media_batch(paths, progress_cb=progress.append)
+
+    assert [r.media_id for r in results] == ["media-a", "media-b", None]
+    assert results[0].ok and results[0].status["state"] == "READY"
+    assert results[0].size == 10
+    assert isinstance(results[1].error, MediaUploadFailed)
+    assert results[2].error is not None
+    assert sorted(id(r) for r in progress) == sorted(id(r) for r in results)
+    mock_sleep.assert_called_once_with(1.0)
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_upload_media_batch_timeout(mock_session, mock_sleep):
+    def request(method, url, **kwargs):
+        if method == "POST":
+            return make_response(
+                200, {"data": {"id": "m", "uploadUrl": "https://s3/up"}}
+            )
+        return make_response(200, {"data": {"id": "m", "state": "PENDING"}})
+
+    mock_session.return_value.request.side_effect = request
+    mock_session.return_value.put.return_value = Mock(status_code=200)
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    fileobj = io.BytesIO(b"png")
+    fileobj.name = "image.png"
+
+    (result,) = hoot_suite.upload_media_batch([fileobj], timeout=0)
+
+    assert isinstance(result.error, MediaUploadTimeout)
+    assert not result.ok
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_upload_media_batch_mime_types(mock_session):
+    def request(method, url, data=None, **kwargs):
+        if method == "POST":
+            media_id = json.loads(data)["mimeType"].split("/")[1]
+            return make_response(
+                200, {"data": {"id": media_id, "uploadUrl": "https://s3/up"}}
+            )
+        return make_response(200, {"data": {"id": "png", "state": "READY"}})
+
+    mock_session.return_value.request.side_effect = request
+    mock_session.return_value.put.return_value = Mock(status_code=200)
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    fileobj = io.BytesIO(b"png")
+    nameless = io.BytesIO(b"gif")
+
+    results = hoot_suite.upload_media_batch([(fileobj, "image/png"), nameless])
+
+    assert results[0].ok and results[0].source is fileobj
+    assert results[0].media_id == "png"
+    assert isinstance(results[1].error, MIMETypeNotAllowed)
+    assert results[1].media_id is None
+
+
+def test_media_upload_result_metrics():
+    result = MediaUploadResult("a.png")
+    assert result.bytes_per_second == 0
+    result.size, result.upload_seconds = 1000, 0.5
+    assert result.bytes_per_second == 2000
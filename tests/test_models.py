@@ -0,0 +1,138 @@
+import datetime
+import pickle
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.models import (
+    MediaUpload,
+    Member,
+    Message,
+    SocialProfile,
+    parse_timestamp,
+)
+from requests import Response
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+MESSAGE = {
+    "id": "1234",
+    "state": "SCHEDULED",
+    "text": "An example message.",
+    "socialProfile": {"id": "5678"},
+    "tags": ["one"],
+    "sequenceNumber": 2,
+    "scheduledSendTime": "2020-01-01T13:10:14Z",
+    "createdByMember": {"id": "42"},
+}
+
+
+def test_message_fields():
+    message = Message.from_dict(MESSAGE)
+    assert message.id == "1234"
+    assert message.text == "An example message."
+    assert message.sequence_number == 2
+    assert message.post_url is None
+    assert message.scheduled_send_time == datetime.datetime(
+        2020, 1, 1, 13, 10, 14, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_message_nested_fields_are_decoded_lazily():
+    message = Message.from_dict(MESSAGE)
+    assert message._social_profile == {"id": "5678"}
+    assert message.social_profile == SocialProfile.from_dict({"id": "5678"})
+    assert isinstance(message._social_profile, SocialProfile)
+    assert message.social_profile is message.social_profile
+    assert message.created_by_member.id == "42"
+    assert message.last_updated_by_member is None
+
+
+def test_model_reads_like_a_dict():
+    message = Message.from_dict(dict(MESSAGE, unknown="kept"))
+    message.social_profile
+    assert message["id"] == "1234"
+    assert message["socialProfile"] == {"id": "5678"}
+    assert message["unknown"] == "kept"
+    assert message.get("postUrl") is None
+    assert message.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        message["missing"]
+
+
+def test_model_to_dict_round_trip():
+    data = dict(MESSAGE, unknown="kept")
+    message = Message.from_dict(data)
+    message.social_profile
+    assert message.to_dict() == data
+    assert Message.from_dict(message.to_dict()) == message
+
+
+def test_model_pickle():
+    message = Message.from_dict(MESSAGE)
+    message.social_profile
+    assert pickle.loads(pickle.dumps(message)) == message
+
+
+def test_model_is_smaller_than_dict():
+    data = {"id": "1", "state": "READY", "uploadUrl": "https://s3"}
+    media = MediaUpload.from_dict(data)
+    assert not hasattr(media, "__dict__")
+    assert sys.getsizeof(media) < sys.getsizeof(data)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("2020-01-01T13:10:14Z", datetime.datetime(2020, 1, 1, 13, 10, 14)),
+        (
+            "2020-01-01T13:10:14.250Z",
+            datetime.datetime(2020, 1, 1, 13, 10, 14, 250000),
+        ),
+    ],
+)
+def test_parse_timestamp(value, expected):
+    assert parse_timestamp(value) == expected.replace(tzinfo=datetime.timezone.utc)
+    assert parse_timestamp(None) is None
+    with pytest.raises(ValueError):
+        parse_timestamp("yesterday")
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_returns_dicts_by_default(mock_session):
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": [MESSAGE]}
+    )
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+    assert hoot_suite.get_message("1234") == [MESSAGE]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_returns_models(mock_session):
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token, models=True)
+
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": [MESSAGE]}
+    )
+    (message,) = hoot_suite.get_message("1234")
+    assert isinstance(message, Message)
+    assert message.id == "1234"
+
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": {"id": "42"}}
+    )
+    assert hoot_suite.get_member("42") == Member.from_dict({"id": "42"})
+
+    start = datetime.datetime(2020, 1, 1)
+    mock_session.return_value.request.return_value = make_response(
+        200, {"data": [MESSAGE]}
+    )
+    messages = list(hoot_suite.iter_outbound_messages(start, start, prefetch=False))
+    assert messages == [Message.from_dict(MESSAGE)]
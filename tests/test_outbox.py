@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+from hootsweet.exceptions import BadRequest, NotFound, ServerError, TooManyRequests
+from hootsweet.outbox import DONE, FAILED, IN_FLIGHT, PENDING, Outbox
+from requests import Response
+from requests.exceptions import ConnectionError
+
+SEND_TIME = datetime(2020, 1, 1, 12, 40)
+
+
+def error(cls, status_code):
+    return cls(Mock(status_code=status_code, content=b"", spec=Response))
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = {}
+        self.next_id = 1
+        self.errors = []
+        self.calls = []
+
+    def _fail(self):
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def schedule_message(self, text, social_profile_ids, send_time, **kwargs):
+        self.calls.append(("schedule_message", text))
+        self._fail()
+        scheduled = []
+        for profile_id in social_profile_ids:
+            message_id = str(self.next_id)
+            self.next_id += 1
+            self.messages[message_id] = {
+                "id": message_id,
+                "text": text,
+                "socialProfile": {"id": profile_id},
+                "scheduledSendTime": send_time,
+            }
+            scheduled.append({"id": message_id})
+        return scheduled
+
+    def delete_message(self, message_id):
+        self.calls.append(("delete_message", message_id))
+        self._fail()
+        if self.messages.pop(message_id, None) is None:
+            raise error(NotFound, 404)
+        return {}
+
+    def find_scheduled_messages(
+        self, text, social_profile_ids, send_time, media, window
+    ):
+        self.calls.append(("find_scheduled_messages", send_time, window))
+        return [
+            message
+            for message in self.messages.values()
+            if message["text"] == text
+            and message["socialProfile"]["id"] in social_profile_ids
+            and message["scheduledSendTime"] == send_time
+        ]
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(tmp_path / "outbox.db", max_attempts=2)
+    yield outbox
+    outbox.close()
+
+
+def test_drain_sends_recorded_intents(outbox):
+    client = FakeClient()
+    schedule_id = outbox.schedule_message("Hello", ["1", "2"], SEND_TIME)
+    delete_id = outbox.delete_message("98765")
+    client.messages["98765"] = {"id": "98765"}
+
+    assert outbox.stats[PENDING] == 2
+    settled = outbox.drain(client, batch_size=1)
+
+    assert [intent.id for intent in settled] == [schedule_id, delete_id]
+    assert outbox.get(schedule_id).state == DONE
+    assert outbox.get(schedule_id).message_ids == ["1", "2"]
+    assert outbox.get(delete_id).message_ids == ["98765"]
+    assert outbox.stats == {PENDING: 0, IN_FLIGHT: 0, DONE: 2, FAILED: 0}
+    assert outbox.drain(client) == []
+
+
+def test_intents_survive_a_restart(tmp_path):
+    client = FakeClient()
+    outbox = Outbox(tmp_path / "outbox.db")
+    intent_id = outbox.schedule_message("Hello", ["1"], SEND_TIME, media=[{"id": 3}])
+    outbox.close()
+
+    outbox = Outbox(tmp_path / "outbox.db")
+    outbox.drain(client)
+    assert outbox.get(intent_id).state == DONE
+    assert outbox.get(intent_id).payload["media"] == [{"id": 3}]
+    outbox.close()
+
+
+def test_intent_in_flight_at_a_crash_is_not_sent_twice(tmp_path):
+    client = FakeClient()
+    outbox = Outbox(tmp_path / "outbox.db", lookup_window=timedelta(minutes=5))
+    intent_id = outbox.schedule_message("Hello", ["1"], SEND_TIME)
+    # The process died after Hootsuite scheduled the message but before the
+    # outbox stored its id
+    outbox._claim(10, after=0)
+    client.schedule_message("Hello", ["1"], SEND_TIME)
+    client.calls = []
+
+    outbox.drain(client)
+
+    intent = outbox.get(intent_id)
+    assert intent.state == DONE
+    assert intent.uncertain
+    assert intent.message_ids == ["1"]
+    assert client.calls == [
+        ("find_scheduled_messages", SEND_TIME, timedelta(minutes=5))
+    ]
+    outbox.close()
+
+
+def test_uncertain_intent_not_found_is_sent(outbox):
+    client = FakeClient()
+    intent_id = outbox.schedule_message("Hello", ["1"], SEND_TIME)
+    client.errors = [ConnectionError()]
+
+    outbox.drain(client)
+    intent = outbox.get(intent_id)
+    assert (intent.state, intent.uncertain, intent.attempts) == (PENDING, True, 1)
+
+    outbox.drain(client)
+    assert outbox.get(intent_id).message_ids == ["1"]
+    assert len(client.messages) == 1
+
+
+def test_retryable_errors_fail_after_max_attempts(outbox):
+    client = FakeClient()
+    intent_id = outbox.schedule_message("Hello", ["1"], SEND_TIME)
+    client.errors = [error(TooManyRequests, 429), error(ServerError, 500)]
+
+    assert outbox.drain(client) == []
+    assert not outbox.get(intent_id).uncertain
+    (intent,) = outbox.drain(client)
+
+    assert intent.state == FAILED
+    assert intent.attempts == 2
+    assert "500" in intent.error
+    assert outbox.get(intent_id).state == FAILED
+
+
+def test_rejected_intent_fails(outbox):
+    client = FakeClient()
+    intent_id = outbox.schedule_message("Hello", ["1"], SEND_TIME)
+    client.errors = [error(BadRequest, 400)]
+
+    outbox.drain(client)
+    intent = outbox.get(intent_id)
+    assert (intent.state, intent.uncertain, intent.attempts) == (FAILED, False, 1)
+    assert outbox.intents(FAILED)[0].id == intent_id
+
+
+def test_delete_already_done_by_an_uncertain_attempt(outbox):
+    client = FakeClient()
+    missing_id = outbox.delete_message("1")
+    uncertain_id = outbox.delete_message("2")
+    client.messages["2"] = {"id": "2"}
+    outbox._claim(10, after=missing_id)
+    client.delete_message("2")
+
+    outbox.drain(client)
+    assert outbox.get(missing_id).state == FAILED
+    assert outbox.get(uncertain_id).state == DONE
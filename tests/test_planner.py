@@ -0,0 +1,177 @@
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from hootsweet.api import HootSweet
+from hootsweet.planner import MessageQueryPlanner, Shard
+from requests import Response
+from requests_oauthlib import OAuth2Session
+
+START = datetime(2020, 1, 1)
+END = START + timedelta(days=90)
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+def make_message(index, send_time, profile_id):
+    return {
+        "id": str(index),
+        "socialProfile": {"id": profile_id},
+        "scheduledSendTime": send_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+class FakeClient:
+    """Serves messages like the API, returning at most ``limit`` of them."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+        self.paged_calls = []
+        self._lock = threading.Lock()
+
+    def _matching(self, start, end, social_profile_ids):
+        return [
+            message
+            for send_time, message in self.messages
+            if start <= send_time <= end
+            and (
+                social_profile_ids is None
+                or message["socialProfile"]["id"] in social_profile_ids
+            )
+        ]
+
+    def get_outbound_messages(
+        self, start, end, state=None, social_profile_ids=None, limit=50
+    ):
+        with self._lock:
+            self.calls.append((start, end, social_profile_ids))
+        return self._matching(start, end, social_profile_ids)[:limit]
+
+    def iter_outbound_messages(
+        self, start, end, state=None, social_profile_ids=None, limit=50, prefetch=True
+    ):
+        with self._lock:
+            self.paged_calls.append((start, end, social_profile_ids))
+        return iter(self._matching(start, end, social_profile_ids))
+
+
+def make_messages(count, profiles=("1", "2", "3")):
+    step = (END - START) / count
+    return [
+        (
+            START + step * i,
+            make_message(i, START + step * i, profiles[i % len(profiles)]),
+        )
+        for i in range(count)
+    ]
+
+
+def test_shard_split():
+    shard = Shard(START, START + timedelta(days=2), ["1"], group=3)
+    first, second = shard.split()
+    assert (first.start_time, first.end_time) == (START, START + timedelta(days=1))
+    assert (second.start_time, second.end_time) == (
+        START + timedelta(days=1),
+        START + timedelta(days=2),
+    )
+    assert second.social_profile_ids == ["1"] and second.group == 3
+
+
+def test_run_returns_every_message_in_order():
+    messages = make_messages(1000)
+    client = FakeClient(messages)
+    planner = MessageQueryPlanner(client, max_workers=4, limit=20)
+
+    results = planner.run(START, END, ["1", "2", "3"])
+
+    assert [m["id"] for m in results] == [m["id"] for _, m in messages]
+    assert planner.stats["splits"] > 0
+
+
+def test_run_groups_profiles():
+    messages = make_messages(30, profiles=[str(i) for i in range(25)])
+    client = FakeClient(messages)
+    planner = MessageQueryPlanner(client, profiles_per_shard=10, limit=100)
+
+    results = planner.run(START, END, [str(i) for i in range(25)])
+
+    assert len(results) == 30
+    groups = sorted({tuple(ids) for _, _, ids in client.calls})
+    assert [len(group) for group in groups] == [10, 10, 5]
+
+
+def test_window_adapts_to_density():
+    # One message an hour, a page of 100 at half fill is 50 hours
+    messages = [
+        (START + timedelta(hours=i), make_message(i, START + timedelta(hours=i), "1"))
+        for i in range(24 * 90)
+    ]
+    client = FakeClient(messages)
+    planner = MessageQueryPlanner(client, max_workers=1, limit=100)
+
+    results = planner.run(START, END)
+
+    assert len(results) == 24 * 90
+    last_window = client.calls[-2][1] - client.calls[-2][0]
+    assert timedelta(hours=40) < last_window < timedelta(hours=60)
+    assert len(client.calls) < 60
+
+
+def test_dense_windows_are_paged():
+    send_time = START + timedelta(days=1)
+    messages = [(send_time, make_message(i, send_time, "1")) for i in range(30)]
+    client = FakeClient(messages)
+    planner = MessageQueryPlanner(client, limit=10, min_window=timedelta(hours=1))
+
+    results = planner.run(START, START + timedelta(days=2))
+
+    assert len(results) == 30
+    assert client.paged_calls
+
+
+class WindowIgnoringClient(FakeClient):
+    """Returns a full page whatever the window, like an endpoint ignoring it."""
+
+    def get_outbound_messages(
+        self, start, end, state=None, social_profile_ids=None, limit=50
+    ):
+        with self._lock:
+            self.calls.append((start, end, social_profile_ids))
+        return [message for _, message in self.messages[:limit]]
+
+
+def test_shards_are_bounded_when_pages_stay_full():
+    client = WindowIgnoringClient(make_messages(200))
+    planner = MessageQueryPlanner(client, limit=100, max_shards=20)
+
+    planner.run(START, START + timedelta(days=60))
+
+    assert len(client.calls) + len(client.paged_calls) <= 2 * 20
+    assert client.paged_calls
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_query_outbound_messages(mock_session):
+    def request(method, url, params=None, **kwargs):
+        response = Mock(status_code=200, spec=Response)
+        message = make_message(params["startTime"], START, "1")
+        response.json.return_value = {"data": [message, dict(message, id="same")]}
+        return response
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    results = hoot_suite.query_outbound_messages(
+        START, START + timedelta(days=14), social_profile_ids=["1"]
+    )
+
+    assert [m["id"] for m in results] == [
+        "2020-01-01T00:00:00Z",
+        "2020-01-08T00:00:00Z",
+        "same",
+    ]
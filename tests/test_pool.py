@@ -0,0 +1,89 @@
+import threading
+from unittest.mock import Mock
+
+from hootsweet.pool import HootSweetPool
+from hootsweet.ratelimit import RateLimiter
+
+
+def make_token(tenant_id):
+    return {
+        "access_token": "access-%s" % tenant_id,
+        "refresh_token": "refresh-%s" % tenant_id,
+        "expires_in": 3600,
+    }
+
+
+def test_get_builds_each_client_once():
+    token_loader = Mock(side_effect=make_token)
+    pool = HootSweetPool("client_id", "client_secret", token_loader=token_loader)
+
+    first = pool.get("a")
+
+    assert pool.get("a") is first
+    assert first.token["access_token"] == "access-a"
+    assert pool.get("b").token["access_token"] == "access-b"
+    assert token_loader.call_count == 2
+    assert "a" in pool and len(pool) == 2
+
+
+def test_least_recently_used_client_is_evicted():
+    pool = HootSweetPool("client_id", "client_secret", max_clients=2)
+    a = pool.get("a", make_token("a"))
+    pool.get("b", make_token("b"))
+    pool.get("a")
+    pool.get("c", make_token("c"))
+
+    assert "b" not in pool
+    assert pool.get("a") is a
+    assert pool.stats == {"clients": 2, "evictions": 1}
+
+
+def test_tenants_share_connection_pool():
+    pool = HootSweetPool("client_id", "client_secret", pool_maxsize=50)
+    a, b = pool.get("a", make_token("a")), pool.get("b", make_token("b"))
+
+    for client in (a, b):
+        assert client.session.adapters["https://"] is pool.adapter
+        assert client.session.adapters["http://"] is pool.adapter
+    assert a.session is not b.session
+    assert pool.adapter._pool_maxsize == 50
+
+
+def test_per_tenant_state():
+    refresh_cb = Mock(__name__="refresh_cb")
+    pool = HootSweetPool(
+        "client_id",
+        "client_secret",
+        refresh_cb=refresh_cb,
+        rate_limiter_factory=lambda tenant: RateLimiter(rate=5),
+    )
+    a, b = pool.get("a", make_token("a")), pool.get("b", make_token("b"))
+
+    assert a.rate_limiter is not b.rate_limiter
+    a.refresh_cb({"access_token": "new"})
+    refresh_cb.assert_called_once_with("a", {"access_token": "new"})
+
+
+def test_add_replaces_client():
+    pool = HootSweetPool("client_id", "client_secret")
+    old = pool.get("a", make_token("a"))
+
+    new = pool.add("a", dict(make_token("a"), access_token="new"))
+
+    assert new is not old
+    assert pool.get("a").token["access_token"] == "new"
+
+
+def test_concurrent_gets_share_one_client():
+    pool = HootSweetPool("client_id", "client_secret", token_loader=make_token)
+    clients = []
+
+    threads = [
+        threading.Thread(target=lambda: clients.append(pool.get("a"))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
@@ -0,0 +1,111 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.exceptions import ServerError, TooManyRequests
+from hootsweet.ratelimit import RateLimiter, _parse_seconds
+from requests import Response
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+@patch("hootsweet.ratelimit.time.monotonic")
+def test_token_bucket_queues_when_empty(mock_monotonic):
+    mock_monotonic.return_value = 100.0
+    limiter = RateLimiter(rate=2, burst=2)
+
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.5)
+    assert limiter.reserve() == pytest.approx(1.0)
+
+    mock_monotonic.return_value = 102.0
+    assert limiter.reserve() == 0
+    assert limiter.stats.requests == 5
+    assert limiter.stats.queued == 2
+
+
+@patch("hootsweet.ratelimit.time.monotonic")
+def test_exhausted_rate_limit_header_blocks_bucket(mock_monotonic):
+    mock_monotonic.return_value = 100.0
+    limiter = RateLimiter()
+
+    limiter.update({"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "30"})
+    assert limiter.reserve() == 0
+
+    limiter.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"})
+    assert limiter.reserve() == pytest.approx(30)
+
+
+@patch("hootsweet.ratelimit.random.uniform", side_effect=lambda a, b: b)
+def test_retry_delay_backoff(mock_uniform):
+    limiter = RateLimiter(max_retries=3, backoff_base=1, backoff_max=3)
+
+    assert limiter.retry_delay(429, {}, 0) == 1
+    assert limiter.retry_delay(503, {}, 1) == 2
+    assert limiter.retry_delay(503, {}, 2) == 3
+    assert limiter.retry_delay(503, {}, 3) is None
+    assert limiter.retry_delay(400, {}, 0) is None
+    assert limiter.retry_delay(500, {}, 0, idempotent=False) is None
+    assert limiter.retry_delay(429, {"Retry-After": "7"}, 0, idempotent=False) == 7
+    assert limiter.stats.throttled == 2
+    assert limiter.stats.retried == 4
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(None, None), ("12", 12), ("-3", 0), ("soon", None), ("1", 1)],
+)
+def test_parse_seconds(value, expected):
+    assert _parse_seconds(value) == expected
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_retries_throttled_requests(mock_session, mock_sleep):
+    mock_session.return_value.request.side_effect = [
+        make_response(429, headers={"Retry-After": "2"}),
+        make_response(503),
+        make_response(200, {"data": {"id": "1"}}),
+    ]
+    limiter = RateLimiter(max_retries=2)
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", token=test_token, rate_limiter=limiter
+    )
+
+    assert hoot_suite.get_me() == {"id": "1"}
+    assert mock_session.return_value.request.call_count == 3
+    assert mock_sleep.call_args_list[0][0] == (2,)
+    assert limiter.stats.throttled == 1
+    assert limiter.stats.retried == 2
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_raises_when_retries_exhausted(mock_session, mock_sleep):
+    mock_session.return_value.request.return_value = make_response(429)
+    hoot_suite = HootSweet(
+        "client_id", "client_secret", rate_limiter=RateLimiter(max_retries=1)
+    )
+
+    with pytest.raises(TooManyRequests):
+        hoot_suite.get_me()
+    assert mock_session.return_value.request.call_count == 2
+
+
+@patch("hootsweet.api.time.sleep")
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_client_does_not_retry_failed_posts(mock_session, mock_sleep):
+    mock_session.return_value.request.return_value = make_response(500)
+    hoot_suite = HootSweet("client_id", "client_secret", rate_limiter=RateLimiter())
+
+    with pytest.raises(ServerError):
+        hoot_suite.create_media_upload_url(10, "image/png")
+    assert mock_session.return_value.request.call_count == 1
+    mock_sleep.assert_not_called()
@@ -0,0 +1,135 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.constants import ReviewDecision
+from hootsweet.exceptions import Conflict, Forbidden
+from hootsweet.review import latest_sequence_number, parse_review
+from requests import Response
+from requests_oauthlib import OAuth2Session
+from tests.conftest import make_response
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+def error_response(status_code, message):
+    return make_response(status_code, {"errors": [{"code": 1, "message": message}]})
+
+
+class FakeReviewQueue:
+    """Serves approve, reject and history requests for messages with a current
+    sequence number each."""
+
+    def __init__(self, sequence_numbers, forbidden=()):
+        self.sequence_numbers = sequence_numbers
+        self.forbidden = forbidden
+        self.requests = []
+
+    def __call__(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        message_id, action = url.split("/messages/")[1].split("/")
+        current = self.sequence_numbers[message_id]
+        if action == "history":
+            history = [{"sequenceNumber": n} for n in range(current + 1)]
+            return make_response(200, {"data": history})
+        if message_id in self.forbidden:
+            return error_response(403, "Not a reviewer")
+        sent = json.loads(kwargs["data"])["sequenceNumber"]
+        if sent != current:
+            return error_response(409, "Stale sequence number")
+        self.sequence_numbers[message_id] = current + 1
+        return make_response(200, {"data": [{"id": message_id}]})
+
+
+def test_parse_review():
+    outcome = parse_review(("1", 3, "approve"))
+    assert (outcome.message_id, outcome.sequence_number) == ("1", 3)
+    assert outcome.decision is ReviewDecision.APPROVE
+
+    outcome = parse_review(("2", 4, ReviewDecision.REJECT, "Off brand"))
+    assert outcome.reason == "Off brand"
+    assert parse_review(("2", 4, "reject"), reason="Default").reason == "Default"
+
+    with pytest.raises(ValueError):
+        parse_review(("2", 4, "reject"))
+    with pytest.raises(ValueError, match="Unknown decision"):
+        parse_review(("2", 4, "maybe"))
+
+
+def test_latest_sequence_number():
+    assert latest_sequence_number([{"sequenceNumber": 1}, {"sequenceNumber": 3}]) == 3
+    assert latest_sequence_number([{"action": "CREATED"}]) is None
+    assert latest_sequence_number({"sequenceNumber": 2}) == 2
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_review_messages(mock_session):
+    queue = FakeReviewQueue({"1": 0, "2": 5, "3": 0})
+    mock_session.return_value.request.side_effect = queue
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    outcomes = hoot_suite.review_messages(
+        [("1", 0, "approve"), ("2", 5, "reject", "Off brand"), ("3", 0, "reject")],
+        reason="Not approved",
+    )
+
+    assert [outcome.ok for outcome in outcomes] == [True, True, True]
+    assert outcomes[0].result == [{"id": "1"}]
+    assert outcomes[1].reason == "Off brand"
+    assert outcomes[2].reason == "Not approved"
+    assert all(outcome.attempts == 1 for outcome in outcomes)
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_review_messages_retries_sequence_conflicts(mock_session):
+    queue = FakeReviewQueue({"1": 2})
+    mock_session.return_value.request.side_effect = queue
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    (outcome,) = hoot_suite.review_messages([("1", 0, ReviewDecision.APPROVE)])
+
+    assert outcome.ok
+    assert outcome.attempts == 2
+    assert outcome.sequence_number == 2
+    assert [url.rsplit("/", 1)[1] for _, url in queue.requests] == [
+        "approve",
+        "history",
+        "approve",
+    ]
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_review_messages_reports_failures(mock_session):
+    queue = FakeReviewQueue({"1": 0, "2": 0}, forbidden=["2"])
+    mock_session.return_value.request.side_effect = queue
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    outcomes = hoot_suite.review_messages(
+        [("1", 0, "approve"), ("2", 0, "approve"), ("3", 0, "reject")]
+    )
+
+    assert outcomes[0].ok
+    assert not outcomes[1].ok and isinstance(outcomes[1].error, Forbidden)
+    assert outcomes[1].attempts == 1
+    assert isinstance(outcomes[2], ValueError)
+
+
+@patch("hootsweet.api.OAuth2Session", spec=OAuth2Session, token=test_token)
+def test_review_messages_gives_up_on_unchanged_sequence(mock_session):
+    def request(method, url, **kwargs):
+        if url.endswith("/history"):
+            return make_response(200, {"data": [{"sequenceNumber": 0}]})
+        return error_response(409, "Stale sequence number")
+
+    mock_session.return_value.request.side_effect = request
+    hoot_suite = HootSweet("client_id", "client_secret", token=test_token)
+
+    (outcome,) = hoot_suite.review_messages([("1", 0, "approve")])
+
+    assert isinstance(outcome.error, Conflict)
+    assert outcome.attempts == 1
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+
+from hootsweet.models import Message
+from hootsweet.sync import DELETED, INSERTED, UPDATED, MessageStore, MessageSync
+
+NOW = datetime(2020, 1, 10, 12, 0, 0)
+
+
+def make_message(message_id, state, send_time, profile_id="1"):
+    return {
+        "id": message_id,
+        "state": state,
+        "text": "Message %s" % message_id,
+        "socialProfile": {"id": profile_id},
+        "scheduledSendTime": send_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+class FakeClient:
+    def __init__(self, messages):
+        self.messages = messages
+        self.queries = []
+
+    def iter_outbound_messages(self, start, end, social_profile_ids=None, limit=50):
+        self.queries.append((start, end, social_profile_ids))
+        for message in self.messages.values():
+            send_time = datetime.strptime(
+                message["scheduledSendTime"], "%Y-%m-%dT%H:%M:%SZ"
+            )
+            profile_id = message["socialProfile"]["id"]
+            if start <= send_time < end and profile_id in social_profile_ids:
+                yield dict(message)
+
+
+def make_sync(messages, profile_ids=("1",)):
+    client = FakeClient(messages)
+    sync = MessageSync(client, MessageStore(), profile_ids)
+    return client, sync
+
+
+def test_first_sync_inserts_messages():
+    messages = {
+        "sent": make_message("sent", "SENT", NOW - timedelta(days=3)),
+        "future": make_message("future", "SCHEDULED", NOW + timedelta(days=1)),
+        "other": make_message("other", "SCHEDULED", NOW, profile_id="2"),
+    }
+    client, sync = make_sync(messages)
+
+    changes = sync.sync(NOW)
+
+    assert sorted((c.kind, c.message_id) for c in changes) == [
+        (INSERTED, "future"),
+        (INSERTED, "sent"),
+    ]
+    assert client.queries == [
+        (NOW - timedelta(days=28), NOW + timedelta(days=28), ["1"])
+    ]
+    assert [m["id"] for m in sync.store.messages("1")] == ["sent", "future"]
+    assert sync.store.watermark("1") == NOW
+
+
+def test_sync_reports_updates_and_deletes():
+    messages = {
+        "a": make_message("a", "SCHEDULED", NOW + timedelta(hours=1)),
+        "b": make_message("b", "SCHEDULED", NOW + timedelta(hours=2)),
+        "c": make_message("c", "SCHEDULED", NOW + timedelta(hours=3)),
+    }
+    client, sync = make_sync(messages)
+    sync.sync(NOW)
+
+    later = NOW + timedelta(hours=2, minutes=30)
+    messages["a"]["state"] = "SENT"
+    messages["b"]["state"] = "SEND_FAILED_PERMANENTLY"
+    del messages["c"]
+    messages["d"] = make_message("d", "PENDING_APPROVAL", later + timedelta(hours=1))
+
+    changes = {c.message_id: c for c in sync.sync(later)}
+
+    assert changes["a"].kind == UPDATED
+    assert changes["a"].previous["state"] == "SCHEDULED"
+    assert changes["a"].message["state"] == "SENT"
+    assert changes["b"].kind == UPDATED
+    assert changes["c"].kind == DELETED
+    assert changes["c"].message is None
+    assert changes["d"].kind == INSERTED
+    assert sync.store.get("c") is None
+    assert len(sync.store) == 3
+
+    assert sync.sync(later) == []
+
+
+def test_watermark_waits_for_unsettled_messages():
+    due = NOW - timedelta(minutes=5)
+    messages = {
+        "sent": make_message("sent", "SENT", NOW - timedelta(hours=1)),
+        "due": make_message("due", "SCHEDULED", due),
+    }
+    client, sync = make_sync(messages)
+
+    sync.sync(NOW)
+    assert sync.store.watermark("1") == due
+
+    messages["due"]["state"] = "SENT"
+    later = NOW + timedelta(minutes=10)
+    (change,) = sync.sync(later)
+    assert change.kind == UPDATED
+    assert client.queries[-1][0] == due
+    assert sync.store.watermark("1") == later
+
+    sync.sync(later + timedelta(minutes=10))
+    assert client.queries[-1][0] == later
+
+
+def test_watermark_skips_messages_that_never_settle():
+    stale = NOW - timedelta(days=10)
+    messages = {"stale": make_message("stale", "PENDING_APPROVAL", stale)}
+    client, sync = make_sync(messages)
+
+    sync.sync(NOW)
+
+    assert sync.store.watermark("1") == NOW
+
+
+def test_store_is_readable_while_pages_download():
+    store = MessageStore()
+    store.apply("1", NOW, NOW + timedelta(days=1), [make_message("a", "SENT", NOW)])
+
+    def pages():
+        # Reads from another thread would block if the store were locked
+        assert not store._lock.locked()
+        assert store.get("a") is not None
+        yield make_message("b", "SCHEDULED", NOW + timedelta(hours=1))
+
+    changes = store.apply("1", NOW, NOW + timedelta(days=1), pages())
+
+    assert sorted((c.kind, c.message_id) for c in changes) == [
+        (DELETED, "a"),
+        (INSERTED, "b"),
+    ]
+
+
+def test_store_persists(tmp_path):
+    path = tmp_path / "messages.db"
+    store = MessageStore(path)
+    store.apply(
+        "1",
+        NOW,
+        NOW + timedelta(days=1),
+        [Message.from_dict(make_message("a", "SCHEDULED", NOW))],
+    )
+    store.set_watermark("1", NOW)
+    store.close()
+
+    store = MessageStore(path)
+    assert store.get("a")["state"] == "SCHEDULED"
+    assert store.watermark("1") == NOW
+    assert store.watermark("2") is None
@@ -0,0 +1,124 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from hootsweet.api import HootSweet
+from hootsweet.tokens import FileTokenStore, MemoryTokenStore, SQLiteTokenStore
+
+test_token = {
+    "access_token": "access_token",
+    "refresh_token": "refresh_token",
+    "expires_in": 10,
+}
+
+
+@pytest.fixture(params=["memory", "file", "sqlite"])
+def make_store(request, tmp_path):
+    # Each call returns a new store on the same token, like another process
+    memory = MemoryTokenStore()
+
+    def make():
+        if request.param == "memory":
+            return memory
+        if request.param == "file":
+            return FileTokenStore(tmp_path / "token.json")
+        return SQLiteTokenStore(tmp_path / "tokens.db")
+
+    return make
+
+
+def test_save_and_load(make_store):
+    store = make_store()
+    assert store.load() is None
+
+    store.save(test_token)
+
+    assert make_store().load() == test_token
+
+
+def test_save_while_locked(make_store):
+    store = make_store()
+    with store.lock():
+        store.save(test_token)
+        assert store.load() == test_token
+    assert make_store().load() == test_token
+
+
+def test_lock_is_exclusive(make_store):
+    first, second = make_store(), make_store()
+    events = []
+
+    def hold(store, name):
+        with store.lock():
+            events.append(name + " in")
+            time.sleep(0.05)
+            events.append(name + " out")
+
+    threads = [
+        threading.Thread(target=hold, args=(store, name))
+        for store, name in [(first, "first"), (second, "second")]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [event.split()[1] for event in events] == ["in", "out", "in", "out"]
+
+
+def test_sqlite_store_keys(tmp_path):
+    path = tmp_path / "tokens.db"
+    SQLiteTokenStore(path, key="a").save(test_token)
+    assert SQLiteTokenStore(path, key="b").load() is None
+    assert SQLiteTokenStore(path, key="a").load() == test_token
+
+
+def new_session(*args, token=None, **kwargs):
+    session = Mock(token=token)
+    session.refresh_token.side_effect = lambda *a, **kw: refreshed(session)
+    return session
+
+
+def refreshed(session):
+    time.sleep(0.05)
+    count = int(session.token["access_token"].rsplit("-", 1)[-1] or 0) + 1
+    session.token = dict(test_token, access_token="access-%s" % count)
+    return session.token
+
+
+@patch("hootsweet.api.OAuth2Session", side_effect=new_session)
+def test_clients_share_refreshed_token(mock_session, tmp_path):
+    path = tmp_path / "token.json"
+    token = dict(test_token, access_token="access-0")
+    first = HootSweet("id", "secret", token=token, token_store=FileTokenStore(path))
+    second = HootSweet("id", "secret", token_store=FileTokenStore(path))
+    assert second.token["access_token"] == "access-0"
+    assert "expires_at" in FileTokenStore(path).load()
+
+    assert first.refresh_token()["access_token"] == "access-1"
+    assert second.refresh_token()["access_token"] == "access-1"
+
+    second.session.refresh_token.assert_not_called()
+    assert second.token["access_token"] == "access-1"
+    assert FileTokenStore(path).load()["access_token"] == "access-1"
+
+
+@patch("hootsweet.api.OAuth2Session", side_effect=new_session)
+def test_one_client_refreshes_at_a_time(mock_session, tmp_path):
+    path = tmp_path / "tokens.db"
+    token = dict(test_token, access_token="access-0")
+    clients = [
+        HootSweet("id", "secret", token=token, token_store=SQLiteTokenStore(path))
+        for _ in range(5)
+    ]
+
+    threads = [threading.Thread(target=client.refresh_token) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    refreshes = sum(client.session.refresh_token.call_count for client in clients)
+    assert refreshes == 1
+    assert {client.token["access_token"] for client in clients} == {"access-1"}